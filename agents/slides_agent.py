@@ -4,14 +4,19 @@
 1. 参数校验节点 - 验证参数并更新任务状态为 running
 2. 获取文档内容节点 - 从 SV_KNOWLEDGE_DB 查询 MD 内容并写入本地
 3. 接口调用节点 - 直接调用 Paper2SlidesService 生成管道
-4. 文件上传节点 - 将生成的文件上传至 MinIO
+4. 文件上传节点 - 将生成的文件上传至 MinIO（生成过程中已上传的图片不再重复上传）
 5. 用户数据更新节点 - 更新 user_paper_agent_result 表
 6. 系统数据更新节点 - 更新 system_paper_agent_result 表（仅系统论文）
+
+所有节点均为协程，阻塞的 MongoDB / MinIO / 文件操作通过 asyncio.to_thread
+在线程池中执行，同一事件循环可以交错运行多个智能体。
 """
 
 import os
 import uuid
+import asyncio
 import traceback
+from functools import lru_cache
 from pathlib import Path
 from typing import TypedDict, Optional, List, Dict, Any
 from datetime import datetime
@@ -25,12 +30,15 @@ from common.enums import (
     PaperTypeEnum,
     LanguageEnum
 )
+from common.redis_manager import get_redis_queue_manager
 from services.minio_service import get_minio_service
+from services.paper_content_service import get_paper_content_service
 from services.paper2slides_service import get_paper2slides_service
+from paper2slides.core import get_event_bus
 from repositories.user_paper_repo import get_user_paper_repo
 from repositories.system_paper_repo import get_system_paper_repo
+from repositories.unit_of_work import TaskUnitOfWork
 from utilities.log_manager import get_celery_logger
-from db.mongo import get_mongo_client
 
 # 使用 LogManager 的 Celery logger
 logger = get_celery_logger()
@@ -58,6 +66,8 @@ class SlidesAgentState(TypedDict):
     local_md_path: Optional[str]
     output_folder: Optional[str]
     output_files: Optional[List[Dict[str, str]]]
+    uploaded_files: Optional[Dict[str, Any]]
+    unit_of_work: TaskUnitOfWork
 
     # 结果
     file_path: Optional[str]
@@ -70,11 +80,17 @@ class SlidesAgentState(TypedDict):
 
 
 class SlidesAgent:
-    """演示文稿生成智能体"""
+    """演示文稿生成智能体
+
+    编译后的工作流不保存单次运行的状态，同一实例可被多个任务复用，
+    通过 get_slides_agent() 获取进程内共享实例。
+    """
 
     def __init__(self):
         self._settings = get_settings()
         self._minio_service = get_minio_service()
+        self._queue_manager = get_redis_queue_manager()
+        self._paper_content_service = get_paper_content_service()
         self._user_repo = get_user_paper_repo()
         self._system_repo = get_system_paper_repo()
 
@@ -109,7 +125,7 @@ class SlidesAgent:
 
     # ==================== 节点函数 ====================
 
-    def validate_params_node(self, state: SlidesAgentState) -> SlidesAgentState:
+    async def validate_params_node(self, state: SlidesAgentState) -> SlidesAgentState:
         """参数校验节点
 
         验证必要参数并更新任务状态为 running
@@ -135,10 +151,7 @@ class SlidesAgent:
                 logger.info(f"[{state['result_id']}] 语言为EN，style已修改为: {state['style']}")
 
             # 更新任务状态为 running
-            task = self._user_repo.find_by_result_id(state["result_id"])
-            if task:
-                task.mark_running()
-                self._user_repo.update_task(task)
+            if await asyncio.to_thread(self._mark_task_running, state["unit_of_work"], state["result_id"]):
                 logger.info(f"[{state['result_id']}] 任务状态已更新为 running")
 
             state["status"] = "running"
@@ -148,7 +161,8 @@ class SlidesAgent:
             logger.error(f"[{state['result_id']}] 参数校验失败: {error_msg}")
             state["status"] = "failed"
             state["error_message"] = error_msg
-            self._mark_task_failed(
+            await self._mark_task_failed(
+                state["unit_of_work"],
                 result_id=state["result_id"],
                 error_message=error_msg,
                 paper_id=state.get("paper_id"),
@@ -161,44 +175,24 @@ class SlidesAgent:
 
         return state
 
-    def get_md_content_node(self, state: SlidesAgentState) -> SlidesAgentState:
+    async def get_md_content_node(self, state: SlidesAgentState) -> SlidesAgentState:
         """获取文档内容节点 (原 download_file_node)
 
-        从 SV_KNOWLEDGE_DB 查询 system_paper_original_content 获取 MD 内容，并写入临时文件
+        从 SV_KNOWLEDGE_DB 查询 system_paper_original_content 获取 MD 内容，并写入本地缓存文件
         """
         state["current_step"] = "get_md_content"
         logger.info(f"[{state['result_id']}] 开始获取MD文档内容...")
 
         try:
-            paper_id = state["paper_id"]
-            source = state["source"]
-
-            # 1. 连接 Mongo 并查询内容
-            mongo_client = get_mongo_client()
-            collection = mongo_client.system_paper_content_collection
-
-            logger.info(f"[{state['result_id']}] 查询系统论文: paper_id={paper_id}, source={source}")
-
-            # 假设 source 对应 content 表的 source 字段
-            doc = collection.find_one({"paper_id": paper_id, "source": source})
-
-            if not doc:
-                raise ValueError(f"未找到论文内容: paper_id={paper_id}, source={source}")
-
-            content = doc.get("content")
-            if not content:
-                raise ValueError(f"论文内容为空: paper_id={paper_id}")
-
-            # 2. 写入本地临时文件
-            local_dir = TEMP_DIR / state["result_id"]
-            local_dir.mkdir(parents=True, exist_ok=True)
-            local_md_path = local_dir / f"{paper_id}.md"
-
-            with open(local_md_path, "w", encoding="utf-8") as f:
-                f.write(content)
+            # 同一论文的任务共享本地缓存文件，缓存有效期内不再查询数据库
+            local_md_path = await asyncio.to_thread(
+                self._paper_content_service.get_md_path,
+                state["paper_id"],
+                state["source"]
+            )
 
             state["local_md_path"] = str(local_md_path)
-            logger.info(f"[{state['result_id']}] MD内容已写入临时文件: {local_md_path}")
+            logger.info(f"[{state['result_id']}] MD内容文件: {local_md_path}")
 
         except Exception as e:
             error_msg = str(e)
@@ -206,7 +200,8 @@ class SlidesAgent:
             state["status"] = "failed"
             state["error_message"] = error_msg
 
-            self._mark_task_failed(
+            await self._mark_task_failed(
+                state["unit_of_work"],
                 result_id=state["result_id"],
                 error_message=error_msg,
                 paper_id=state.get("paper_id"),
@@ -223,7 +218,9 @@ class SlidesAgent:
     async def call_api_node(self, state: SlidesAgentState) -> SlidesAgentState:
         """接口调用节点
 
-        直接调用 Paper2SlidesService 生成管道生成 Poster/Slides
+        直接调用 Paper2SlidesService 生成管道生成 Poster/Slides。
+        用户论文在生成阶段每写出一张图片就上传至 MinIO，与后续图片的生成重叠进行；
+        系统论文的对象路径不含任务ID，是正在对外提供的默认结果，只在生成成功后上传
         """
         state["current_step"] = "call_api"
         logger.info(f"[{state['result_id']}] 开始调用生成管道...")
@@ -263,12 +260,32 @@ class SlidesAgent:
                 fast_mode=True
             )
 
-            # 直接调用服务生成
-            result = await service.generate(
-                session_id=session_id,
-                file_paths=file_paths,
-                config=config
-            )
+            state["uploaded_files"] = {}
+            if state["paper_type"] == PaperTypeEnum.USER.value:
+                # 订阅生成进度，图片写出后立即上传到本任务的目录
+                event_bus = get_event_bus()
+                events = event_bus.subscribe(session_id)
+                uploader = asyncio.create_task(self._upload_while_generating(state, events))
+
+                # 直接调用服务生成
+                try:
+                    result = await service.generate(
+                        session_id=session_id,
+                        file_paths=file_paths,
+                        config=config
+                    )
+                finally:
+                    event_bus.unsubscribe(session_id, events)
+                    if events.full():
+                        events.get_nowait()
+                    events.put_nowait(None)
+                    await uploader
+            else:
+                result = await service.generate(
+                    session_id=session_id,
+                    file_paths=file_paths,
+                    config=config
+                )
 
             # 从结果中获取输出文件
             output_files = result.get("output_files", [])
@@ -297,7 +314,8 @@ class SlidesAgent:
             logger.error(f"[{state['result_id']}] 生成失败: {error_msg}")
             state["status"] = "failed"
             state["error_message"] = error_msg
-            self._mark_task_failed(
+            await self._mark_task_failed(
+                state["unit_of_work"],
                 result_id=state["result_id"],
                 error_message=error_msg,
                 paper_id=state.get("paper_id"),
@@ -310,7 +328,7 @@ class SlidesAgent:
 
         return state
 
-    def upload_files_node(self, state: SlidesAgentState) -> SlidesAgentState:
+    async def upload_files_node(self, state: SlidesAgentState) -> SlidesAgentState:
         """文件上传节点
 
         将生成的文件上传至 MinIO
@@ -323,15 +341,17 @@ class SlidesAgent:
             if not output_files:
                 raise Exception("没有可上传的文件")
 
-        # 上传文件
-            result = self._minio_service.upload_task_results(
+            # 上传文件（跳过生成过程中已上传且未改动的文件）
+            result = await asyncio.to_thread(
+                self._minio_service.upload_task_results,
                 agent_type=state["agent_type"],
                 paper_type=state["paper_type"],
                 paper_id=state["paper_id"],
                 result_id=state['result_id'],
                 source=state["source"],
                 user_id=state["user_id"],
-                output_files=output_files
+                output_files=output_files,
+                uploaded=state.get("uploaded_files")
             )
 
             state["file_path"] = result.get("file_path")
@@ -344,7 +364,8 @@ class SlidesAgent:
             logger.error(f"[{state['result_id']}] {error_msg}")
             state["status"] = "failed"
             state["error_message"] = error_msg
-            self._mark_task_failed(
+            await self._mark_task_failed(
+                state["unit_of_work"],
                 result_id=state["result_id"],
                 error_message=error_msg,
                 paper_id=state.get("paper_id"),
@@ -357,7 +378,7 @@ class SlidesAgent:
 
         return state
 
-    def update_user_data_node(self, state: SlidesAgentState) -> SlidesAgentState:
+    async def update_user_data_node(self, state: SlidesAgentState) -> SlidesAgentState:
         """用户数据更新节点
 
         根据update_system标记决定批量更新还是单任务更新
@@ -367,18 +388,19 @@ class SlidesAgent:
 
         try:
             # 更新当前任务
-            task = self._user_repo.find_by_result_id(state["result_id"])
-            if task:
-                task.mark_success(
-                    file_path=state["file_path"],
-                    images=state.get("images")
-                )
-                self._user_repo.update_task(task)
+            await asyncio.to_thread(
+                self._mark_task_success,
+                state["unit_of_work"],
+                state["result_id"],
+                state["file_path"],
+                state.get("images")
+            )
 
             # 根据update_system标记决定是否批量更新
             if state["update_system"]:
                 # 系统首次生成，批量更新所有running任务
-                self._user_repo.update_running_tasks(
+                await asyncio.to_thread(
+                    self._user_repo.update_running_tasks,
                     paper_id=state["paper_id"],
                     source=state["source"],
                     agent_type=state["agent_type"],
@@ -398,7 +420,8 @@ class SlidesAgent:
             logger.error(f"[{state['result_id']}] {error_msg}")
             state["status"] = "failed"
             state["error_message"] = error_msg
-            self._mark_task_failed(
+            await self._mark_task_failed(
+                state["unit_of_work"],
                 result_id=state["result_id"],
                 error_message=error_msg,
                 paper_id=state.get("paper_id"),
@@ -411,7 +434,7 @@ class SlidesAgent:
 
         return state
 
-    def update_system_data_node(self, state: SlidesAgentState) -> SlidesAgentState:
+    async def update_system_data_node(self, state: SlidesAgentState) -> SlidesAgentState:
         """系统数据更新节点
 
         根据update_system标记决定是否执行更新
@@ -422,7 +445,8 @@ class SlidesAgent:
         try:
             # 只有update_system=True且系统论文才更新系统表
             if state["paper_type"] == PaperTypeEnum.SYSTEM.value and state["update_system"]:
-                self._system_repo.update_file_path(
+                await asyncio.to_thread(
+                    self._system_repo.update_file_path,
                     paper_id=state["paper_id"],
                     source=state["source"],
                     agent_type=state["agent_type"],
@@ -467,8 +491,102 @@ class SlidesAgent:
 
         return output_files
 
-    def _mark_task_failed(
+    async def _upload_while_generating(self, state: SlidesAgentState, events: asyncio.Queue) -> None:
+        """上传生成阶段写出的图片，直到收到结束标记 None
+
+        上传失败只记录日志，文件会在文件上传节点中补传。
+        """
+        while True:
+            event = await events.get()
+            if event is None:
+                return
+            if event.get("type") != "slide_generated" or not event.get("path"):
+                continue
+            try:
+                signature = await asyncio.to_thread(
+                    self._minio_service.upload_result_file,
+                    agent_type=state["agent_type"],
+                    paper_type=state["paper_type"],
+                    paper_id=state["paper_id"],
+                    result_id=state["result_id"],
+                    source=state["source"],
+                    user_id=state["user_id"],
+                    filename=event["filename"],
+                    local_path=event["path"]
+                )
+                state["uploaded_files"][event["path"]] = signature
+            except Exception as e:
+                logger.warning(f"[{state['result_id']}] 提前上传失败，稍后补传: {event['filename']}, {e}")
+
+    def _mark_task_running(self, unit_of_work: TaskUnitOfWork, result_id: str) -> bool:
+        """将任务状态更新为 running
+
+        提交任务时已写入 running，此时只在实体上记录开始时间，随最终状态
+        一次写回；任务仍是其他状态时（例如直接运行的智能体）立即写回，
+        使状态对取消与调度可见。
+
+        Args:
+            unit_of_work: 本次运行的工作单元
+            result_id: 任务ID
+
+        Returns:
+            任务是否存在
+        """
+        task = unit_of_work.get_task(result_id)
+        if task is None:
+            return False
+        visible = task.persisted_status == TaskStatusEnum.RUNNING.value
+        task.mark_running()
+        if not visible:
+            unit_of_work.flush()
+        self._user_repo.mark_coalesced_running(result_id)
+        return True
+
+    def _mark_task_success(
+        self,
+        unit_of_work: TaskUnitOfWork,
+        result_id: str,
+        file_path: str,
+        images: Optional[List[str]] = None
+    ) -> None:
+        """将任务及合并到它的任务状态更新为 success
+
+        本次运行对任务的修改在此一次写回（成功后批量更新的 running
+        任务不能包含本任务，因此不能推迟到运行结束）。
+
+        Args:
+            unit_of_work: 本次运行的工作单元
+            result_id: 任务ID
+            file_path: 结果文件路径
+            images: 图像地址列表
+        """
+        task = unit_of_work.get_task(result_id)
+        if task:
+            task.mark_success(file_path=file_path, images=images)
+            unit_of_work.flush()
+
+        coalesced = self._user_repo.complete_coalesced_tasks(result_id, file_path, images)
+        if coalesced:
+            logger.info(f"[{result_id}] 已完成合并的任务: {coalesced} 个")
+        if task:
+            self._queue_manager.release_inflight(task.coalesce_key, result_id)
+
+    async def _mark_task_failed(
         self,
+        unit_of_work: TaskUnitOfWork,
+        result_id: str,
+        error_message: str,
+        **kwargs
+    ) -> None:
+        """标记任务失败（在线程池中执行数据库操作）
+
+        参数同 _mark_task_failed_sync。
+        """
+        await asyncio.to_thread(self._mark_task_failed_sync, unit_of_work, result_id, error_message, **kwargs)
+
+    def _mark_task_failed_sync(
+        self,
+        unit_of_work: TaskUnitOfWork,
         result_id: str,
         error_message: str,
         paper_id: str = None,
@@ -479,7 +597,10 @@ class SlidesAgent:
     ) -> None:
         """标记任务失败
 
+        本次运行对任务的修改与失败状态一次写回。
+
         Args:
+            unit_of_work: 本次运行的工作单元
             result_id: 任务ID
             error_message: 错误信息
             paper_id: 论文ID（可选）
@@ -490,11 +611,15 @@ class SlidesAgent:
         """
         try:
             # 更新用户任务状态
-            task = self._user_repo.find_by_result_id(result_id)
+            task = unit_of_work.get_task(result_id)
             if task:
                 task.mark_failed(error_message)
-                self._user_repo.update_task(task)
+                unit_of_work.flush()
                 logger.info(f"[{result_id}] 用户任务已标记为失败: {error_message}")
+                self._queue_manager.release_inflight(task.coalesce_key, result_id)
+
+            # 合并到该任务的任务同样失败
+            self._user_repo.fail_coalesced_tasks(result_id, error_message)
 
             # 如果是系统论文且需要更新系统记录，删除无效的系统记录
             if update_system:
@@ -551,8 +676,11 @@ class SlidesAgent:
             update_system: 是否更新系统记录
 
         Returns:
-            执行结果
+            执行结果，recorded 表示最终状态是否已由本次运行写入数据库
         """
+        # 本次运行的工作单元：任务只读取一次，修改集中写回
+        unit_of_work = TaskUnitOfWork(self._user_repo)
+
         # 初始化状态
         initial_state: SlidesAgentState = {
             "result_id": result_id,
@@ -568,6 +696,8 @@ class SlidesAgent:
             "local_md_path": None,
             "output_folder": None,
             "output_files": None,
+            "uploaded_files": None,
+            "unit_of_work": unit_of_work,
             "file_path": None,
             "images": None,
             "current_step": "init",
@@ -579,12 +709,14 @@ class SlidesAgent:
             # 执行工作流
             final_state = await self.app.ainvoke(initial_state)
 
+            status = final_state.get("status") or "failed"
             return {
                 "result_id": final_state.get("result_id"),
-                "status": final_state.get("status") or "failed",
+                "status": status,
                 "file_path": final_state.get("file_path"),
                 "images": final_state.get("images"),
-                "error_message": final_state.get("error_message")
+                "error_message": final_state.get("error_message"),
+                "recorded": unit_of_work.persisted_status(result_id) == status
             }
 
         except Exception as e:
@@ -595,12 +727,23 @@ class SlidesAgent:
                 "status": "failed",
                 "file_path": None,
                 "images": None,
-                "error_message": error_msg
+                "error_message": error_msg,
+                "recorded": unit_of_work.persisted_status(result_id) == TaskStatusEnum.FAILED.value
             }
 
 
 # ==================== 便捷函数 ====================
 
+@lru_cache()
+def get_slides_agent() -> SlidesAgent:
+    """获取智能体单例（工作流只编译一次）
+
+    Returns:
+        SlidesAgent: 智能体实例
+    """
+    return SlidesAgent()
+
+
 async def run_slides_agent(
     result_id: str,
     paper_id: str,
@@ -628,7 +771,7 @@ async def run_slides_agent(
     Returns:
         执行结果
     """
-    agent = SlidesAgent()
+    agent = get_slides_agent()
     return await agent.run(
         result_id=result_id,
         paper_id=paper_id,
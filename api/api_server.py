@@ -2,6 +2,9 @@
 
 提供 FastAPI 应用服务器的初始化和启动功能。
 """
+import time
+import asyncio
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -28,6 +31,7 @@ class ApiServer:
         """
         self.logger = logger
         self.settings = settings
+        self._reaper_task = None
 
         self.app = FastAPI(
             title=constants.SERVICE_TITLE,
@@ -86,7 +90,7 @@ class ApiServer:
 
             self.logger.info("正在初始化Redis队列...")
             try:
-                from common.redis_manager import get_redis_queue_manager
+                from common.redis_manager import get_redis_queue_manager, delete_keys_by_pattern
                 from repositories.user_paper_repo import get_user_paper_repo
                 from repositories.system_paper_repo import get_system_paper_repo
                 from common.enums import TaskStatusEnum
@@ -95,6 +99,14 @@ class ApiServer:
                 queue_manager = get_redis_queue_manager()
                 user_repo = get_user_paper_repo()
                 system_repo = get_system_paper_repo()
+                started = time.perf_counter()
+                phase_started = started
+
+                def log_phase(name: str):
+                    nonlocal phase_started
+                    now = time.perf_counter()
+                    self.logger.info(f"启动恢复 - {name}: {now - phase_started:.2f}s")
+                    phase_started = now
 
                 # 清理Celery队列中的所有消息，避免重启后重复执行
                 try:
@@ -104,12 +116,12 @@ class ApiServer:
                     )
                     celery_queues = ["celery", "slides"]
                     for queue in celery_queues:
-                        keys = redis_client.keys(f"{queue}*")
-                        if keys:
-                            redis_client.delete(*keys)
-                            self.logger.info(f"已清理Celery队列: {queue}, 删除了 {len(keys)} 个键")
+                        deleted = delete_keys_by_pattern(redis_client, f"{queue}*")
+                        if deleted:
+                            self.logger.info(f"已清理Celery队列: {queue}, 删除了 {deleted} 个键")
                 except Exception as e:
                     self.logger.warning(f"清理Celery队列失败: {e}")
+                log_phase("清理Celery队列")
 
                 # 在初始化前重置所有队列状态，确保干净的初始状态
                 queue_manager.reset_all_queue_state()
@@ -127,46 +139,59 @@ class ApiServer:
                             f"  - paper_id={record.paper_id}, "
                             f"agent_type={record.agent_type}, source={record.source}"
                         )
+                log_phase("重置队列并清理系统记录")
 
                 # 服务重启时，将所有"运行中"的任务标记为失败（因为它们已被中断）
-                running_tasks = user_repo.find_many(
-                    {"status": TaskStatusEnum.RUNNING.value},
-                    limit=1000
-                )
-                for task in running_tasks:
-                    user_repo.mark_failed(task.result_id, "任务因服务重启而中断")
-                    self.logger.info(f"已将中断的任务标记为失败: {task.result_id}")
-
-                # 服务刚启动时，运行中计数应为0
-                running_count = 0
-
-                # 获取等待中的任务
-                waiting_tasks = user_repo.find_many(
-                    {"status": TaskStatusEnum.WAITING.value},
-                    limit=1000,
-                    sort=[("created_time", 1)]
+                interrupted = user_repo.fail_all_by_status(
+                    TaskStatusEnum.RUNNING.value,
+                    "任务因服务重启而中断"
                 )
+                if interrupted:
+                    self.logger.info(f"已将 {interrupted} 个中断的任务标记为失败")
+                log_phase("标记中断任务")
+
+                # 服务刚启动时，没有运行中的任务
+                running_task_ids = []
 
-                # 根据配置决定如何处理等待队列
+                # 根据配置决定如何处理等待队列（合并到其他任务的不单独调度）
                 if self.settings.reset_waiting_on_restart:
-                    # 将等待任务标记为失败
-                    for task in waiting_tasks:
-                        user_repo.mark_failed(task.result_id, "任务因服务重启而取消")
-                        self.logger.info(f"已将等待任务标记为失败: {task.result_id}")
-                    waiting_task_ids = []
+                    # 将等待任务（包括合并到其他任务的）标记为失败
+                    cancelled = user_repo.fail_all_by_status(
+                        TaskStatusEnum.WAITING.value,
+                        "任务因服务重启而取消"
+                    )
+                    if cancelled:
+                        self.logger.info(f"已将 {cancelled} 个等待任务标记为失败")
+                    waiting_entries = []
                 else:
-                    # 保留等待任务，稍后重新调度
-                    waiting_task_ids = [task.result_id for task in waiting_tasks]
+                    # 保留等待任务，按原入队时间和优先级重新调度（游标流式读取，不设上限）
+                    waiting_entries = (
+                        {
+                            "task_id": doc["_id"],
+                            "user_id": doc.get("user_id"),
+                            "priority": doc.get("priority"),
+                            "enqueued_at": doc["created_time"].timestamp() if doc.get("created_time") else None
+                        }
+                        for doc in user_repo.iter_waiting_for_requeue()
+                    )
+
+                # 在途任务已被标记失败的合并任务同样失败（保留的等待任务由其在途任务完成时更新）
+                orphaned = user_repo.fail_orphaned_coalesced_tasks("合并的生成任务因服务重启而中断")
+                if orphaned:
+                    self.logger.info(f"已将 {orphaned} 个合并任务标记为失败")
+                log_phase("处理合并任务")
 
                 # 初始化Redis队列状态
-                queue_manager.init_from_mongo(running_count, waiting_task_ids)
+                restored = queue_manager.init_from_mongo(running_task_ids, waiting_entries)
+                log_phase("恢复等待队列")
 
                 self.logger.info(
-                    f"Redis队列初始化完成 - 运行中: {running_count}, 等待中: {len(waiting_task_ids)}"
+                    f"Redis队列初始化完成 - 运行中: {len(running_task_ids)}, 等待中: {restored}, "
+                    f"耗时: {time.perf_counter() - started:.2f}s"
                 )
 
                 # 如果有等待任务，触发调度
-                if waiting_task_ids:
+                if restored:
                     from services.task_service import get_task_service
                     task_service = get_task_service()
                     task_service.schedule_from_waiting_queue()
@@ -174,9 +199,15 @@ class ApiServer:
             except Exception as e:
                 self.logger.error(f"Redis队列初始化失败: {e}")
 
+            # 定期回收租约过期的运行槽
+            self._reaper_task = asyncio.create_task(self._reap_expired_leases())
+
         # 关闭事件
         @self.app.on_event("shutdown")
         async def shutdown_event():
+            if self._reaper_task is not None:
+                self._reaper_task.cancel()
+
             self.logger.info("正在关闭数据库连接...")
             try:
                 from db.mongo import get_mongo_client
@@ -185,6 +216,21 @@ class ApiServer:
             except Exception as e:
                 self.logger.error(f"关闭数据库连接失败: {e}")
 
+    async def _reap_expired_leases(self):
+        """定期回收心跳停止的任务占用的运行槽"""
+        from config.settings import get_settings
+        from services.task_service import get_task_service
+
+        interval = get_settings().lease_reap_interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                reaped = await asyncio.to_thread(get_task_service().reap_expired_tasks)
+                if reaped:
+                    self.logger.warning(f"已回收 {reaped} 个过期运行槽")
+            except Exception as e:
+                self.logger.error(f"回收过期运行槽失败: {e}")
+
     def _get_port(self) -> int:
         """获取服务端口号"""
         if self.settings:
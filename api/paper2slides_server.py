@@ -3,15 +3,17 @@ FastAPI server for Paper2Slides
 """
 import os
 import sys
+import json
 import uuid
 import asyncio
 import logging
+from collections import deque
 from pathlib import Path
 from typing import List, Optional
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import Union
@@ -30,7 +32,9 @@ sys.path.insert(0, str(PROJECT_ROOT))
 # Import paper2slides functions
 from paper2slides.core import (
     run_pipeline, get_base_dir, get_config_dir,
-    get_config_name, detect_start_stage
+    get_config_name, detect_start_stage,
+    find_session_state, index_session, get_event_bus, get_llm_cache,
+    get_image_cache, regenerate_slides
 )
 from paper2slides.utils.path_utils import get_project_name
 from paper2slides.utils import setup_logging
@@ -46,37 +50,96 @@ app = FastAPI(title="Paper2Slides API", version="1.0.0")
 # Configure logging for paper2slides
 setup_logging(level=logging.INFO)
 
+# Concurrency limits for pipeline sessions
+MAX_CONCURRENT_SESSIONS = int(os.getenv("P2S_MAX_CONCURRENT_SESSIONS", "2"))
+MAX_WAITING_SESSIONS = int(os.getenv("P2S_MAX_WAITING_SESSIONS", "10"))
+GENERATE_WORKERS = int(os.getenv("P2S_GENERATE_WORKERS", "2"))
+SPECULATIVE_PLANS = os.getenv("P2S_SPECULATIVE_PLANS", "false").lower() == "true"
+SSE_KEEPALIVE_SECONDS = 15
+
+
 # Global state for tracking running sessions
 class SessionManager:
-    def __init__(self):
-        self.running_session = None
+    """Bounded-concurrency session scheduler.
+
+    Up to ``max_running`` sessions run at once, the rest wait in FIFO order.
+    """
+
+    def __init__(self, max_running: int = MAX_CONCURRENT_SESSIONS, max_waiting: int = MAX_WAITING_SESSIONS):
+        self.max_running = max(1, max_running)
+        self.max_waiting = max(0, max_waiting)
+        self.running_sessions = []  # Running session IDs in start order
+        self.waiting_sessions = deque()  # FIFO of session IDs waiting for a slot
         self.cancelled_sessions = set()  # Track cancelled session IDs
+        self.project_locks = {}  # Per-project locks, pipelines of one project share checkpoints
         self.lock = asyncio.Lock()
+        self.slot_released = asyncio.Condition(self.lock)
     
-    async def start_session(self, session_id: str) -> bool:
-        """Try to start a new session. Returns False if another session is already running"""
+    def _is_active(self, session_id: str) -> bool:
+        return session_id in self.running_sessions or session_id in self.waiting_sessions
+    
+    async def enqueue_session(self, session_id: str) -> bool:
+        """Reserve a place for a session. Returns False if it is already active or the waiting list is full"""
         async with self.lock:
-            if self.running_session is not None:
+            if self._is_active(session_id):
+                return False
+            # Sessions that will not get a slot right away
+            queued = len(self.running_sessions) + len(self.waiting_sessions) - self.max_running
+            if queued >= self.max_waiting:
                 return False
-            self.running_session = session_id
-            # Remove from cancelled set when starting (for regeneration cases)
+            # Remove from cancelled set when enqueuing (for regeneration cases)
             self.cancelled_sessions.discard(session_id)
+            self.waiting_sessions.append(session_id)
+            return True
+    
+    async def start_session(self, session_id: str) -> bool:
+        """Wait for a free slot and start the session. Returns False if it was cancelled while waiting"""
+        async with self.slot_released:
+            if session_id in self.running_sessions:
+                return False
+            if session_id not in self.waiting_sessions:
+                self.cancelled_sessions.discard(session_id)
+                self.waiting_sessions.append(session_id)
+            
+            await self.slot_released.wait_for(
+                lambda: session_id not in self.waiting_sessions or (
+                    self.waiting_sessions[0] == session_id
+                    and len(self.running_sessions) < self.max_running
+                )
+            )
+            if session_id not in self.waiting_sessions:
+                # Removed by cancel_session
+                return False
+            
+            self.waiting_sessions.popleft()
+            self.running_sessions.append(session_id)
+            # The next waiting session may also fit into a free slot
+            self.slot_released.notify_all()
             return True
     
     async def end_session(self, session_id: str):
-        """End a session"""
-        async with self.lock:
-            if self.running_session == session_id:
-                self.running_session = None
-            # Keep cancelled flag for a bit, clean up later if needed
+        """End a session and release its slot"""
+        async with self.slot_released:
+            if session_id in self.running_sessions:
+                self.running_sessions.remove(session_id)
+            elif session_id in self.waiting_sessions:
+                self.waiting_sessions.remove(session_id)
+            self.cancelled_sessions.discard(session_id)
+            self.slot_released.notify_all()
     
     async def cancel_session(self, session_id: str) -> bool:
-        """Cancel a running session. Returns True if session was running"""
-        async with self.lock:
-            if self.running_session == session_id:
+        """Cancel a running or waiting session. Returns True if session was active"""
+        async with self.slot_released:
+            if session_id in self.running_sessions:
                 self.cancelled_sessions.add(session_id)
                 logger.info(f"Session {session_id[:8]} marked for cancellation")
                 return True
+            if session_id in self.waiting_sessions:
+                self.waiting_sessions.remove(session_id)
+                self.cancelled_sessions.add(session_id)
+                self.slot_released.notify_all()
+                logger.info(f"Session {session_id[:8]} removed from waiting list")
+                return True
             return False
     
     def is_cancelled(self, session_id: str) -> bool:
@@ -84,8 +147,23 @@ class SessionManager:
         return session_id in self.cancelled_sessions
     
     def get_running_session(self) -> Optional[str]:
-        """Get the currently running session ID"""
-        return self.running_session
+        """Get the earliest started running session ID"""
+        return self.running_sessions[0] if self.running_sessions else None
+    
+    def get_running_sessions(self) -> List[str]:
+        """Get all running session IDs"""
+        return list(self.running_sessions)
+    
+    def get_waiting_sessions(self) -> List[str]:
+        """Get waiting session IDs in FIFO order"""
+        return list(self.waiting_sessions)
+    
+    def get_project_lock(self, directory: Path) -> asyncio.Lock:
+        """Get the lock serializing writers of a project (shared checkpoints) or config directory"""
+        key = str(directory)
+        if key not in self.project_locks:
+            self.project_locks[key] = asyncio.Lock()
+        return self.project_locks[key]
 
 session_manager = SessionManager()
 
@@ -104,6 +182,10 @@ app.mount("/outputs", StaticFiles(directory=str(OUTPUT_DIR)), name="outputs")
 app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 
+class RegenerateRequest(BaseModel):
+    slide_indices: List[int]
+
+
 class ChatResponse(BaseModel):
     message: str
     slides: Optional[List[dict]] = None
@@ -123,13 +205,29 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """LLM response and image cache hit/miss counters and sizes"""
+    llm_cache = get_llm_cache()
+    image_cache = get_image_cache()
+    return {
+        "llm": {"enabled": True, **await asyncio.to_thread(llm_cache.stats)} if llm_cache else {"enabled": False},
+        "image": {"enabled": True, **image_cache.stats()} if image_cache else {"enabled": False},
+    }
+
+
 @app.get("/api/session/running")
 async def get_running_session():
     """Check if there is a session currently running"""
     running_session = session_manager.get_running_session()
+    running_sessions = session_manager.get_running_sessions()
     return {
         "has_running_session": running_session is not None,
-        "running_session_id": running_session[:8] if running_session else None
+        "running_session_id": running_session[:8] if running_session else None,
+        "running_session_ids": [s[:8] for s in running_sessions],
+        "waiting_sessions": len(session_manager.get_waiting_sessions()),
+        "max_running": session_manager.max_running,
+        "max_waiting": session_manager.max_waiting
     }
 
 
@@ -179,9 +277,6 @@ async def chat(
     """
     try:
         print(f"===================> params message info: {message}")
-        # Check if another session is already running
-        running_session = session_manager.get_running_session()
-        
         # Check if reusing existing session
         reusing_session = False
         if session_id and not files:
@@ -190,23 +285,10 @@ async def chat(
             if session_dir.exists():
                 reusing_session = True
                 print(f"Reusing existing session: {session_id[:8]}")
-                
-                # Check if this is a different session from the running one
-                if running_session and running_session != session_id:
-                    raise HTTPException(
-                        status_code=409, 
-                        detail=f"Another session is already running. Please wait for it to complete. Running session: {running_session[:8]}"
-                    )
             else:
                 raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
         else:
             # Generate new session ID
-            if running_session:
-                raise HTTPException(
-                    status_code=409, 
-                    detail=f"Another session is already running. Please wait for it to complete. Running session: {running_session[:8]}"
-                )
-            
             session_id = str(uuid.uuid4())
             session_dir = UPLOAD_DIR / session_id
             session_dir.mkdir(exist_ok=True)
@@ -274,6 +356,13 @@ async def chat(
             "poster_url": None
         }
         
+        # Reserve a slot or a place in the waiting list
+        if not await session_manager.enqueue_session(session_id):
+            raise HTTPException(
+                status_code=409,
+                detail=f"Session {session_id[:8]} is already running or too many sessions are waiting. Please retry later."
+            )
+        
         # Start the pipeline in background
         background_tasks.add_task(
             run_pipeline_background,
@@ -292,6 +381,8 @@ async def chat(
         # Return immediately so frontend can start polling
         return JSONResponse(content=response_data)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing request: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
@@ -328,9 +419,6 @@ async def chat_with_paths(
         Response with session ID - actual generation happens in background
     """
     try:
-        # Check if another session is already running
-        running_session = session_manager.get_running_session()
-        
         # Process file paths
         file_path_list = [path.strip() for path in file_paths.split(",") if path.strip()] if file_paths else []
         
@@ -356,23 +444,10 @@ async def chat_with_paths(
             if session_dir.exists():
                 reusing_session = True
                 print(f"Reusing existing session: {session_id[:8]}")
-                
-                # Check if this is a different session from the running one
-                if running_session and running_session != session_id:
-                    raise HTTPException(
-                        status_code=409, 
-                        detail=f"Another session is already running. Please wait for it to complete. Running session: {running_session[:8]}"
-                    )
             else:
                 raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
         else:
             # Generate new session ID
-            if running_session:
-                raise HTTPException(
-                    status_code=409, 
-                    detail=f"Another session is already running. Please wait for it to complete. Running session: {running_session[:8]}"
-                )
-            
             session_id = str(uuid.uuid4())
             session_dir = UPLOAD_DIR / session_id
             session_dir.mkdir(exist_ok=True)
@@ -443,6 +518,13 @@ async def chat_with_paths(
             "poster_url": None
         }
         
+        # Reserve a slot or a place in the waiting list
+        if not await session_manager.enqueue_session(session_id):
+            raise HTTPException(
+                status_code=409,
+                detail=f"Session {session_id[:8]} is already running or too many sessions are waiting. Please retry later."
+            )
+        
         # Start the pipeline in background
         background_tasks.add_task(
             run_pipeline_background,
@@ -461,11 +543,50 @@ async def chat_with_paths(
         # Return immediately so frontend can start polling
         return JSONResponse(content=response_data)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing request with file paths: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
 
+async def _run_project_pipeline(
+    session_id: str,
+    base_dir: Path,
+    config_dir: Path,
+    config: dict,
+    session_manager: SessionManager = None
+):
+    """Detect start stage, save initial state and run the pipeline
+
+    Only the rag and summary stages, which write checkpoints shared by every
+    config of the project, run under the project lock.
+    """
+    # Detect start stage first
+    from_stage = detect_start_stage(base_dir, config_dir, config)
+    print(f"Starting from stage: {from_stage}")
+    
+    # Create initial state BEFORE starting pipeline
+    from paper2slides.core.state import create_state, save_state, STAGES
+    initial_state = create_state(config)
+    
+    # Add session_id to state for tracking
+    initial_state["session_id"] = session_id
+    
+    # Mark stages before from_stage as completed (they are being reused)
+    start_idx = STAGES.index(from_stage)
+    for i in range(start_idx):
+        initial_state["stages"][STAGES[i]] = "completed"
+    
+    save_state(config_dir, initial_state)
+    print(f"  Initial state saved (starting from {from_stage})")
+    
+    # Run the pipeline (base_dir already handles document grouping)
+    # Pass session_manager to enable cancellation checks
+    shared_lock = session_manager.get_project_lock(base_dir) if session_manager else None
+    await run_pipeline(base_dir, config_dir, config, from_stage, session_id, session_manager, shared_lock)
+
+
 async def generate_slides_with_pipeline(
     session_id: str,
     message: str, 
@@ -552,6 +673,8 @@ async def generate_slides_with_pipeline(
         "slides_length": length or "medium",
         "poster_density": density or "medium",
         "fast_mode": fast_mode if content == "paper" else False,  # Fast mode only for paper content
+        "max_workers": GENERATE_WORKERS,
+        "speculative_plans": SPECULATIVE_PLANS,
     }
     
     base_dir = get_base_dir(str(OUTPUT_DIR), project_name, content)
@@ -567,28 +690,13 @@ async def generate_slides_with_pipeline(
     print(f"  Output: {base_dir}")
     print(f"  Config: {config_dir.name}")
     
-    # Detect start stage first
-    from_stage = detect_start_stage(base_dir, config_dir, config)
-    print(f"Starting from stage: {from_stage}")
-    
-    # Create initial state BEFORE starting pipeline
-    from paper2slides.core.state import create_state, save_state, STAGES
-    initial_state = create_state(config)
-    
-    # Add session_id to state for tracking
-    initial_state["session_id"] = session_id
-    
-    # Mark stages before from_stage as completed (they are being reused)
-    start_idx = STAGES.index(from_stage)
-    for i in range(start_idx):
-        initial_state["stages"][STAGES[i]] = "completed"
-    
-    save_state(config_dir, initial_state)
-    print(f"  Initial state saved (starting from {from_stage})")
-    
-    # Run the pipeline (base_dir already handles document grouping)
-    # Pass session_manager to enable cancellation checks
-    await run_pipeline(base_dir, config_dir, config, from_stage, session_id, session_manager)
+    # Pipelines of the same config write the same state and outputs, run them
+    # one at a time; other configs of the project only wait for the shared stages
+    if session_manager:
+        async with session_manager.get_project_lock(config_dir):
+            await _run_project_pipeline(session_id, base_dir, config_dir, config, session_manager)
+    else:
+        await _run_project_pipeline(session_id, base_dir, config_dir, config, session_manager)
     
     # Find generated outputs
     output_files = []
@@ -625,8 +733,14 @@ def _update_state_on_error(
     fast_mode: bool
 ):
     """Update state.json when background pipeline fails"""
-    from paper2slides.core.state import load_state, save_state
-    import json
+    from paper2slides.core.state import load_state
+    
+    # The session index knows the exact config_dir once the state was saved
+    indexed = find_session_state(session_id)
+    if indexed:
+        config_dir, state = indexed
+        _mark_running_stage_failed(session_id, config_dir, state, error_msg)
+        return
     
     # Find PDF files
     pdf_files = [f for f in files if f['filename'].lower().endswith('.pdf')]
@@ -659,14 +773,21 @@ def _update_state_on_error(
     # Load and update state
     state = load_state(config_dir)
     if state:
-        # Find the running stage and mark it as failed
-        for stage_name, stage_status in state.get("stages", {}).items():
-            if stage_status == "running":
-                state["stages"][stage_name] = "failed"
-                break
-        state["error"] = error_msg
-        save_state(config_dir, state)
-        logger.info(f"Updated state.json with error for session {session_id[:8]}")
+        _mark_running_stage_failed(session_id, config_dir, state, error_msg)
+
+
+def _mark_running_stage_failed(session_id: str, config_dir: Path, state: dict, error_msg: str):
+    """Mark the running stage of a state as failed and save it"""
+    from paper2slides.core.state import save_state
+    
+    # Find the running stage and mark it as failed
+    for stage_name, stage_status in state.get("stages", {}).items():
+        if stage_status == "running":
+            state["stages"][stage_name] = "failed"
+            break
+    state["error"] = error_msg
+    save_state(config_dir, state)
+    logger.info(f"Updated state.json with error for session {session_id[:8]}")
 
 
 async def run_pipeline_background(
@@ -684,15 +805,17 @@ async def run_pipeline_background(
     """
     Run pipeline in background and store results
     """
+    started = False
     try:
-        # Try to start the session
-        can_start = await session_manager.start_session(session_id)
-        if not can_start:
-            logger.error(f"Cannot start session {session_id[:8]} - another session is already running")
+        # Wait for a free slot and start the session
+        started = await session_manager.start_session(session_id)
+        if not started:
+            reason = "Cancelled by user" if session_manager.is_cancelled(session_id) else "Session is already running"
+            logger.error(f"Cannot start session {session_id[:8]} - {reason}")
             # Store error in state
             if not hasattr(app.state, 'results'):
                 app.state.results = {}
-            app.state.results[session_id] = {"error": "Another session is already running"}
+            app.state.results[session_id] = {"error": reason}
             return
         
         logger.info(f"Starting background pipeline for session {session_id[:8]}")
@@ -726,8 +849,78 @@ async def run_pipeline_background(
             logger.error(f"Failed to update state file: {state_err}")
     finally:
         # Always end the session when done (success or failure)
-        await session_manager.end_session(session_id)
-        logger.info(f"Session {session_id[:8]} ended")
+        if started or session_manager.is_cancelled(session_id):
+            await session_manager.end_session(session_id)
+            logger.info(f"Session {session_id[:8]} ended")
+        result = getattr(app.state, 'results', {}).get(session_id, {})
+        get_event_bus().publish(
+            session_id, "session_ended",
+            status="failed" if "error" in result else "completed",
+            error=result.get("error")
+        )
+
+
+def _scan_session_state(session_id: str, pdf_files: List[Path]) -> Optional[dict]:
+    """Find a session state by scanning the project's state files.
+
+    Fallback for sessions missing from the session index (e.g. after a
+    restart). Exact matches are added to the index.
+    """
+    # Determine project name and paths
+    if len(pdf_files) > 1:
+        project_name = f"session_{session_id[:8]}"
+    else:
+        project_name = get_project_name(str(pdf_files[0]))
+    
+    # Check both paper and general content types
+    state_data = None
+    most_recent_time = None
+    
+    for content_type in ["paper", "general"]:
+        base_dir = Path(get_base_dir(str(OUTPUT_DIR), project_name, content_type))
+        if base_dir.exists():
+            # Look for all state.json files in config directories
+            for state_file_path in base_dir.rglob("state.json"):
+                if state_file_path.is_file():
+                    try:
+                        with open(state_file_path, 'r', encoding='utf-8') as f:
+                            current_state = json.load(f)
+                        
+                        # First priority: exact match by session_id
+                        if current_state.get("session_id") == session_id:
+                            state_data = current_state
+                            index_session(session_id, state_file_path.parent, current_state)
+                            logger.debug(f"Found exact session match: {state_file_path}")
+                            break
+                        
+                        # Second priority: most recently updated (fallback for old state files)
+                        updated_at = current_state.get("updated_at") or current_state.get("created_at")
+                        if updated_at:
+                            if most_recent_time is None or updated_at > most_recent_time:
+                                most_recent_time = updated_at
+                                # Only use as fallback if no exact match found
+                                if state_data is None or state_data.get("session_id") != session_id:
+                                    state_data = current_state
+                    except Exception as e:
+                        logger.warning(f"Error reading state file {state_file_path}: {e}")
+                        continue
+            
+            # If found exact match, stop searching
+            if state_data and state_data.get("session_id") == session_id:
+                break
+    
+    return state_data
+
+
+def _overall_status(stages: dict) -> str:
+    """Determine overall status from stage statuses"""
+    if any(status == "failed" for status in stages.values()):
+        return "failed"
+    elif all(status == "completed" for status in stages.values()):
+        return "completed"
+    elif any(status == "running" for status in stages.values()):
+        return "running"
+    return "pending"
 
 
 @app.get("/api/status/{session_id}")
@@ -739,56 +932,26 @@ async def get_status(session_id: str):
         if not session_dir.exists():
             raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
         
-        # Get PDF files from session
-        pdf_files = list(session_dir.glob("*.pdf"))
-        if not pdf_files:
-            return {"session_id": session_id, "status": "no_files", "stages": {}}
+        # Session still waiting for a free slot
+        waiting_sessions = session_manager.get_waiting_sessions()
+        if session_id in waiting_sessions:
+            return {
+                "session_id": session_id,
+                "status": "waiting",
+                "queue_position": waiting_sessions.index(session_id) + 1,
+                "stages": {stage: "pending" for stage in ["rag", "summary", "plan", "generate"]}
+            }
         
-        # Determine project name and paths
-        if len(pdf_files) > 1:
-            project_name = f"session_{session_id[:8]}"
+        # O(1) lookup of states saved by this process (or indexed in Redis)
+        indexed = find_session_state(session_id)
+        if indexed:
+            state_data = indexed[1]
         else:
-            project_name = get_project_name(str(pdf_files[0]))
-        
-        # Try to find the state file matching session_id
-        from paper2slides.core.paths import get_base_dir
-        import json
-        
-        # Check both paper and general content types
-        state_data = None
-        most_recent_time = None
-        
-        for content_type in ["paper", "general"]:
-            base_dir = Path(get_base_dir(str(OUTPUT_DIR), project_name, content_type))
-            if base_dir.exists():
-                # Look for all state.json files in config directories
-                for state_file_path in base_dir.rglob("state.json"):
-                    if state_file_path.is_file():
-                        try:
-                            with open(state_file_path, 'r', encoding='utf-8') as f:
-                                current_state = json.load(f)
-                            
-                            # First priority: exact match by session_id
-                            if current_state.get("session_id") == session_id:
-                                state_data = current_state
-                                logger.debug(f"Found exact session match: {state_file_path}")
-                                break
-                            
-                            # Second priority: most recently updated (fallback for old state files)
-                            updated_at = current_state.get("updated_at") or current_state.get("created_at")
-                            if updated_at:
-                                if most_recent_time is None or updated_at > most_recent_time:
-                                    most_recent_time = updated_at
-                                    # Only use as fallback if no exact match found
-                                    if state_data is None or state_data.get("session_id") != session_id:
-                                        state_data = current_state
-                        except Exception as e:
-                            logger.warning(f"Error reading state file {state_file_path}: {e}")
-                            continue
-                
-                # If found exact match, stop searching
-                if state_data and state_data.get("session_id") == session_id:
-                    break
+            # Get PDF files from session
+            pdf_files = list(session_dir.glob("*.pdf"))
+            if not pdf_files:
+                return {"session_id": session_id, "status": "no_files", "stages": {}}
+            state_data = _scan_session_state(session_id, pdf_files)
         
         if not state_data:
             return {
@@ -802,20 +965,10 @@ async def get_status(session_id: str):
                 }
             }
         
-        # Determine overall status
         stages = state_data.get("stages", {})
-        if any(status == "failed" for status in stages.values()):
-            overall_status = "failed"
-        elif all(status == "completed" for status in stages.values()):
-            overall_status = "completed"
-        elif any(status == "running" for status in stages.values()):
-            overall_status = "running"
-        else:
-            overall_status = "pending"
-
         return {
             "session_id": session_id,
-            "status": overall_status,
+            "status": _overall_status(stages),
             "stages": stages,
             "error": state_data.get("error"),
             "updated_at": state_data.get("updated_at")
@@ -826,6 +979,64 @@ async def get_status(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/events/{session_id}")
+async def stream_events(session_id: str, request: Request):
+    """Stream pipeline progress of a session as server-sent events
+    
+    The first event is a snapshot of the current status, followed by stage
+    transitions (state, stage_started, stage_completed, stage_failed),
+    slide_generated events during the generate stage and a final
+    session_ended event.
+    """
+    if not (UPLOAD_DIR / session_id).exists():
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    
+    event_bus = get_event_bus()
+    # Subscribe before taking the snapshot so no transition is missed
+    queue = event_bus.subscribe(session_id)
+    
+    def format_event(event: dict) -> str:
+        return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    async def event_stream():
+        try:
+            waiting_sessions = session_manager.get_waiting_sessions()
+            indexed = find_session_state(session_id)
+            if session_id in waiting_sessions:
+                snapshot = {"status": "waiting", "queue_position": waiting_sessions.index(session_id) + 1}
+            elif indexed:
+                stages = indexed[1].get("stages", {})
+                snapshot = {"status": _overall_status(stages), "stages": stages, "error": indexed[1].get("error")}
+            else:
+                snapshot = {"status": "pending"}
+            yield format_event({"type": "snapshot", "session_id": session_id, **snapshot})
+            
+            # Sessions finished before the subscription get no more events
+            if snapshot["status"] in ("completed", "failed") and session_id not in session_manager.get_running_sessions():
+                return
+            
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing idle connections
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event)
+                if event["type"] == "session_ended":
+                    break
+        finally:
+            event_bus.unsubscribe(session_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/result/{session_id}")
 async def get_result(session_id: str):
     """Get the final result for a completed session"""
@@ -846,32 +1057,13 @@ async def get_result(session_id: str):
             image_files = [f for f in output_files if f['filename'].endswith(('.png', '.jpg', '.jpeg', '.webp'))]
             
             # Get output_type from state
-            session_dir = UPLOAD_DIR / session_id
-            pdf_files = list(session_dir.glob("*.pdf"))
-            if len(pdf_files) > 1:
-                project_name = f"session_{session_id[:8]}"
+            indexed = find_session_state(session_id)
+            if indexed:
+                state_data = indexed[1]
             else:
-                project_name = get_project_name(str(pdf_files[0]))
-            
-            # Try to get outputs type from state
-            from paper2slides.core.paths import get_base_dir
-            import json
-            
-            output_type = "slides"  # default
-            for content_type in ["paper", "general"]:
-                base_dir = Path(get_base_dir(str(OUTPUT_DIR), project_name, content_type))
-                if base_dir.exists():
-                    for state_file_path in base_dir.rglob("state.json"):
-                        if state_file_path.is_file():
-                            try:
-                                with open(state_file_path, 'r', encoding='utf-8') as f:
-                                    state_data = json.load(f)
-                                    output_type = state_data.get("config", {}).get("output_type", "slides")
-                                    break
-                            except:
-                                pass
-                    if output_type != "slides":
-                        break
+                pdf_files = list((UPLOAD_DIR / session_id).glob("*.pdf"))
+                state_data = _scan_session_state(session_id, pdf_files) if pdf_files else None
+            output_type = (state_data or {}).get("config", {}).get("output_type", "slides")
             
             response_data = {
                 "session_id": session_id,
@@ -911,6 +1103,65 @@ async def get_result(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/regenerate/{session_id}")
+async def regenerate(session_id: str, request: RegenerateRequest):
+    """Regenerate selected slides (1-based) of a completed session.
+
+    Unchanged slides are hard-linked from the previous output directory, so
+    only the selected slides are sent to the image provider.
+    """
+    indexed = find_session_state(session_id)
+    if not indexed:
+        pdf_files = list((UPLOAD_DIR / session_id).glob("*.pdf"))
+        state = _scan_session_state(session_id, pdf_files) if pdf_files else None
+        indexed = find_session_state(session_id) if state else None
+    if not indexed:
+        raise HTTPException(status_code=404, detail="Session not found")
+    config_dir, state = indexed
+    if state.get("stages", {}).get("generate") != "completed":
+        raise HTTPException(status_code=409, detail="Session has no completed deck to update")
+    if session_id in session_manager.get_running_sessions():
+        raise HTTPException(status_code=409, detail="Session is still running")
+    
+    # config_dir = <base_dir>/<mode>/<config_name>
+    base_dir = config_dir.parent.parent
+    try:
+        async with session_manager.get_project_lock(config_dir):
+            result = await regenerate_slides(base_dir, config_dir, state["config"], request.slide_indices)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Regeneration failed for session {session_id[:8]}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    output_files = [
+        {
+            "filename": file_path.name,
+            "path": str(file_path),
+            "relative_path": str(file_path.relative_to(OUTPUT_DIR))
+        }
+        for file_path in sorted(result["output_dir"].iterdir())
+        if file_path.is_file()
+    ]
+    if not hasattr(app.state, 'results'):
+        app.state.results = {}
+    app.state.results[session_id] = {
+        "output_dir": str(config_dir),
+        "output_files": output_files,
+        "num_files": len(output_files)
+    }
+    
+    return {
+        "session_id": session_id,
+        "output_dir": str(result["output_dir"]),
+        "regenerated": result["regenerated"],
+        "linked": result["linked"],
+        "output_files": output_files,
+    }
+
+
 @app.get("/api/download/{filepath:path}")
 async def download_file(filepath: str):
     """Download generated file (supports subdirectories)"""
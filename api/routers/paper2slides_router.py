@@ -2,14 +2,15 @@
 
 基于接口设计文档实现 REST API 接口。
 """
+import asyncio
 import logging
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from pydantic import BaseModel, Field
 
-from middleware.auth import token_decoder
+from middleware.auth import token_decoder, internal_service_decoder
 from services.task_service import get_task_service, TaskService
 from common.enums import AgentTypeEnum, TaskStatusEnum, PaperTypeEnum
 from common.constants import SERVICE_NAME, SERVICE_VERSION
@@ -36,6 +37,21 @@ class TaskCreateRequest(BaseModel):
     density: str = Field("medium", description="内容密度 (sparse/medium/dense)")
 
 
+class PaperRef(BaseModel):
+    """论文标识"""
+    paper_id: str = Field(..., description="论文ID")
+    source: str = Field(..., description="论文数据源 (arxiv/acl/neurips)")
+
+
+class PregenerateRequest(BaseModel):
+    """系统论文批量预生成请求"""
+    papers: List[PaperRef] = Field(..., min_length=1, description="论文列表")
+    agent_types: List[str] = Field(["poster"], min_length=1, description="任务类型列表 (poster/slides)")
+    style: Optional[str] = Field(None, description="风格偏好")
+    language: str = Field("ZH", description="语言 (ZH/EN)")
+    density: str = Field("medium", description="内容密度 (sparse/medium/dense)")
+
+
 class BaseResponse(BaseModel):
     """基础响应"""
     code: int = 200
@@ -127,6 +143,42 @@ async def create_task(
         raise HTTPException(status_code=500, detail=f"创建任务失败: {str(e)}")
 
 
+@router.post("/namespace/{namespace}/tasks/pregenerate", response_model=BaseResponse, summary="批量预生成")
+async def pregenerate_tasks(
+    namespace: str = Path(..., description="命名空间"),
+    request: PregenerateRequest = ...,
+    _: str = Depends(internal_service_decoder),
+    service: TaskService = Depends(get_service)
+):
+    """批量预生成系统论文的默认结果
+
+    内部接口，需以 SLIDES_INTERNAL_API_KEY 作为 Bearer 凭证调用，普通用户令牌无权访问。
+    已有默认结果的论文被跳过，其余以低优先级进入队列；队列已满时剩余条目
+    在 deferred 中返回，调用方稍后重试即可。
+    """
+    try:
+        for agent_type in request.agent_types:
+            if agent_type not in (AgentTypeEnum.POSTER.value, AgentTypeEnum.SLIDES.value):
+                raise HTTPException(status_code=400, detail="无效的任务类型，只支持 poster 或 slides")
+
+        result = await asyncio.to_thread(
+            service.pregenerate_system_papers,
+            papers=[paper.model_dump() for paper in request.papers],
+            agent_types=request.agent_types,
+            style=request.style or "doraemon",
+            language=request.language,
+            density=request.density
+        )
+
+        return BaseResponse(message="预生成任务已提交", data=result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量预生成失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"批量预生成失败: {str(e)}")
+
+
 @router.delete("/namespace/{namespace}/tasks/{task_id}/delete", response_model=BaseResponse, summary="删除任务")
 async def delete_task(
     namespace: str = Path(..., description="命名空间"),
@@ -218,12 +270,15 @@ async def list_tasks(
     source: str = Query(..., description="论文数据源"),
     page: int = Query(1, ge=0, description="页码（0表示查询所有）"),
     page_size: int = Query(10, ge=1, le=100, description="每页大小"),
+    cursor: Optional[str] = Query(None, description="翻页游标（上一页返回的 next_cursor）"),
+    with_total: Optional[bool] = Query(None, description="是否返回总数（默认仅在未传入 cursor 时返回，否则 total 为 null）"),
     token_payload: dict[str, None] = Depends(token_decoder),
     service: TaskService = Depends(get_service)
 ):
     """分页查询任务列表
 
     根据用户ID和paperID分页查询任务，单条记录包含标题、类型、时间。
+    传入 cursor 时从上一页最后一条之后继续查询。
     """
     try:
         user_id = token_payload.get("user_id", "")
@@ -235,11 +290,17 @@ async def list_tasks(
             paper_id=paper_id,
             source=source,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            with_total=with_total
         )
 
         return BaseResponse(message="查询成功", data=result)
 
+    except HTTPException:
+        raise
+    except InvalidRequestException as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"查询任务列表失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"查询任务列表失败: {str(e)}")
@@ -251,7 +312,7 @@ async def get_queue_status(
 ):
     """获取任务队列状态
 
-    返回当前运行中和等待中的任务数量。
+    返回当前运行中和等待中的任务数量，以及按优先级统计的等待数和排队用户数。
     """
     status = service.get_queue_status()
     return BaseResponse(data=status)
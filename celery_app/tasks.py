@@ -5,6 +5,7 @@
 import os
 import sys
 import asyncio
+import threading
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 from datetime import datetime
@@ -17,12 +18,25 @@ if str(PROJECT_ROOT) not in sys.path:
 from celery_app.celery_config import celery_app
 from celery import states
 from celery.exceptions import Ignore
-from common.redis_manager import get_redis_queue_manager
+from common.redis_manager import get_redis_queue_manager, LeaseHeartbeat, LeaseLostError
 from utilities.log_manager import get_celery_logger
 
 # 使用 LogManager 的 Celery logger
 logger = get_celery_logger()
 
+# 每个工作线程一个常驻事件循环，异步客户端和连接池在任务之间复用
+_thread_local = threading.local()
+
+
+def _get_worker_loop() -> asyncio.AbstractEventLoop:
+    """获取当前工作线程的事件循环（首次调用时创建，线程生命周期内不关闭）"""
+    loop = getattr(_thread_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _thread_local.loop = loop
+    return loop
+
 
 @celery_app.task(bind=True, name="celery_app.tasks.generate_slides_task")
 def generate_slides_task(
@@ -30,10 +44,10 @@ def generate_slides_task(
     result_id: str,
     paper_id: str,
     source: str,
-    source_path: str,
-    paper_type: str,
-    agent_type: str,
-    user_id: str,
+    source_path: Optional[str] = None,
+    paper_type: Optional[str] = None,
+    agent_type: Optional[str] = None,
+    user_id: Optional[str] = None,
     bucket: str = "kb-paper-parsed",
     style: str = "doraemon",
     language: str = "ZH",
@@ -48,11 +62,11 @@ def generate_slides_task(
         result_id: 任务ID
         paper_id: 论文ID
         source: 论文来源
-        source_path: MinIO文件路径（包括桶名）
+        source_path: MinIO文件路径（包括桶名，已不使用，保留以兼容旧消息）
         paper_type: 论文类型 (system/user)
         agent_type: 任务类型 (poster/slides)
         user_id: 用户ID
-        bucket: 论文解析结果桶名
+        bucket: 论文解析结果桶名（已不使用，保留以兼容旧消息）
         style: 风格类型
         language: 语言 (ZH/EN)
         density: 内容密度
@@ -64,41 +78,54 @@ def generate_slides_task(
     logger.info(f"开始执行任务: {result_id}, update_system={update_system}")
 
     queue_manager = get_redis_queue_manager()
+    recorded = False
 
     try:
-        # 使用 LangGraph 智能体执行任务
-        from agents.slides_agent import SlidesAgent
-
-        agent = SlidesAgent()
-
-        # 创建新的事件循环并运行智能体
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # 使用 LangGraph 智能体执行任务（工作流在进程内只编译一次）
+        from agents.slides_agent import get_slides_agent
+
+        agent = get_slides_agent()
+
+        # 在当前工作线程的常驻事件循环中运行智能体
+        loop = _get_worker_loop()
+
+        run = loop.create_task(
+            agent.run(
+                result_id=result_id,
+                paper_id=paper_id,
+                source=source,
+                paper_type=paper_type,
+                agent_type=agent_type,
+                user_id=user_id,
+                style=style,
+                language=language,
+                density=density,
+                update_system=update_system
+            )
+        )
 
+        # 开始执行时认领运行槽，之后心跳续约；线程异常退出时租约过期后由回收器释放运行槽。
+        # 租约被回收或任务被取消后心跳取消本次运行（threads 池中 revoke 无法终止任务）
         try:
-            result = loop.run_until_complete(
-                agent.run(
-                    result_id=result_id,
-                    paper_id=paper_id,
-                    source=source,
-                    source_path=source_path,
-                    paper_type=paper_type,
-                    agent_type=agent_type,
-                    user_id=user_id,
-                    bucket=bucket,
-                    style=style,
-                    language=language,
-                    density=density,
-                    update_system=update_system
-                )
-            )
-        finally:
-            loop.close()
+            with LeaseHeartbeat(
+                queue_manager,
+                result_id,
+                on_lost=lambda: loop.call_soon_threadsafe(run.cancel)
+            ):
+                result = loop.run_until_complete(run)
+        except (LeaseLostError, asyncio.CancelledError):
+            if not run.done():
+                run.cancel()
+                loop.run_until_complete(asyncio.gather(run, return_exceptions=True))
+            # 任务状态和运行槽已由回收器或取消操作处理
+            logger.warning(f"任务的运行槽租约已失效，中止执行: {result_id}")
+            raise Ignore()
 
         logger.info(f"任务执行完成: {result_id}, status={result.get('status')}")
 
         # 检查任务状态，如果是失败则抛出异常
         if result.get("status") == "failed":
+            recorded = result.get("recorded", False)
             error_msg = result.get("error_message", "任务执行失败")
             logger.error(f"任务失败: {result_id}, 错误: {error_msg}")
             # 抛出异常，让Celery自动标记任务为失败
@@ -107,22 +134,27 @@ def generate_slides_task(
         # 任务成功完成
         logger.info(f"任务成功: {result_id}")
 
-        # 任务完成，减少运行中计数并触发调度
-        queue_manager.decrement_running()
+        # 任务完成，释放运行槽并触发调度
+        queue_manager.release_running(result_id)
         _schedule_next_task(result_id)
 
         return result
 
+    except Ignore:
+        raise
+
     except Exception as e:
         logger.error(f"任务执行异常: {result_id}, 错误: {e}", exc_info=True)
 
-        # 标记任务失败（如果还没有标记）
-        from repositories.user_paper_repo import get_user_paper_repo
-        user_repo = get_user_paper_repo()
-        user_repo.mark_failed(result_id, str(e))
+        # 标记任务失败（智能体已写入失败状态时不再重复更新）
+        if not recorded:
+            from repositories.user_paper_repo import get_user_paper_repo
+            user_repo = get_user_paper_repo()
+            user_repo.mark_failed(result_id, str(e))
+            user_repo.fail_coalesced_tasks(result_id, str(e))
 
-        # 任务失败，减少运行中计数并触发调度
-        queue_manager.decrement_running()
+        # 任务失败，释放运行槽并触发调度
+        queue_manager.release_running(result_id)
         _schedule_next_task(result_id)
 
         # 重新抛出异常，让Celery处理
@@ -184,16 +216,20 @@ def cancel_task(result_id: str) -> bool:
         logger.warning(f"任务不存在: {result_id}")
         return False
 
-    # 尝试撤销 Celery 任务
-    celery_app.control.revoke(result_id, terminate=True, signal="SIGTERM")
+    # 尝试撤销 Celery 任务（已开始的任务在运行槽释放后的下次心跳时自行中止）
+    celery_app.control.revoke(result_id)
 
     # 更新任务状态为失败
     user_repo.mark_failed(result_id, "任务已被用户取消")
 
-    # 如果任务正在运行，减少计数并触发调度
     from common.enums import TaskStatusEnum
     if task.status == TaskStatusEnum.RUNNING.value:
-        queue_manager.decrement_running()
+        queue_manager.release_running(result_id)
+
+    # 合并到该任务的其他请求由最早的一个接手生成，然后触发调度
+    if task.status in (TaskStatusEnum.WAITING.value, TaskStatusEnum.RUNNING.value):
+        from services.task_service import get_task_service
+        get_task_service().promote_coalesced_follower(task)
         _schedule_next_task(result_id)
 
     # 清理临时文件
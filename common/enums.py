@@ -61,3 +61,9 @@ class DensityEnum(str, Enum):
     SPARSE = "sparse"    # 稀疏
     MEDIUM = "medium"    # 中等
     DENSE = "dense"      # 密集
+
+
+class TaskPriorityEnum(str, Enum):
+    """任务优先级枚举"""
+    INTERACTIVE = "interactive"    # 用户交互请求
+    BATCH = "batch"                # 系统批量预生成
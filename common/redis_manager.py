@@ -2,15 +2,197 @@
 
 使用Redis管理任务队列状态，替代MongoDB查询，提升性能。
 """
+import time
 import logging
-from typing import Optional, List
+import threading
+from typing import Optional, List, Iterable, Callable
 import redis
 from redis.exceptions import RedisError
 
 from config.settings import get_settings
+from common.enums import TaskPriorityEnum
 
 logger = logging.getLogger(__name__)
 
+# 运行槽以租约形式记录在有序集合中（member=任务ID, score=过期时间戳），
+# 运行中任务数即有序集合大小；任务结束时删除租约，进程异常退出时租约过期后由回收器释放。
+# 准入或调度时分配的运行槽以分派有效期（task_dispatch_ttl）登记，覆盖 Celery 排队时间；
+# worker 开始执行时续约为心跳租约（task_lease_ttl），之后由心跳续约
+
+# 等待队列是有序集合（member=任务ID, score=调度顺序），分数越小越先调度：
+#   score = 入队时间 + 优先级延迟 + 该用户已等待任务数 * 公平份额步长
+# 低优先级任务的延迟即老化期限，等待超过该时长后排在新到的高优先级任务之前；
+# 同一用户的后续任务依次后移，不会占满队头。
+# 任务元数据 meta: 任务ID -> "用户ID\t优先级"，用户等待数 users: 用户ID -> 数量
+
+# 准入脚本：运行槽未满则创建租约，否则在等待队列及用户配额未满时入队
+# KEYS: leases, waiting, meta, users
+# ARGV: task_id, user_id, priority, running_limit, max_waiting, max_waiting_per_user,
+#       dispatch_expiry, now, priority_delay, fair_share_step
+#       running_limit 为该优先级可用的运行槽数；为 0 时只入队不运行
+# 返回: 1 立即运行（已创建租约）, 0 已加入等待队列,
+#       -1 等待队列已满, -2 该用户等待任务已达上限（未做任何修改）
+ADMIT_SCRIPT = """
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[4]) then
+    redis.call('ZADD', KEYS[1], ARGV[7], ARGV[1])
+    return 1
+end
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[5]) then
+    return -1
+end
+local user_waiting = tonumber(redis.call('HGET', KEYS[4], ARGV[2]) or '0')
+if user_waiting >= tonumber(ARGV[6]) then
+    return -2
+end
+local score = tonumber(ARGV[8]) + tonumber(ARGV[9]) + user_waiting * tonumber(ARGV[10])
+redis.call('ZADD', KEYS[2], score, ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2] .. '\t' .. ARGV[3])
+redis.call('HINCRBY', KEYS[4], ARGV[2], 1)
+return 0
+"""
+
+# 调度脚本：按分数顺序取第一个可运行的等待任务并为其创建租约
+# KEYS: leases, waiting, meta, users
+# ARGV: max_running, batch_running_limit, dispatch_expiry, batch_priority
+#       batch_priority 的任务只在运行数小于 batch_running_limit 时调度
+# 返回: 任务ID, 无可调度任务时返回 nil
+CLAIM_NEXT_SCRIPT = """
+local running = redis.call('ZCARD', KEYS[1])
+if running >= tonumber(ARGV[1]) then
+    return false
+end
+local candidates = redis.call('ZRANGE', KEYS[2], 0, -1)
+for _, task_id in ipairs(candidates) do
+    local meta = redis.call('HGET', KEYS[3], task_id) or ''
+    local sep = string.find(meta, '\t', 1, true)
+    local user_id = sep and string.sub(meta, 1, sep - 1) or ''
+    local priority = sep and string.sub(meta, sep + 1) or ''
+    if priority ~= ARGV[4] or running < tonumber(ARGV[2]) then
+        redis.call('ZREM', KEYS[2], task_id)
+        redis.call('HDEL', KEYS[3], task_id)
+        if tonumber(redis.call('HINCRBY', KEYS[4], user_id, -1)) <= 0 then
+            redis.call('HDEL', KEYS[4], user_id)
+        end
+        redis.call('ZADD', KEYS[1], ARGV[3], task_id)
+        return task_id
+    end
+end
+return false
+"""
+
+# 续约脚本：仅续约仍存在的租约（已被回收或释放的租约不会复活），worker 开始执行时也用它认领运行槽
+# KEYS: leases
+# ARGV: task_id, lease_expiry
+# 返回: 1 续约成功, 0 租约不存在
+RENEW_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# 回收脚本：删除并返回所有已过期的租约
+# KEYS: leases
+# ARGV: now
+# 返回: 过期的任务ID列表
+REAP_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if #expired > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+end
+return expired
+"""
+
+# 移除脚本：从等待队列中移除指定任务
+# KEYS: waiting, meta, users
+# ARGV: task_id
+# 返回: 移除的数量
+REMOVE_WAITING_SCRIPT = """
+local removed = redis.call('ZREM', KEYS[1], ARGV[1])
+if removed > 0 then
+    local meta = redis.call('HGET', KEYS[2], ARGV[1]) or ''
+    local sep = string.find(meta, '\t', 1, true)
+    local user_id = sep and string.sub(meta, 1, sep - 1) or ''
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    if tonumber(redis.call('HINCRBY', KEYS[3], user_id, -1)) <= 0 then
+        redis.call('HDEL', KEYS[3], user_id)
+    end
+end
+return removed
+"""
+
+# 在途任务登记脚本：无在途任务时登记为当前任务
+# KEYS: inflight
+# ARGV: task_id, ttl_seconds
+# 返回: nil 登记成功（当前任务为首个任务）, 否则返回已登记的任务ID
+CLAIM_INFLIGHT_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    return current
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return false
+"""
+
+# 在途任务接管脚本：登记的任务仍为 expected 时替换为新任务
+# KEYS: inflight
+# ARGV: expected_task_id, task_id, ttl_seconds
+# 返回: 1 接管成功, 0 登记已变化
+REPLACE_INFLIGHT_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and current ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# 在途任务注销脚本：仅当登记的仍是该任务时删除
+# KEYS: inflight
+# ARGV: task_id
+# 返回: 删除的数量
+RELEASE_INFLIGHT_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# admit 的返回值
+ADMIT_RUN_NOW = "run_now"
+ADMIT_WAIT_IN_QUEUE = "wait_in_queue"
+ADMIT_QUEUE_FULL = "queue_full"
+ADMIT_USER_QUOTA_FULL = "user_quota_full"
+
+# 启动恢复时每批执行的命令数
+RESTORE_BATCH_SIZE = 500
+
+
+def delete_keys_by_pattern(client: redis.Redis, pattern: str, batch_size: int = RESTORE_BATCH_SIZE) -> int:
+    """按模式删除键
+
+    用 SCAN 增量遍历并分批 UNLINK，不像 KEYS 那样长时间阻塞 Redis。
+
+    Args:
+        client: Redis连接
+        pattern: 键模式
+        batch_size: 每批删除数量
+
+    Returns:
+        删除的键数量
+    """
+    deleted = 0
+    batch = []
+    for key in client.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            deleted += client.unlink(*batch)
+            batch = []
+    if batch:
+        deleted += client.unlink(*batch)
+    return deleted
+
 
 class RedisQueueManager:
     """基于Redis的任务队列管理器
@@ -21,6 +203,7 @@ class RedisQueueManager:
     def __init__(self):
         self._settings = get_settings()
         self._redis = None
+        self._scripts = {}
 
     @property
     def redis(self) -> redis.Redis:
@@ -34,21 +217,103 @@ class RedisQueueManager:
             )
         return self._redis
 
+    def _script(self, source: str):
+        """获取已注册的Lua脚本（EVALSHA，脚本缓存丢失时自动回退EVAL）"""
+        script = self._scripts.get(source)
+        if script is None:
+            script = self.redis.register_script(source)
+            self._scripts[source] = script
+        return script
+
     @property
     def key_running(self) -> str:
-        """运行中任务计数器key"""
+        """旧版运行中任务计数器key（仅在重置时清理）"""
         return "slide_svc:queue:running"
 
+    @property
+    def key_leases(self) -> str:
+        """运行槽租约有序集合key"""
+        return "slide_svc:queue:leases"
+
+    def _lease_expiry(self) -> float:
+        """心跳租约的过期时间戳"""
+        return time.time() + self._settings.task_lease_ttl
+
+    def _dispatch_expiry(self) -> float:
+        """新分配运行槽（尚未被 worker 认领）的过期时间戳"""
+        return time.time() + self._settings.task_dispatch_ttl
+
+    def key_inflight(self, coalesce_key: str) -> str:
+        """在途生成任务key（相同参数的请求合并到该任务）"""
+        return f"slide_svc:inflight:{coalesce_key}"
+
     @property
     def key_waiting(self) -> str:
-        """等待队列key"""
+        """等待队列有序集合key"""
+        return "slide_svc:queue:waiting:zset"
+
+    @property
+    def key_waiting_meta(self) -> str:
+        """等待任务元数据哈希key（任务ID -> 用户ID与优先级）"""
+        return "slide_svc:queue:waiting:meta"
+
+    @property
+    def key_waiting_users(self) -> str:
+        """各用户等待任务数哈希key"""
+        return "slide_svc:queue:waiting:users"
+
+    @property
+    def key_legacy_waiting(self) -> str:
+        """旧版等待队列列表key（仅在重置时清理）"""
         return "slide_svc:queue:waiting"
 
     @property
     def key_waiting_count(self) -> str:
-        """等待队列计数器key"""
+        """旧版等待队列计数器key（仅在重置时清理）"""
         return "slide_svc:queue:waiting:count"
 
+    @property
+    def _waiting_keys(self) -> List[str]:
+        return [self.key_waiting, self.key_waiting_meta, self.key_waiting_users]
+
+    def _batch_running_limit(self) -> int:
+        """批量任务可占用的运行槽数"""
+        return max(1, self._settings.max_running_tasks - self._settings.interactive_reserved_slots)
+
+    def _running_limit(self, priority: str) -> int:
+        """指定优先级的任务可立即运行的运行槽上限"""
+        if priority == TaskPriorityEnum.BATCH.value:
+            return self._batch_running_limit()
+        return self._settings.max_running_tasks
+
+    def _priority_delay(self, priority: str) -> int:
+        """指定优先级的调度延迟（秒）"""
+        if priority == TaskPriorityEnum.BATCH.value:
+            return self._settings.batch_priority_delay
+        return 0
+
+    def _enqueue(self, task_id: str, user_id: str, priority: str,
+                 running_limit: int, enqueued_at: Optional[float] = None,
+                 enforce_limits: bool = True, client=None) -> int:
+        """执行准入脚本，返回脚本结果码（传入 pipeline 时结果在 execute 时返回）"""
+        no_limit = 2 ** 31
+        return self._script(ADMIT_SCRIPT)(
+            keys=[self.key_leases, *self._waiting_keys],
+            args=[
+                task_id,
+                user_id or "",
+                priority,
+                running_limit,
+                self._settings.max_waiting_tasks if enforce_limits else no_limit,
+                self._settings.max_waiting_per_user if enforce_limits else no_limit,
+                self._dispatch_expiry(),
+                enqueued_at if enqueued_at is not None else time.time(),
+                self._priority_delay(priority),
+                self._settings.fair_share_step
+            ],
+            client=client
+        )
+
     def can_run_now(self) -> bool:
         """检查是否可以立即运行新任务
 
@@ -56,108 +321,269 @@ class RedisQueueManager:
             True 如果可以立即运行，False 否则
         """
         try:
-            running = self.redis.get(self.key_running) or "0"
-            running_count = int(running)
-            return running_count < self._settings.max_running_tasks
+            return self.redis.zcard(self.key_leases) < self._settings.max_running_tasks
         except RedisError as e:
             logger.error(f"Redis查询失败: {e}")
             return False
 
-    def add_to_waiting_queue(self, task_id: str) -> bool:
+    def admit(self, task_id: str, user_id: str,
+              priority: str = TaskPriorityEnum.INTERACTIVE.value) -> str:
+        """原子地为新任务申请运行槽或等待位置
+
+        在一次服务端脚本中完成"检查运行数 -> 占用运行槽"或
+        "检查等待数及用户配额 -> 入队"，多个API进程并发调用也不会超出
+        max_running_tasks / max_waiting_tasks / max_waiting_per_user。
+        批量任务不会占用为交互任务保留的运行槽。
+
+        Args:
+            task_id: 任务ID
+            user_id: 用户ID
+            priority: 任务优先级
+
+        Returns:
+            ADMIT_RUN_NOW - 已创建运行槽租约，调用方负责提交任务并在结束时 release_running
+            ADMIT_WAIT_IN_QUEUE - 已加入等待队列
+            ADMIT_QUEUE_FULL - 队列已满，未做任何修改
+            ADMIT_USER_QUOTA_FULL - 该用户等待任务已达上限，未做任何修改
+
+        Raises:
+            RedisError: Redis 不可用
+        """
+        result = self._enqueue(task_id, user_id, priority, self._running_limit(priority))
+        if result == 1:
+            logger.info(f"任务获得运行槽: {task_id}")
+            return ADMIT_RUN_NOW
+        if result == 0:
+            logger.info(f"任务加入等待队列: {task_id}, 用户: {user_id}, 优先级: {priority}")
+            return ADMIT_WAIT_IN_QUEUE
+        if result == -2:
+            return ADMIT_USER_QUOTA_FULL
+        return ADMIT_QUEUE_FULL
+
+    def add_to_waiting_queue(self, task_id: str, user_id: str,
+                             priority: str = TaskPriorityEnum.INTERACTIVE.value,
+                             enforce_limits: bool = True) -> bool:
         """添加任务到等待队列
 
         Args:
             task_id: 任务ID
+            user_id: 用户ID
+            priority: 任务优先级
+            enforce_limits: 是否检查等待队列与用户配额（已受理的任务重新入队时不检查）
 
         Returns:
-            True 如果成功添加，False 如果队列已满
+            True 如果成功添加，False 如果队列或用户配额已满
         """
         try:
-            waiting_count = self.redis.llen(self.key_waiting)
-            if waiting_count >= self._settings.max_waiting_tasks:
+            result = self._enqueue(task_id, user_id, priority, 0, enforce_limits=enforce_limits)
+            if result < 0:
                 return False
-
-            self.redis.rpush(self.key_waiting, task_id)
-            self.redis.incr(self.key_waiting_count)
-            logger.info(f"任务加入等待队列: {task_id}, 当前等待数: {waiting_count + 1}")
+            logger.info(f"任务加入等待队列: {task_id}, 用户: {user_id}, 优先级: {priority}")
             return True
         except RedisError as e:
             logger.error(f"添加到等待队列失败: {e}")
             return False
 
+    def remove_from_waiting_queue(self, task_id: str) -> bool:
+        """从等待队列中移除指定任务
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            是否移除了任务
+        """
+        try:
+            removed = self._script(REMOVE_WAITING_SCRIPT)(
+                keys=self._waiting_keys,
+                args=[task_id]
+            )
+            if removed:
+                logger.info(f"任务移出等待队列: {task_id}")
+            return removed > 0
+        except RedisError as e:
+            logger.error(f"移出等待队列失败: {e}")
+            return False
+
     def schedule_next(self) -> Optional[str]:
         """从等待队列调度下一个任务
 
+        运行槽未满时原子地取出分数最小的可运行任务并为其创建运行槽租约；
+        批量任务只在未占用交互保留运行槽时调度，交互任务可越过它们。
+
         Returns:
-            任务ID，如果没有任务则返回None
+            任务ID，如果没有可调度的任务则返回None
         """
         try:
-            task_id = self.redis.lpop(self.key_waiting)
+            task_id = self._script(CLAIM_NEXT_SCRIPT)(
+                keys=[self.key_leases, *self._waiting_keys],
+                args=[
+                    self._settings.max_running_tasks,
+                    self._batch_running_limit(),
+                    self._dispatch_expiry(),
+                    TaskPriorityEnum.BATCH.value
+                ]
+            )
             if task_id:
-                self.redis.decr(self.key_waiting_count)
                 logger.info(f"从等待队列调度任务: {task_id}")
             return task_id
         except RedisError as e:
             logger.error(f"调度任务失败: {e}")
             return None
 
-    def increment_running(self) -> int:
-        """增加运行中任务计数
+    def renew_lease(self, task_id: str) -> Optional[bool]:
+        """续约任务的运行槽租约（worker 开始执行时认领运行槽，之后由心跳调用）
+
+        Args:
+            task_id: 任务ID
 
         Returns:
-            当前的运行中任务数
+            True 续约成功，False 租约已不存在（已释放或已被回收），
+            None Redis 暂时不可用（租约状态未知，调用方应稍后重试）
         """
         try:
-            count = self.redis.incr(self.key_running)
-            logger.info(f"运行中任务数增加: {count}")
-            return count
+            return self._script(RENEW_SCRIPT)(
+                keys=[self.key_leases],
+                args=[task_id, self._lease_expiry()]
+            ) == 1
         except RedisError as e:
-            logger.error(f"增加运行中计数失败: {e}")
-            return 0
+            logger.error(f"续约失败: {task_id}, 错误: {e}")
+            return None
+
+    def release_running(self, task_id: str) -> int:
+        """释放任务的运行槽租约
 
-    def decrement_running(self) -> int:
-        """减少运行中任务计数
+        重复释放或释放已被回收的租约不会影响其他任务的运行槽。
+
+        Args:
+            task_id: 任务ID
 
         Returns:
             当前的运行中任务数
         """
         try:
-            count = self.redis.decr(self.key_running)
-            if count < 0:
-                self.redis.set(self.key_running, 0)
-                count = 0
-            logger.info(f"运行中任务数减少: {count}")
+            pipe = self.redis.pipeline()
+            pipe.zrem(self.key_leases, task_id)
+            pipe.zcard(self.key_leases)
+            removed, count = pipe.execute()
+            if removed:
+                logger.info(f"释放运行槽: {task_id}, 运行中任务数: {count}")
             return count
         except RedisError as e:
-            logger.error(f"减少运行中计数失败: {e}")
+            logger.error(f"释放运行槽失败: {task_id}, 错误: {e}")
             return 0
 
+    def reap_expired_leases(self) -> List[str]:
+        """回收所有已过期的租约
+
+        Returns:
+            租约过期的任务ID列表
+        """
+        try:
+            expired = self._script(REAP_SCRIPT)(
+                keys=[self.key_leases],
+                args=[time.time()]
+            )
+            if expired:
+                logger.warning(f"回收过期租约: {expired}")
+            return expired
+        except RedisError as e:
+            logger.error(f"回收过期租约失败: {e}")
+            return []
+
+    def claim_inflight(self, coalesce_key: str, task_id: str) -> Optional[str]:
+        """登记在途生成任务
+
+        Args:
+            coalesce_key: 合并键（相同生成参数得到相同的键）
+            task_id: 任务ID
+
+        Returns:
+            None 表示登记成功；否则返回已在途的任务ID
+
+        Raises:
+            RedisError: Redis 不可用
+        """
+        return self._script(CLAIM_INFLIGHT_SCRIPT)(
+            keys=[self.key_inflight(coalesce_key)],
+            args=[task_id, self._settings.task_coalesce_ttl]
+        ) or None
+
+    def replace_inflight(self, coalesce_key: str, expected_task_id: str, task_id: str) -> bool:
+        """接管已失效的在途登记
+
+        Args:
+            coalesce_key: 合并键
+            expected_task_id: 失效的在途任务ID
+            task_id: 新任务ID
+
+        Returns:
+            是否接管成功
+        """
+        try:
+            return self._script(REPLACE_INFLIGHT_SCRIPT)(
+                keys=[self.key_inflight(coalesce_key)],
+                args=[expected_task_id, task_id, self._settings.task_coalesce_ttl]
+            ) == 1
+        except RedisError as e:
+            logger.error(f"接管在途任务失败: {task_id}, 错误: {e}")
+            return False
+
+    def release_inflight(self, coalesce_key: str, task_id: str) -> bool:
+        """注销在途生成任务（只注销自己的登记）
+
+        Args:
+            coalesce_key: 合并键
+            task_id: 任务ID
+
+        Returns:
+            是否注销
+        """
+        try:
+            return self._script(RELEASE_INFLIGHT_SCRIPT)(
+                keys=[self.key_inflight(coalesce_key)],
+                args=[task_id]
+            ) > 0
+        except RedisError as e:
+            logger.error(f"注销在途任务失败: {task_id}, 错误: {e}")
+            return False
+
     def get_queue_status(self) -> dict:
         """获取队列状态
 
         Returns:
-            {"running": int, "waiting": int, "max_running": int, "max_waiting": int}
+            {"running": int, "waiting": int, "max_running": int, "max_waiting": int,
+             "max_waiting_per_user": int, "waiting_by_priority": dict, "waiting_users": int}
         """
+        status = {
+            "running": 0,
+            "waiting": 0,
+            "max_running": self._settings.max_running_tasks,
+            "max_waiting": self._settings.max_waiting_tasks,
+            "max_waiting_per_user": self._settings.max_waiting_per_user,
+            "waiting_by_priority": {p.value: 0 for p in TaskPriorityEnum},
+            "waiting_users": 0
+        }
         try:
-            running = int(self.redis.get(self.key_running) or "0")
-            waiting = self.redis.llen(self.key_waiting)
-            return {
-                "running": running,
-                "waiting": waiting,
-                "max_running": self._settings.max_running_tasks,
-                "max_waiting": self._settings.max_waiting_tasks
-            }
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zcard(self.key_leases)
+            pipe.zcard(self.key_waiting)
+            pipe.hvals(self.key_waiting_meta)
+            pipe.hlen(self.key_waiting_users)
+            running, waiting, metas, users = pipe.execute()
+            status["running"] = running
+            status["waiting"] = waiting
+            status["waiting_users"] = users
+            for meta in metas:
+                priority = meta.partition("\t")[2]
+                if priority in status["waiting_by_priority"]:
+                    status["waiting_by_priority"][priority] += 1
         except RedisError as e:
             logger.error(f"获取队列状态失败: {e}")
-            return {
-                "running": 0,
-                "waiting": 0,
-                "max_running": self._settings.max_running_tasks,
-                "max_waiting": self._settings.max_waiting_tasks
-            }
+        return status
 
     def get_waiting_queue(self, start: int = 0, end: int = -1) -> List[str]:
-        """获取等待队列中的任务ID列表
+        """获取等待队列中的任务ID列表（按调度顺序）
 
         Args:
             start: 起始位置
@@ -167,7 +593,7 @@ class RedisQueueManager:
             任务ID列表
         """
         try:
-            return self.redis.lrange(self.key_waiting, start, end)
+            return self.redis.zrange(self.key_waiting, start, end)
         except RedisError as e:
             logger.error(f"获取等待队列失败: {e}")
             return []
@@ -179,31 +605,14 @@ class RedisQueueManager:
             清除的任务数量
         """
         try:
-            count = self.redis.delete(self.key_waiting)
-            self.redis.set(self.key_waiting_count, 0)
+            count = self.redis.zcard(self.key_waiting)
+            self.redis.delete(*self._waiting_keys)
             logger.info(f"清空等待队列: {count} 个任务")
             return count
         except RedisError as e:
             logger.error(f"清空等待队列失败: {e}")
             return 0
 
-    def reset_running_count(self, count: int = 0) -> bool:
-        """重置运行中任务计数
-
-        Args:
-            count: 新的计数值
-
-        Returns:
-            是否成功
-        """
-        try:
-            self.redis.set(self.key_running, count)
-            logger.info(f"重置运行中计数: {count}")
-            return True
-        except RedisError as e:
-            logger.error(f"重置运行中计数失败: {e}")
-            return False
-
     def reset_all_queue_state(self) -> bool:
         """重置所有队列状态到初始状态
         
@@ -212,9 +621,9 @@ class RedisQueueManager:
         """
         try:
             # 重置所有队列相关的键
-            self.redis.set(self.key_running, 0)
-            self.redis.delete(self.key_waiting)
-            self.redis.set(self.key_waiting_count, 0)
+            self.redis.delete(self.key_running, self.key_leases)
+            self.redis.delete(*self._waiting_keys)
+            self.redis.delete(self.key_legacy_waiting, self.key_waiting_count)
             logger.info("已重置所有队列状态")
             return True
         except RedisError as e:
@@ -232,43 +641,167 @@ class RedisQueueManager:
         """
         return task_id is not None and isinstance(task_id, str) and len(task_id) > 0
 
-    def init_from_mongo(self, running_count: int, waiting_task_ids: list) -> None:
+    def init_from_mongo(self, running_task_ids: list, waiting_tasks: Iterable[dict]) -> int:
         """从MongoDB初始化Redis队列状态
 
-        在系统启动时调用，确保Redis状态与MongoDB一致。
+        在系统启动时调用，确保Redis状态与MongoDB一致。运行中任务获得
+        新租约，若没有心跳续约会在租约过期后被回收。等待任务按原入队
+        时间重新排序，保留已累积的等待时长；已入队的任务不受队列上限限制。
+        等待任务分批通过 pipeline 入队，可以直接传入数据库游标。
 
         Args:
-            running_count: MongoDB中运行中的任务数
-            waiting_task_ids: MongoDB中等待中的任务ID列表
+            running_task_ids: MongoDB中运行中的任务ID列表
+            waiting_tasks: MongoDB中等待中的任务，每项包含
+                task_id、user_id、priority、enqueued_at（时间戳）
+
+        Returns:
+            恢复到等待队列的任务数量
         """
+        restored = 0
         try:
-            # 重置运行中计数
-            self.redis.set(self.key_running, running_count)
-            logger.info(f"初始化运行中计数: {running_count}")
+            # 重建运行槽租约
+            self.redis.delete(self.key_running, self.key_leases)
+            valid_running_ids = [tid for tid in running_task_ids if self.is_valid_task_id(tid)]
+            if valid_running_ids:
+                expiry = self._lease_expiry()
+                self.redis.zadd(self.key_leases, {tid: expiry for tid in valid_running_ids})
+            logger.info(f"初始化运行槽租约: {len(valid_running_ids)}")
 
             # 清空并重建等待队列
-            self.redis.delete(self.key_waiting)
-            self.redis.delete(self.key_waiting_count)
-            if waiting_task_ids:
-                # 只保留有效的任务ID
-                valid_task_ids = [tid for tid in waiting_task_ids if self.is_valid_task_id(tid)]
-                if valid_task_ids:
-                    self.redis.rpush(self.key_waiting, *valid_task_ids)
-                    logger.info(f"初始化等待队列: {len(valid_task_ids)} 个任务")
-                else:
-                    logger.info("等待队列为空")
-            else:
-                logger.info("等待队列为空")
+            self.redis.delete(*self._waiting_keys)
+            self.redis.delete(self.key_legacy_waiting, self.key_waiting_count)
+            batch = []
+            for task in waiting_tasks or []:
+                if not self.is_valid_task_id(task.get("task_id")):
+                    continue
+                batch.append(task)
+                if len(batch) >= RESTORE_BATCH_SIZE:
+                    restored += self._restore_waiting_batch(batch)
+                    batch = []
+            if batch:
+                restored += self._restore_waiting_batch(batch)
+            logger.info(f"初始化等待队列: {restored} 个任务")
 
-            self.redis.set(self.key_waiting_count, len(waiting_task_ids) if waiting_task_ids else 0)
-            
             # 验证初始化结果
-            actual_running = int(self.redis.get(self.key_running) or "0")
-            actual_waiting = self.redis.llen(self.key_waiting)
+            actual_running = self.redis.zcard(self.key_leases)
+            actual_waiting = self.redis.zcard(self.key_waiting)
             logger.info(f"验证初始化结果 - 运行中: {actual_running}, 等待中: {actual_waiting}")
 
         except RedisError as e:
             logger.error(f"初始化Redis队列失败: {e}")
+        return restored
+
+    def _restore_waiting_batch(self, tasks: List[dict]) -> int:
+        """在一个 pipeline 中将一批等待任务重新入队
+
+        Args:
+            tasks: 等待任务列表
+
+        Returns:
+            成功入队的数量
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for task in tasks:
+            self._enqueue(
+                task["task_id"],
+                task.get("user_id"),
+                task.get("priority") or TaskPriorityEnum.INTERACTIVE.value,
+                0,
+                enqueued_at=task.get("enqueued_at"),
+                enforce_limits=False,
+                client=pipe
+            )
+        restored = 0
+        for task, result in zip(tasks, pipe.execute()):
+            if result == 0:
+                restored += 1
+            else:
+                logger.warning(f"等待任务未能恢复到队列: {task['task_id']}")
+        return restored
+
+
+class LeaseLostError(Exception):
+    """任务的运行槽租约已不存在（已被回收、取消或释放）"""
+
+
+class LeaseHeartbeat:
+    """运行槽租约心跳
+
+    进入时认领运行槽（租约已不存在时抛出 LeaseLostError，任务不应再执行），
+    之后在后台线程中按 1/3 租约有效期续约，用作上下文管理器包裹任务执行::
+
+        with LeaseHeartbeat(queue_manager, result_id, on_lost=cancel):
+            run_task()
+
+    Redis 暂时不可用时缩短间隔重试，只有确认租约已不存在才停止心跳并调用
+    on_lost，由任务协作式地中止执行（threads 池中 revoke 无法终止任务）。
+    """
+
+    def __init__(self, queue_manager: RedisQueueManager, task_id: str,
+                 on_lost: Optional[Callable[[], None]] = None):
+        self._queue_manager = queue_manager
+        self._task_id = task_id
+        self._on_lost = on_lost
+        self._interval = max(1, queue_manager._settings.task_lease_ttl // 3)
+        self._retry_interval = max(1, self._interval // 5)
+        self._stopped = threading.Event()
+        self._lost = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def lost(self) -> bool:
+        """租约是否已确认不存在"""
+        return self._lost.is_set()
+
+    def _run(self) -> None:
+        wait = self._interval
+        while not self._stopped.wait(wait):
+            renewed = self._queue_manager.renew_lease(self._task_id)
+            if renewed is None:
+                # 租约状态未知，尽快重试，租约过期前仍有多次机会
+                wait = self._retry_interval
+                continue
+            if not renewed:
+                logger.warning(f"租约已失效，停止心跳并中止任务: {self._task_id}")
+                self._lost.set()
+                if self._on_lost is not None:
+                    self._on_lost()
+                return
+            wait = self._interval
+
+    def _claim(self) -> None:
+        """认领运行槽
+
+        Redis 暂时不可用时在一个租约有效期内重试；仍不可用时照常执行，
+        由心跳继续确认租约。
+        """
+        deadline = time.time() + self._queue_manager._settings.task_lease_ttl
+        while True:
+            renewed = self._queue_manager.renew_lease(self._task_id)
+            if renewed:
+                return
+            if renewed is False:
+                self._lost.set()
+                raise LeaseLostError(f"任务的运行槽租约已不存在: {self._task_id}")
+            if time.time() >= deadline:
+                logger.warning(f"无法确认运行槽租约，继续执行: {self._task_id}")
+                return
+            time.sleep(self._retry_interval)
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._claim()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"lease-heartbeat-{self._task_id[:8]}",
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
 
 
 _global_redis_queue_manager: Optional[RedisQueueManager] = None
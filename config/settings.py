@@ -85,6 +85,22 @@ class Settings:
         """系统论文原始内容表名 (Source Content)"""
         return os.getenv('SYSTEM_PAPER_CONTENT_COLLECTION', 'system_paper_original_content')
 
+    @property
+    def paper_content_gridfs_bucket(self) -> str:
+        """大论文内容所在的 GridFS 桶名 (Source Content)"""
+        return os.getenv('PAPER_CONTENT_GRIDFS_BUCKET', 'paper_content')
+
+    @property
+    def paper_content_cache_dir(self) -> str:
+        """论文内容本地缓存目录"""
+        default_dir = Path(__file__).parent.parent / "data" / "paper_cache"
+        return os.getenv('PAPER_CONTENT_CACHE_DIR', str(default_dir))
+
+    @property
+    def paper_content_cache_ttl(self) -> int:
+        """论文内容本地缓存有效期（秒）"""
+        return int(os.getenv('PAPER_CONTENT_CACHE_TTL', '86400'))
+
     # ============ Celery / Redis 配置 ============
 
     def _get_redis_url_from_kb_env(self, db_index: int = 0) -> Optional[str]:
@@ -160,6 +176,11 @@ class Settings:
         """MinIO 秘密密钥"""
         return os.getenv('KB_MINIO_SECRETKEY', '')
 
+    @property
+    def minio_upload_workers(self) -> int:
+        """MinIO 并发上传线程数"""
+        return int(os.getenv('MINIO_UPLOAD_WORKERS', '8'))
+
     # MinIO 多桶配置 - 按类型区分
     @property
     def system_slides_bucket(self) -> str:
@@ -211,6 +232,74 @@ class Settings:
         """最大等待队列任务数"""
         return int(os.getenv('SLIDES_MAX_WAITING_TASKS', '5'))
 
+    @property
+    def max_waiting_per_user(self) -> int:
+        """单个用户在等待队列中的最大任务数"""
+        return int(os.getenv('SLIDES_MAX_WAITING_PER_USER', '3'))
+
+    @property
+    def fair_share_step(self) -> int:
+        """公平份额步长（秒）
+
+        同一用户每多一个等待中的任务，新任务的调度顺序后移该时长。
+        """
+        return int(os.getenv('SLIDES_FAIR_SHARE_STEP', '60'))
+
+    @property
+    def batch_priority_delay(self) -> int:
+        """批量预生成任务的调度延迟（秒）
+
+        批量任务排在该时长内入队的交互任务之后，等待超过该时长后不再被插队（老化）。
+        """
+        return int(os.getenv('SLIDES_PRIORITY_BATCH_DELAY', '600'))
+
+    @property
+    def interactive_reserved_slots(self) -> int:
+        """为交互任务保留的运行槽数（批量任务至少可使用一个运行槽）"""
+        return int(os.getenv('SLIDES_INTERACTIVE_RESERVED_SLOTS', '1'))
+
+    @property
+    def pregenerate_user_id(self) -> str:
+        """批量预生成任务所属的用户ID"""
+        return os.getenv('SLIDES_PREGENERATE_USER_ID', 'system_pregenerate')
+
+    @property
+    def pregenerate_retry_interval(self) -> int:
+        """预生成命令行在队列已满时的重试间隔（秒）"""
+        return int(os.getenv('SLIDES_PREGENERATE_RETRY_INTERVAL', '60'))
+
+    @property
+    def internal_api_key(self) -> str:
+        """内部服务接口（如批量预生成）的访问密钥，为空时内部接口不可用"""
+        return os.getenv('SLIDES_INTERNAL_API_KEY', '')
+
+    @property
+    def task_lease_ttl(self) -> int:
+        """运行槽租约有效期（秒）
+
+        运行中的任务每 1/3 有效期续约一次，超过有效期未续约的运行槽会被回收。
+        """
+        return int(os.getenv('SLIDES_TASK_LEASE_TTL', '300'))
+
+    @property
+    def task_dispatch_ttl(self) -> int:
+        """运行槽分配后等待 worker 开始执行的最长时间（秒）
+
+        运行槽在准入时分配，worker 开始执行时才转为按心跳续约的租约；
+        超过该时间仍未开始执行的任务（如消息丢失）会被回收。
+        """
+        return int(os.getenv('SLIDES_TASK_DISPATCH_TTL', '3600'))
+
+    @property
+    def lease_reap_interval(self) -> int:
+        """过期租约回收间隔（秒）"""
+        return int(os.getenv('SLIDES_LEASE_REAP_INTERVAL', '30'))
+
+    @property
+    def task_coalesce_ttl(self) -> int:
+        """相同参数的在途生成任务合并登记的有效期（秒）"""
+        return int(os.getenv('SLIDES_COALESCE_TTL', '3600'))
+
     @property
     def reset_waiting_on_restart(self) -> bool:
         """服务重启时是否将等待队列任务标记为失败
@@ -259,6 +348,23 @@ class Settings:
         """图像生成模型"""
         return os.getenv('IMAGE_GEN_MODEL', 'doubao-seedream-4-5-251128')
 
+    @property
+    def generate_max_workers(self) -> int:
+        """单个生成任务并行生成幻灯片图像的线程数
+
+        所有任务共享 P2S_IMAGE_CONCURRENCY 个图像请求许可（配置
+        P2S_IMAGE_PERMITS_REDIS_URL 时跨进程共享），实际并行数可能更低。
+        """
+        return int(os.getenv('P2S_GENERATE_WORKERS', '2'))
+
+    @property
+    def speculative_plans(self) -> bool:
+        """生成完成后是否在空闲时为其他长度/密度预先生成大纲
+
+        预生成数量受 P2S_SPECULATIVE_BUDGET（每小时）限制。
+        """
+        return os.getenv('P2S_SPECULATIVE_PLANS', 'false').lower() == 'true'
+
     # ============ 解析器配置 ============
 
     @property
@@ -136,6 +136,11 @@ class MongoDBClient:
             [("user_id", 1), ("paper_id", 1), ("source", 1)],
             name="idx_user_paper"
         )
+        # 任务列表的键集分页和排序
+        user_collection.create_index(
+            [("user_id", 1), ("paper_id", 1), ("source", 1), ("created_time", -1), ("_id", -1)],
+            name="idx_user_paper_created"
+        )
         user_collection.create_index(
             [("user_id", 1), ("status", 1)],
             name="idx_user_status"
@@ -144,6 +149,16 @@ class MongoDBClient:
             [("created_time", -1)],
             name="idx_created_time"
         )
+        # 启动恢复按状态批量更新和按入队顺序遍历等待任务
+        user_collection.create_index(
+            [("status", 1), ("created_time", 1)],
+            name="idx_status_created"
+        )
+        user_collection.create_index(
+            [("coalesced_to", 1), ("status", 1)],
+            name="idx_coalesced_status",
+            partialFilterExpression={"coalesced_to": {"$exists": True}}
+        )
 
         logger.info("MongoDB 索引创建完成")
 
@@ -1,3 +1,10 @@
 """中间件模块"""
-from middleware.auth import token_decoder, api_key_decoder
+from middleware.auth import token_decoder, api_key_decoder, internal_service_decoder
 from middleware.error_handler import setup_exception_handlers
+
+__all__ = [
+    "token_decoder",
+    "api_key_decoder",
+    "internal_service_decoder",
+    "setup_exception_handlers",
+]
@@ -1,4 +1,5 @@
 import base64
+import hmac
 import json
 import os
 import requests
@@ -19,6 +20,26 @@ def api_key_decoder(credentials: HTTPAuthorizationCredentials = Security(securit
     return api_key
 
 
+def internal_service_decoder(credentials: HTTPAuthorizationCredentials = Security(security)) -> str:
+    """
+    内部服务密钥校验，仅允许持有 SLIDES_INTERNAL_API_KEY 的调用方
+    """
+    from config.settings import get_settings
+
+    expected = get_settings().internal_api_key
+    if not expected:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="内部接口未启用"
+        )
+    if not hmac.compare_digest(credentials.credentials.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="无权访问内部接口"
+        )
+    return credentials.credentials
+
+
 def token_decoder(credentials: HTTPAuthorizationCredentials = Security(security)) -> Dict | None:
     """
     token解析器
@@ -2,11 +2,12 @@
 
 存储用户的任务执行结果。
 """
+import hashlib
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Set
+from pydantic import BaseModel, Field, PrivateAttr
 
-from common.enums import AgentTypeEnum, TaskStatusEnum, PaperTypeEnum
+from common.enums import AgentTypeEnum, TaskStatusEnum, PaperTypeEnum, TaskPriorityEnum
 from common.constants import TASK_TITLE_POSTER, TASK_TITLE_SLIDES
 
 
@@ -32,7 +33,12 @@ class UserPaperResult(BaseModel):
         start_time: 开始时间
         end_time: 结束时间
         user_id: 用户ID
+        coalesced_to: 合并到的在途任务ID（相同参数的请求不重复生成）
+        priority: 调度优先级 (interactive/batch)
+        update_system: 完成后是否写入系统默认结果（排队的任务调度时使用）
         created_time: 创建时间
+
+    修改字段会被记录，仓库据此只更新变更的字段（见 dirty_fields）。
     """
 
     result_id: str = Field(..., description="任务ID（主键）")
@@ -51,6 +57,9 @@ class UserPaperResult(BaseModel):
     start_time: Optional[datetime] = Field(None, description="开始时间")
     end_time: Optional[datetime] = Field(None, description="结束时间")
     user_id: str = Field(..., description="用户ID")
+    coalesced_to: Optional[str] = Field(None, description="合并到的在途任务ID")
+    priority: str = Field(default=TaskPriorityEnum.INTERACTIVE.value, description="调度优先级")
+    update_system: bool = Field(False, description="完成后是否写入系统默认结果")
     created_time: datetime = Field(default_factory=datetime.now, description="创建时间")
 
     model_config = {
@@ -59,6 +68,41 @@ class UserPaperResult(BaseModel):
         "extra": "ignore"
     }
 
+    # 自加载或上次保存以来修改过的字段
+    _dirty: Set[str] = PrivateAttr(default_factory=set)
+    # 数据库中的状态（用于条件更新）
+    _persisted_status: Optional[str] = PrivateAttr(None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._persisted_status = self.status
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self._dirty.add(name)
+
+    @property
+    def persisted_status(self) -> Optional[str]:
+        """数据库中的状态（加载或上次保存时）"""
+        return self._persisted_status
+
+    def dirty_fields(self) -> Dict[str, Any]:
+        """获取修改过的字段
+
+        被清空的字段值为 None（与 to_dict 一致，数据库中不保存该字段）。
+
+        Returns:
+            字段名到新值的字典
+        """
+        if not self._dirty:
+            return {}
+        return self.model_dump(include=set(self._dirty))
+
+    def mark_clean(self) -> None:
+        """修改已保存，清空修改记录"""
+        self._dirty.clear()
+        self._persisted_status = self.status
+
     @classmethod
     def create(
         cls,
@@ -72,6 +116,8 @@ class UserPaperResult(BaseModel):
         style: str = "academic",
         language: str = "ZH",
         density: str = "medium",
+        priority: str = TaskPriorityEnum.INTERACTIVE.value,
+        update_system: bool = False,
     ) -> "UserPaperResult":
         """创建新任务实例
 
@@ -86,6 +132,8 @@ class UserPaperResult(BaseModel):
             style: 风格偏好
             language: 语言 (ZH/EN)
             density: 内容密度 (sparse/medium/dense)
+            priority: 调度优先级 (interactive/batch)
+            update_system: 完成后是否写入系统默认结果
 
         Returns:
             UserPaperResult: 新创建的任务实例
@@ -104,6 +152,8 @@ class UserPaperResult(BaseModel):
             style=style,
             language=language,
             density=density,
+            priority=priority,
+            update_system=update_system,
         )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -149,6 +199,13 @@ class UserPaperResult(BaseModel):
         self.error_reason = error_reason
         self.end_time = datetime.now()
 
+    @property
+    def coalesce_key(self) -> str:
+        """合并键：生成参数相同的任务得到相同的键"""
+        parts = [self.paper_type, self.paper_id, self.source, self.agent_type,
+                 self.style or "", self.language, self.density]
+        return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
     @property
     def is_running(self) -> bool:
         """是否运行中"""
@@ -17,7 +17,21 @@ from .state import (
     save_state,
     create_state,
     detect_start_stage,
+    index_session,
+    find_session_state,
 )
+from .checkpoint_store import (
+    compute_content_hash,
+    restore_checkpoints,
+    publish_checkpoints,
+)
+from .events import EventBus, get_event_bus
+from .image_permits import ImagePermitPool, RedisImagePermitPool, get_image_permit_pool
+from .speculation import SpeculativePlanner, get_speculative_planner, sibling_configs
+from .llm_cache import LLMCache, get_llm_cache, llm_cache_scope
+from .image_cache import ImageCache, get_image_cache
+from .slide_files import find_latest_output
+from .regenerate import regenerate_slides
 from .pipeline import run_pipeline, list_outputs
 
 __all__ = [
@@ -36,6 +50,33 @@ __all__ = [
     "save_state",
     "create_state",
     "detect_start_stage",
+    "index_session",
+    "find_session_state",
+    # Shared checkpoint store
+    "compute_content_hash",
+    "restore_checkpoints",
+    "publish_checkpoints",
+    # Progress events
+    "EventBus",
+    "get_event_bus",
+    # Image generation concurrency
+    "ImagePermitPool",
+    "RedisImagePermitPool",
+    "get_image_permit_pool",
+    # Speculative sibling plans
+    "SpeculativePlanner",
+    "get_speculative_planner",
+    "sibling_configs",
+    # LLM response cache
+    "LLMCache",
+    "get_llm_cache",
+    "llm_cache_scope",
+    # Image generation cache
+    "ImageCache",
+    "get_image_cache",
+    # Partial regeneration
+    "regenerate_slides",
+    "find_latest_output",
     # Pipeline
     "run_pipeline",
     "list_outputs",
@@ -0,0 +1,151 @@
+"""
+Content-addressed checkpoint store shared across projects
+
+RAG and summary checkpoints only depend on the document content and the
+processing mode, so they are stored under a hash of both and restored into
+any project that processes the same document.
+"""
+import os
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .paths import (
+    get_mode_dir,
+    get_rag_checkpoint,
+    get_summary_checkpoint,
+    get_summary_md,
+)
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR_NAME = ".checkpoints"
+
+# Text inputs are normalized before hashing so that line endings, BOM and
+# trailing whitespace do not defeat deduplication
+TEXT_SUFFIXES = {".md", ".markdown", ".txt"}
+
+
+def _list_input_files(config: Dict) -> List[Path]:
+    """List input files in a stable order."""
+    paths = config.get("pdf_paths") or [config.get("input_path")]
+    files = []
+    for p in paths:
+        if not p:
+            continue
+        path = Path(p)
+        if path.is_dir():
+            files.extend(sorted(f for f in path.iterdir() if f.is_file()))
+        elif path.is_file():
+            files.append(path)
+    return files
+
+
+def _normalize_bytes(path: Path) -> bytes:
+    """Read file bytes, normalizing text documents."""
+    data = path.read_bytes()
+    if path.suffix.lower() not in TEXT_SUFFIXES:
+        return data
+    text = data.decode("utf-8", errors="replace").lstrip("\ufeff")
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = [line.rstrip() for line in text.split("\n")]
+    return "\n".join(lines).strip().encode("utf-8")
+
+
+def compute_content_hash(config: Dict) -> Optional[str]:
+    """SHA-256 of the normalized input documents plus mode and content type.
+
+    The result is cached in ``config["content_hash"]``. Returns None when no
+    input file can be read.
+    """
+    if config.get("content_hash"):
+        return config["content_hash"]
+
+    files = _list_input_files(config)
+    if not files:
+        return None
+
+    digest = hashlib.sha256()
+    digest.update(f"mode={'fast' if config.get('fast_mode') else 'normal'}\n".encode())
+    digest.update(f"content_type={config.get('content_type', 'paper')}\n".encode())
+    try:
+        for f in files:
+            data = _normalize_bytes(f)
+            digest.update(f"{len(data)}\n".encode())
+            digest.update(data)
+    except OSError as e:
+        logger.warning(f"Cannot hash input files: {e}")
+        return None
+
+    config["content_hash"] = digest.hexdigest()
+    return config["content_hash"]
+
+
+def get_store_dir(base_dir: Path, content_hash: str) -> Path:
+    """Get store directory for a content hash (next to project directories)."""
+    output_root = Path(base_dir).parent.parent
+    return output_root / STORE_DIR_NAME / content_hash[:2] / content_hash
+
+
+def _shared_files(base_dir: Path, config: Dict) -> List[Path]:
+    """Local files mirrored in the store."""
+    return [
+        get_rag_checkpoint(base_dir, config),
+        get_summary_checkpoint(base_dir, config),
+        get_summary_md(base_dir, config),
+    ]
+
+
+def restore_checkpoints(base_dir: Path, config: Dict) -> bool:
+    """Copy RAG and summary checkpoints from the store into the project.
+
+    Only restores when both checkpoints are stored, so the pipeline can skip
+    straight to ``plan``. Existing local checkpoints are never overwritten.
+
+    Returns:
+        True if checkpoints were restored
+    """
+    rag_path = get_rag_checkpoint(base_dir, config)
+    summary_path = get_summary_checkpoint(base_dir, config)
+    if rag_path.exists() and summary_path.exists():
+        return False
+
+    content_hash = compute_content_hash(config)
+    if not content_hash:
+        return False
+
+    store_dir = get_store_dir(base_dir, content_hash)
+    if not ((store_dir / rag_path.name).exists() and (store_dir / summary_path.name).exists()):
+        return False
+
+    get_mode_dir(base_dir, config).mkdir(parents=True, exist_ok=True)
+    for local in _shared_files(base_dir, config):
+        stored = store_dir / local.name
+        if stored.exists() and not local.exists():
+            shutil.copy2(stored, local)
+
+    logger.info(f"Restored shared checkpoints for content {content_hash[:12]}")
+    return True
+
+
+def publish_checkpoints(base_dir: Path, config: Dict):
+    """Copy the project's RAG/summary checkpoints into the store.
+
+    Files are written to a temporary name first and renamed, so concurrent
+    pipelines never observe partial checkpoints.
+    """
+    content_hash = compute_content_hash(config)
+    if not content_hash:
+        return
+
+    store_dir = get_store_dir(base_dir, content_hash)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    for local in _shared_files(base_dir, config):
+        stored = store_dir / local.name
+        if not local.exists() or stored.exists():
+            continue
+        tmp = stored.with_name(f".{stored.name}.{os.getpid()}.tmp")
+        shutil.copy2(local, tmp)
+        os.replace(tmp, stored)
@@ -0,0 +1,85 @@
+"""
+In-process event bus for pipeline progress
+
+run_pipeline and save_state publish events per session; the API streams
+them to clients (server-sent events) so they do not have to poll status.
+Publishing is thread-safe, subscribers receive events on their own loop.
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUED_EVENTS = 256
+
+
+class EventBus:
+    """Fan out session events to asyncio subscribers."""
+
+    def __init__(self, max_queued: int = MAX_QUEUED_EVENTS):
+        self.max_queued = max_queued
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        """Subscribe to events of a session from the running event loop."""
+        queue = asyncio.Queue(maxsize=self.max_queued)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(session_id, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        """Remove a subscriber queue."""
+        with self._lock:
+            subscribers = self._subscribers.get(session_id, [])
+            self._subscribers[session_id] = [s for s in subscribers if s[1] is not queue]
+            if not self._subscribers[session_id]:
+                del self._subscribers[session_id]
+
+    def publish(self, session_id: str, event_type: str, **data):
+        """Publish an event to all subscribers of a session."""
+        if not session_id:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers.get(session_id, []))
+        if not subscribers:
+            return
+
+        event = {
+            "type": event_type,
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat(),
+            **data,
+        }
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        for loop, queue in subscribers:
+            if loop is current_loop:
+                self._put(queue, event)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(self._put, queue, event)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: Dict):
+        # Slow consumers lose the oldest events rather than blocking the pipeline
+        if queue.full():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(event)
+
+
+_event_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    """Get the process-wide event bus."""
+    return _event_bus
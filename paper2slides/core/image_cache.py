@@ -0,0 +1,188 @@
+"""
+Content-addressed cache for generated slide images
+
+Each slide is keyed on a hash of its plan section, the rest of the plan,
+the deck configuration and the image provider settings (provider, model,
+endpoint, image size and aspect ratio, ...). Regenerating a deck where only two slide sections changed
+then calls the image provider for those two slides only.
+
+The cache holds the final image files the generate stage wrote, so it
+works the same for every provider, whether it returns image data or URLs
+that the generator downloads. Before the stage runs, cached slides are
+written into the new output directory and only the rest of the plan is
+generated. Only slide decks are cached: a poster is one image of all
+sections. Entries are stored as sharded files and evicted
+least-recently-used once the cache exceeds P2S_IMAGE_CACHE_MAX_MB.
+"""
+import os
+import json
+import base64
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from .slide_files import list_images, map_slides, slide_stem
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_ENABLED = os.getenv("P2S_IMAGE_CACHE", "true").lower() == "true"
+IMAGE_CACHE_DIR = os.getenv(
+    "P2S_IMAGE_CACHE_DIR",
+    str(Path(__file__).resolve().parents[2] / "data" / "image_cache"),
+)
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("P2S_IMAGE_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+# Config entries that do not change the images. ``content_hash`` is only
+# set when the run started at rag/summary; the plan already covers the input.
+IGNORED_CONFIG = {"input_path", "pdf_paths", "max_workers", "speculative_plans", "content_hash"}
+# Provider settings that change the images (the API key does not)
+PROVIDER_ENV = (
+    "IMAGE_GEN_PROVIDER", "IMAGE_GEN_MODEL", "IMAGE_GEN_BASE_URL",
+    "IMAGE_GEN_RESPONSE_MIME_TYPE", "GOOGLE_GENAI_BASE_URL",
+    "IMAGE_SIZE", "IMAGE_RESOLUTION",
+)
+
+
+def make_slide_key(section: Dict, plan: Dict, config: Dict) -> str:
+    """Hash of a plan section and everything else its image depends on."""
+    request = {
+        "section": section,
+        "plan": {k: v for k, v in plan.items() if k != "sections"},
+        "config": {k: v for k, v in config.items() if k not in IGNORED_CONFIG},
+        "provider": {name: os.getenv(name, "") for name in PROVIDER_ENV},
+    }
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """On-disk slide image cache with LRU eviction by access time."""
+
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._size = sum(p.stat().st_size for p in self.cache_dir.glob("*/*.json"))
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a stored entry (JSON) and mark it recently used."""
+        path = self._path(key)
+        try:
+            value = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return value
+
+    def put(self, key: str, value: str):
+        """Store an entry atomically and evict old entries over the size cap."""
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(value, encoding="utf-8")
+        os.replace(tmp, path)
+        with self._lock:
+            self._stats["stores"] += 1
+            self._size += path.stat().st_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        for p in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, p))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        # Evict down to 90% so every put over the cap does not rescan
+        target = self.max_bytes * 0.9
+        for _, size, p in entries:
+            if self._size <= target:
+                break
+            p.unlink(missing_ok=True)
+            self._size -= size
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss counters of this process plus the cache size."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache: Optional[ImageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> Optional[ImageCache]:
+    """Get the process-wide image cache, None when disabled or unavailable."""
+    global _cache
+    if not IMAGE_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = ImageCache()
+                except OSError as e:
+                    logger.warning(f"Image cache unavailable: {e}")
+                    return None
+    return _cache
+
+
+def restore_cached_slides(cache: ImageCache, plan: Dict, config: Dict, output_dir: Path) -> Dict[int, Path]:
+    """Write the cached images of the plan's slides into ``output_dir``.
+
+    Returns:
+        {0-based plan position: written image}
+    """
+    restored = {}
+    for position, section in enumerate(plan["sections"]):
+        value = cache.get(make_slide_key(section, plan, config))
+        if value is None:
+            continue
+        entry = json.loads(value)
+        name = Path(entry["name"])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"{slide_stem(name, section['id'], position)}{name.suffix}"
+        path.write_bytes(base64.b64decode(entry["data"]))
+        restored[position] = path
+    return restored
+
+
+def store_slides(cache: ImageCache, plan: Dict, config: Dict, output_dir: Path, skip=()) -> int:
+    """Store the slide images of ``output_dir`` except the positions in ``skip``.
+
+    Returns:
+        Number of stored images
+    """
+    sections = plan["sections"]
+    slides = map_slides(list_images(output_dir), [section["id"] for section in sections])
+    stored = 0
+    for position, path in slides.items():
+        if position in skip:
+            continue
+        # Names are renumbered on restore, so the stem records the naming scheme
+        entry = {"name": path.name, "data": base64.b64encode(path.read_bytes()).decode("ascii")}
+        cache.put(make_slide_key(sections[position], plan, config), json.dumps(entry))
+        stored += 1
+    return stored
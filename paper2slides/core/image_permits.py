@@ -0,0 +1,202 @@
+"""
+Permit pool for image generation
+
+Every pipeline's generate stage reserves permits before starting and runs
+with at most that many workers, so concurrent pipelines together never
+exceed P2S_IMAGE_CONCURRENCY in-flight image requests (the provider's rate
+limit).
+
+With P2S_IMAGE_PERMITS_REDIS_URL set, the permits are leases in Redis and
+the limit holds across all processes (Celery workers, API servers); a
+lease is renewed while its stage runs, so the permits of a crashed process
+return to the pool once it expires. Without it the pool is per process
+(e.g. the CLI). Pipelines run on different event loops and threads, hence
+a thread-safe pool with async polling instead of an asyncio.Semaphore.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CONCURRENCY = int(os.getenv("P2S_IMAGE_CONCURRENCY", "4"))
+IMAGE_PERMITS_REDIS_URL = os.getenv("P2S_IMAGE_PERMITS_REDIS_URL", "")
+PERMIT_LEASE_TTL = int(os.getenv("P2S_IMAGE_PERMIT_TTL", "60"))
+PERMITS_KEY = "p2s:image_permits"
+ACQUIRE_POLL_INTERVAL = 0.5
+
+# Reclaim expired leases, then grant up to the requested number of free permits
+# KEYS: leases (token -> expiry), counts (token -> permits)
+# ARGV: token, requested, size, now, expiry
+ACQUIRE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[4])
+for _, token in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], token)
+    redis.call('HDEL', KEYS[2], token)
+end
+local used = 0
+for _, count in ipairs(redis.call('HVALS', KEYS[2])) do
+    used = used + tonumber(count)
+end
+local granted = math.min(tonumber(ARGV[2]), tonumber(ARGV[3]) - used)
+if granted <= 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[5], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], granted)
+return granted
+"""
+
+
+class ImagePermitPool:
+    """Bounded pool of image generation permits of this process."""
+
+    def __init__(self, size: int = IMAGE_CONCURRENCY):
+        self.size = max(1, size)
+        self._available = self.size
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> int:
+        return self._available
+
+    def try_acquire(self, requested: int) -> int:
+        """Take up to ``requested`` free permits without waiting.
+
+        Returns:
+            Number of permits granted, 0 when none is free
+        """
+        with self._lock:
+            granted = min(max(1, requested), self._available)
+            self._available -= granted
+            return granted
+
+    async def acquire(self, requested: int) -> int:
+        """Wait until at least one permit is free, then take up to ``requested``.
+
+        Polling keeps cancellation safe: a cancelled waiter never holds permits.
+        """
+        while True:
+            granted = self.try_acquire(requested)
+            if granted:
+                return granted
+            await asyncio.sleep(ACQUIRE_POLL_INTERVAL)
+
+    def release(self, count: int):
+        """Return permits to the pool."""
+        with self._lock:
+            self._available = min(self.size, self._available + count)
+
+    @asynccontextmanager
+    async def permits(self, requested: int) -> AsyncIterator[int]:
+        """Hold up to ``requested`` permits (at least one) for the block."""
+        granted = await self.acquire(requested)
+        try:
+            yield granted
+        finally:
+            self.release(granted)
+
+
+class RedisImagePermitPool:
+    """Image generation permits shared by all processes through Redis.
+
+    Each grant is a lease: a token in a sorted set scored by its expiry,
+    with the number of permits it holds in a hash.
+    """
+
+    def __init__(self, client, size: int = IMAGE_CONCURRENCY, key: str = PERMITS_KEY,
+                 lease_ttl: int = PERMIT_LEASE_TTL):
+        self.size = max(1, size)
+        self.lease_ttl = max(3, lease_ttl)
+        self._client = client
+        self._leases_key = f"{key}:leases"
+        self._counts_key = f"{key}:counts"
+        self._acquire_script = client.register_script(ACQUIRE_SCRIPT)
+
+    def try_acquire(self, token: str, requested: int) -> int:
+        """Take up to ``requested`` free permits under ``token`` without waiting.
+
+        Returns:
+            Number of permits granted, 0 when none is free
+        """
+        now = time.time()
+        return int(self._acquire_script(
+            keys=[self._leases_key, self._counts_key],
+            args=[token, max(1, requested), self.size, now, now + self.lease_ttl],
+        ))
+
+    def renew(self, token: str) -> bool:
+        """Extend a lease; False when it already expired and was reclaimed."""
+        return bool(self._client.zadd(
+            self._leases_key, {token: time.time() + self.lease_ttl}, xx=True, ch=True
+        ))
+
+    def release(self, token: str):
+        """Return the permits of a lease to the pool."""
+        pipe = self._client.pipeline()
+        pipe.zrem(self._leases_key, token)
+        pipe.hdel(self._counts_key, token)
+        pipe.execute()
+
+    async def _keep_alive(self, token: str):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                if not await asyncio.to_thread(self.renew, token):
+                    logger.warning(f"Image permit lease {token} expired while held")
+                    return
+            except Exception as e:
+                logger.warning(f"Failed to renew image permit lease: {e}")
+
+    @asynccontextmanager
+    async def permits(self, requested: int) -> AsyncIterator[int]:
+        """Hold up to ``requested`` permits (at least one) for the block.
+
+        A lease granted to a cancelled waiter is not released here; it
+        expires after ``lease_ttl``.
+        """
+        token = uuid.uuid4().hex
+        while True:
+            granted = await asyncio.to_thread(self.try_acquire, token, requested)
+            if granted:
+                break
+            await asyncio.sleep(ACQUIRE_POLL_INTERVAL)
+        keep_alive = asyncio.create_task(self._keep_alive(token))
+        try:
+            yield granted
+        finally:
+            keep_alive.cancel()
+            try:
+                await asyncio.to_thread(self.release, token)
+            except Exception as e:
+                logger.warning(f"Failed to release image permits, they expire in {self.lease_ttl}s: {e}")
+
+
+_permit_pool: Optional[Union[ImagePermitPool, RedisImagePermitPool]] = None
+_permit_pool_lock = threading.Lock()
+
+
+def get_image_permit_pool() -> Union[ImagePermitPool, RedisImagePermitPool]:
+    """Get the image permit pool: Redis-backed when configured, else per process."""
+    global _permit_pool
+    if _permit_pool is None:
+        with _permit_pool_lock:
+            if _permit_pool is None:
+                if IMAGE_PERMITS_REDIS_URL:
+                    import redis
+
+                    client = redis.Redis.from_url(
+                        IMAGE_PERMITS_REDIS_URL,
+                        decode_responses=True,
+                        socket_connect_timeout=5,
+                        socket_timeout=5
+                    )
+                    _permit_pool = RedisImagePermitPool(client)
+                else:
+                    _permit_pool = ImagePermitPool()
+    return _permit_pool
@@ -0,0 +1,228 @@
+"""
+Persistent LLM response cache for the summary and plan stages
+
+Completions are stored in SQLite keyed on a hash of the model, request
+parameters and messages, so re-running ``plan`` (or ``summary``) with the
+same inputs returns the stored completions instead of calling the LLM
+again. Entries are evicted least-recently-used once the cache exceeds
+P2S_LLM_CACHE_MAX_MB.
+
+The stages talk to the LLM through the ``openai`` client, so the cache is
+installed around ``chat.completions.create`` and only consulted inside
+``llm_cache_scope`` (entered by the pipeline for summary and plan).
+Streaming requests are never cached. A cache that cannot be read or
+written (locked or corrupt database) is treated as a miss, never as a
+failed request; async calls do the SQLite I/O in a worker thread.
+
+The scope is a context variable: code the stages run through
+``asyncio.to_thread`` sees it, but calls made from threads started with
+``run_in_executor`` or a ``ThreadPoolExecutor`` do not, unless submitted
+through ``contextvars.copy_context().run``, and bypass the cache.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("P2S_LLM_CACHE", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv(
+    "P2S_LLM_CACHE_PATH",
+    str(Path(__file__).resolve().parents[2] / "data" / "llm_cache.sqlite3"),
+)
+LLM_CACHE_MAX_BYTES = int(os.getenv("P2S_LLM_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# Request options that do not change the completion
+IGNORED_PARAMS = {"stream", "timeout", "extra_headers", "extra_query", "extra_body", "user"}
+
+_scope: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_cache_scope", default=None)
+
+
+def make_cache_key(kwargs: Dict) -> str:
+    """Hash of model, parameters and messages of a chat completion request."""
+    request = {k: v for k, v in kwargs.items() if k not in IGNORED_PARAMS}
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed prompt -> completion cache with LRU eviction."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON completions (last_access)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a stored completion (JSON) and mark it recently used."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self._stats["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, model: str, value: str):
+        """Store a completion and evict least recently used entries over the size cap."""
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, value, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, value, size, time.time()),
+            )
+            self._stats["stores"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM completions ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._stats["evictions"] += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict:
+        """Hit/miss counters of this process plus the cache size."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+_installed = False
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Get the process-wide LLM cache, None when disabled or unavailable."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = LLMCache()
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"LLM cache unavailable: {e}")
+                    return None
+    return _cache
+
+
+def _lookup(kwargs: Dict):
+    """Return (cache, key, cached completion JSON) for a request in scope."""
+    if _scope.get() is None or kwargs.get("stream"):
+        return None, None, None
+    cache = get_llm_cache()
+    if cache is None:
+        return None, None, None
+    key = make_cache_key(kwargs)
+    try:
+        return cache, key, cache.get(key)
+    except sqlite3.Error as e:
+        logger.warning(f"LLM cache lookup failed: {e}")
+        return cache, key, None
+
+
+def _store(cache: LLMCache, key: str, kwargs: Dict, response):
+    """Store a completion; a failed write only skips the store."""
+    try:
+        cache.put(key, str(kwargs.get("model")), response.model_dump_json())
+    except sqlite3.Error as e:
+        logger.warning(f"LLM cache store failed: {e}")
+
+
+def install_llm_cache():
+    """Wrap the openai chat completion methods with the cache (idempotent)."""
+    global _installed
+    if _installed or not LLM_CACHE_ENABLED:
+        return
+    with _cache_lock:
+        if _installed:
+            return
+        try:
+            from openai.types.chat import ChatCompletion
+            from openai.resources.chat.completions import Completions, AsyncCompletions
+        except ImportError:
+            logger.warning("openai is not installed, LLM cache disabled")
+            return
+
+        sync_create = Completions.create
+        async_create = AsyncCompletions.create
+
+        def create(self, *args, **kwargs):
+            cache, key, cached = _lookup(kwargs)
+            if cached is not None:
+                return ChatCompletion.model_validate_json(cached)
+            response = sync_create(self, *args, **kwargs)
+            if cache is not None and isinstance(response, ChatCompletion):
+                _store(cache, key, kwargs, response)
+            return response
+
+        async def acreate(self, *args, **kwargs):
+            cache, key, cached = await asyncio.to_thread(_lookup, kwargs)
+            if cached is not None:
+                return ChatCompletion.model_validate_json(cached)
+            response = await async_create(self, *args, **kwargs)
+            if cache is not None and isinstance(response, ChatCompletion):
+                await asyncio.to_thread(_store, cache, key, kwargs, response)
+            return response
+
+        Completions.create = create
+        AsyncCompletions.create = acreate
+        _installed = True
+        logger.info(f"LLM cache installed: {LLM_CACHE_PATH}")
+
+
+@contextmanager
+def llm_cache_scope(stage: str):
+    """Serve chat completions from the cache within this context."""
+    install_llm_cache()
+    token = _scope.set(stage)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
@@ -1,19 +1,170 @@
 """
 Pipeline execution and outputs listing
 """
+import os
+import shutil
+import asyncio
 import logging
+import contextlib
+from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Set
 
-from ..utils import log_section
+from ..utils import log_section, load_json
 from .state import STAGES, load_state, save_state, create_state
-from .paths import get_rag_checkpoint, get_summary_checkpoint, get_plan_checkpoint
+from .paths import get_rag_checkpoint, get_summary_checkpoint, get_plan_checkpoint, get_output_dir
+from .checkpoint_store import publish_checkpoints
+from .events import get_event_bus
+from .image_permits import get_image_permit_pool
+from .speculation import get_speculative_planner, pipeline_started, pipeline_finished
+from .llm_cache import llm_cache_scope, get_llm_cache
+from .image_cache import get_image_cache, restore_cached_slides, store_slides
 from .stages import run_rag_stage, run_summary_stage, run_plan_stage, run_generate_stage
+from .slide_files import (
+    IMAGE_SUFFIXES, PDF_NAME, list_images, map_slides, slide_stem, build_pdf, generate_sections,
+)
 
 logger = logging.getLogger(__name__)
 
+SLIDE_POLL_INTERVAL = 1.0
+GENERATE_RETRIES = int(os.getenv("P2S_GENERATE_RETRIES", "1"))
+GENERATE_RETRY_DELAY = 5.0
 
-async def run_pipeline(base_dir: Path, config_dir: Path, config: Dict, from_stage: str, session_id: str = None, session_manager = None):
+
+def _publish_new_slides(config_dir: Path, session_id: str, seen: Set[Path]):
+    """Publish a slide_generated event for every new image in the output dirs."""
+    for output_dir in sorted(d for d in config_dir.iterdir() if d.is_dir()):
+        for path in sorted(output_dir.iterdir()):
+            if path in seen or path.suffix.lower() not in IMAGE_SUFFIXES:
+                continue
+            seen.add(path)
+            get_event_bus().publish(
+                session_id, "slide_generated",
+                filename=path.name,
+                output_dir=output_dir.name,
+                path=str(path),
+            )
+
+
+async def _watch_generated_slides(config_dir: Path, session_id: str, seen: Set[Path]):
+    """Poll the config directory while the generate stage writes images."""
+    while True:
+        await asyncio.sleep(SLIDE_POLL_INTERVAL)
+        try:
+            _publish_new_slides(config_dir, session_id, seen)
+        except OSError as e:
+            logger.debug(f"Slide watcher: {e}")
+
+
+async def _complete_output(base_dir: Path, config_dir: Path, config: Dict, checkpoint: Dict, output_dir: Path) -> int:
+    """Generate the slides missing from a partly written output directory.
+
+    The directory holds slides restored from the image cache or written by a
+    failed attempt; the missing ones are generated from a reduced plan and
+    the PDF of a slide deck is built from all of them in plan order.
+
+    Returns:
+        Number of slides generated
+    """
+    sections = checkpoint["plan"]["sections"]
+    written = map_slides(list_images(output_dir), [section["id"] for section in sections])
+    missing = [i + 1 for i in range(len(sections)) if i not in written]
+    if missing:
+        staging_dir = config_dir.parent / f".partial_{config_dir.name}_{datetime.now():%Y%m%d_%H%M%S_%f}"
+        staging_dir.mkdir(parents=True)
+        try:
+            generated = await generate_sections(
+                staging_dir, checkpoint, missing,
+                lambda directory: run_generate_stage(base_dir, directory, config)
+            )
+            for position, image in generated.items():
+                stem = slide_stem(image, sections[position]["id"], position)
+                shutil.move(str(image), output_dir / f"{stem}{image.suffix.lower()}")
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    if config.get("output_type", "slides") == "slides":
+        slides = map_slides(list_images(output_dir), [section["id"] for section in sections])
+        pages = [slides[position] for position in sorted(slides)]
+        await asyncio.to_thread(build_pdf, pages, output_dir / PDF_NAME)
+    return len(missing)
+
+
+async def _run_generate_stage(base_dir: Path, config_dir: Path, config: Dict, use_cache: bool = True):
+    """Run the generate stage within the shared image permit budget.
+
+    The stage runs with as many workers as permits were granted (at most
+    ``max_workers``). The grant is passed on a copy of the config, so it is
+    never persisted with the pipeline state. Slides found in the image cache
+    are not generated again (``use_cache=False`` skips the lookup, e.g. when
+    slides are regenerated on purpose); the generated ones are stored. When
+    a failed attempt already wrote some slides, the retry only generates the
+    missing ones into the same output directory.
+    """
+    requested = config.get("max_workers") or 1
+    checkpoint = load_json(get_plan_checkpoint(config_dir))
+    slides_plan = checkpoint and config.get("output_type", "slides") == "slides"
+    cache = get_image_cache() if slides_plan else None
+    earlier = {d for d in config_dir.iterdir() if d.is_dir()}
+    restored = {}
+    async with get_image_permit_pool().permits(requested) as granted:
+        if granted < requested:
+            logger.info(f"Image permits: {granted}/{requested} granted")
+        stage_config = {**config, "max_workers": granted}
+        if cache and use_cache:
+            output_dir = get_output_dir(config_dir)
+            restored = restore_cached_slides(cache, checkpoint["plan"], config, output_dir)
+            if restored:
+                logger.info(f"Image cache: {len(restored)}/{len(checkpoint['plan']['sections'])} slides restored")
+        for attempt in range(GENERATE_RETRIES + 1):
+            try:
+                # Output directory holding cached slides or a failed attempt's slides
+                partial = sorted(d for d in config_dir.iterdir() if d.is_dir() and d not in earlier)
+                if checkpoint and partial and list_images(partial[-1]):
+                    await _complete_output(base_dir, config_dir, stage_config, checkpoint, partial[-1])
+                else:
+                    await run_generate_stage(base_dir, config_dir, stage_config)
+                break
+            except Exception as e:
+                if attempt >= GENERATE_RETRIES:
+                    raise
+                logger.warning(f"Generate stage failed ({e}), retrying ({attempt + 1}/{GENERATE_RETRIES})")
+                await asyncio.sleep(GENERATE_RETRY_DELAY * (attempt + 1))
+
+    if cache:
+        output = sorted(d for d in config_dir.iterdir() if d.is_dir() and d not in earlier)
+        if output:
+            try:
+                store_slides(cache, checkpoint["plan"], config, output[-1], skip=restored)
+            except OSError as e:
+                logger.warning(f"Failed to store slides in the image cache: {e}")
+
+
+async def _run_generate_with_progress(base_dir: Path, config_dir: Path, config: Dict, session_id: str):
+    """Run the generate stage, publishing each slide as soon as it is written."""
+    if not session_id:
+        await _run_generate_stage(base_dir, config_dir, config)
+        return
+    
+    # Images of earlier runs are not progress of this one
+    seen = set()
+    for output_dir in (d for d in config_dir.iterdir() if d.is_dir()):
+        seen.update(output_dir.iterdir())
+    
+    watcher = asyncio.create_task(_watch_generated_slides(config_dir, session_id, seen))
+    try:
+        await _run_generate_stage(base_dir, config_dir, config)
+    finally:
+        watcher.cancel()
+        try:
+            await watcher
+        except asyncio.CancelledError:
+            pass
+    _publish_new_slides(config_dir, session_id, seen)
+
+
+async def run_pipeline(base_dir: Path, config_dir: Path, config: Dict, from_stage: str, session_id: str = None, session_manager = None,
+                       shared_lock: Optional[asyncio.Lock] = None):
     """Run pipeline from specified stage.
     
     Args:
@@ -23,6 +174,8 @@ async def run_pipeline(base_dir: Path, config_dir: Path, config: Dict, from_stag
         from_stage: Stage to start from
         session_id: Session ID for cancellation tracking
         session_manager: Session manager to check cancellation status
+        shared_lock: Lock held while the rag and summary stages write the
+            checkpoints shared by all configs of the project
     """
     
     # Initialize or load state
@@ -45,6 +198,65 @@ async def run_pipeline(base_dir: Path, config_dir: Path, config: Dict, from_stag
     logger.info("")
     logger.info(f"Starting from stage: {from_stage}")
     
+    # Shared checkpoints are copied to the store while plan runs
+    publish_tasks = []
+    pipeline_started()
+    try:
+        await _run_stages(base_dir, config_dir, config, state, start_idx, session_id, session_manager, publish_tasks,
+                          shared_lock)
+    finally:
+        pipeline_finished()
+        for task in publish_tasks:
+            try:
+                await task
+            except OSError as e:
+                logger.warning(f"Failed to publish shared checkpoints: {e}")
+    
+    # Opt-in: plan the other lengths/densities while workers are idle
+    if config.get("speculative_plans") and state["stages"].get("plan") == "completed":
+        get_speculative_planner().schedule(base_dir, config)
+    
+    # Print summary
+    log_section("SUMMARY")
+    for stage in STAGES:
+        status = state["stages"].get(stage, "pending")
+        icon = "✓" if status == "completed" else "✗" if status == "failed" else "○"
+        logger.info(f"  [{icon}] {stage}: {status}")
+    cache = get_llm_cache()
+    if cache:
+        stats = cache.stats()
+        logger.info(f"  LLM cache: {stats['hits']} hits, {stats['misses']} misses (process total)")
+    image_cache = get_image_cache()
+    if image_cache:
+        stats = image_cache.stats()
+        logger.info(f"  Image cache: {stats['hits']} hits, {stats['misses']} misses (process total)")
+
+
+async def _run_shared_stage(stage: str, base_dir: Path, config: Dict, shared_lock: Optional[asyncio.Lock]):
+    """Run the rag or summary stage, whose checkpoints all configs of the project share.
+
+    Under ``shared_lock`` the stage is skipped when another pipeline of the
+    project wrote its checkpoint while this one was waiting for the lock.
+    """
+    if stage == "rag":
+        checkpoint = get_rag_checkpoint(base_dir, config)
+    else:
+        checkpoint = get_summary_checkpoint(base_dir, config)
+    async with shared_lock or contextlib.nullcontext():
+        if shared_lock is not None and checkpoint.exists():
+            logger.info(f"Reusing {stage} checkpoint written by another pipeline")
+            return
+        if stage == "rag":
+            await run_rag_stage(base_dir, config)
+        else:
+            with llm_cache_scope(stage):
+                await run_summary_stage(base_dir, config)
+
+
+async def _run_stages(base_dir: Path, config_dir: Path, config: Dict, state: Dict, start_idx: int,
+                      session_id: str, session_manager, publish_tasks: List[asyncio.Task],
+                      shared_lock: Optional[asyncio.Lock] = None):
+    """Run stages from start_idx until one fails."""
     for i in range(start_idx, len(STAGES)):
         # Check if cancelled before starting each stage
         if session_manager and session_id and session_manager.is_cancelled(session_id):
@@ -52,6 +264,7 @@ async def run_pipeline(base_dir: Path, config_dir: Path, config: Dict, from_stag
             state["stages"][STAGES[i]] = "cancelled"
             state["error"] = "Cancelled by user"
             save_state(config_dir, state)
+            get_event_bus().publish(session_id, "stage_cancelled", stage=STAGES[i])
             raise Exception("Pipeline cancelled by user")
         
         stage = STAGES[i]
@@ -59,33 +272,35 @@ async def run_pipeline(base_dir: Path, config_dir: Path, config: Dict, from_stag
         
         state["stages"][stage] = "running"
         save_state(config_dir, state)
+        get_event_bus().publish(session_id, "stage_started", stage=stage)
         
         try:
-            if stage == "rag":
-                await run_rag_stage(base_dir, config)
-            elif stage == "summary":
-                await run_summary_stage(base_dir, config)
+            if stage in ("rag", "summary"):
+                await _run_shared_stage(stage, base_dir, config, shared_lock)
             elif stage == "plan":
-                await run_plan_stage(base_dir, config_dir, config)
+                with llm_cache_scope(stage):
+                    await run_plan_stage(base_dir, config_dir, config)
             elif stage == "generate":
-                await run_generate_stage(base_dir, config_dir, config)
+                await _run_generate_with_progress(base_dir, config_dir, config, session_id)
             
             state["stages"][stage] = "completed"
             save_state(config_dir, state)
+            get_event_bus().publish(session_id, "stage_completed", stage=stage)
+            
+            # Both checkpoints are complete once summary is done; publishing
+            # earlier could copy a summary checkpoint that is still being written
+            if stage == "summary":
+                publish_tasks.append(asyncio.create_task(
+                    asyncio.to_thread(publish_checkpoints, base_dir, config)
+                ))
             
         except Exception as e:
             state["stages"][stage] = "failed"
             state["error"] = str(e)
             save_state(config_dir, state)
+            get_event_bus().publish(session_id, "stage_failed", stage=stage, error=str(e))
             logger.error(f"Stage failed: {e}", exc_info=True)
             break
-    
-    # Print summary
-    log_section("SUMMARY")
-    for stage in STAGES:
-        status = state["stages"].get(stage, "pending")
-        icon = "✓" if status == "completed" else "✗" if status == "failed" else "○"
-        logger.info(f"  [{icon}] {stage}: {status}")
 
 
 def list_outputs(output_dir: str):
@@ -97,7 +312,7 @@ def list_outputs(output_dir: str):
     
     found = False
     for project_dir in sorted(output_path.iterdir()):
-        if not project_dir.is_dir():
+        if not project_dir.is_dir() or project_dir.name.startswith("."):
             continue
         
         for content_dir in sorted(project_dir.iterdir()):
@@ -0,0 +1,120 @@
+"""
+Regenerate a subset of slides of an existing deck
+
+The generate stage runs on a copy of ``checkpoint_plan.json`` that only
+contains the selected slides, in a staging directory. The new output
+directory hard-links every unchanged image of the previous run and takes
+the regenerated images under the original file names; the PDF is rebuilt
+from the combined images in plan order.
+"""
+import os
+import shutil
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from ..utils import load_json
+from .paths import get_plan_checkpoint, get_output_dir
+from .pipeline import _run_generate_stage
+from .slide_files import (
+    PDF_NAME, list_images, find_latest_output, map_slides, slide_stem,
+    build_pdf, generate_sections,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _link_or_copy(src: Path, dst: Path):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+async def regenerate_slides(base_dir: Path, config_dir: Path, config: Dict, slide_indices: List[int]) -> Dict:
+    """Regenerate the given slides (1-based) into a new output directory.
+
+    Args:
+        base_dir: Base directory for this document/project
+        config_dir: Config-specific directory with checkpoint_plan.json
+        config: Pipeline configuration of the deck
+        slide_indices: 1-based positions of the slides in the plan
+
+    Returns:
+        {"output_dir", "previous_output_dir", "regenerated", "linked"}
+
+    Raises:
+        FileNotFoundError: No plan checkpoint or previous output
+        ValueError: Invalid slide indices
+    """
+    plan_path = get_plan_checkpoint(config_dir)
+    checkpoint = load_json(plan_path)
+    if not checkpoint:
+        raise FileNotFoundError(f"No plan checkpoint in {config_dir}")
+    previous_dir = find_latest_output(config_dir)
+    if previous_dir is None:
+        raise FileNotFoundError(f"No previous output to update in {config_dir}")
+
+    sections = checkpoint["plan"]["sections"]
+    indices = sorted(set(slide_indices))
+    if not indices or indices[0] < 1 or indices[-1] > len(sections):
+        raise ValueError(f"Slide indices must be between 1 and {len(sections)}")
+    selected_ids = [sections[i - 1]["id"] for i in indices]
+
+    # Generate the selected slides from a reduced plan in a staging directory
+    staging_dir = config_dir.parent / f".regen_{config_dir.name}_{datetime.now():%Y%m%d_%H%M%S_%f}"
+    staging_dir.mkdir(parents=True)
+    output_dir = None
+    try:
+        generated = await generate_sections(
+            staging_dir, checkpoint, indices,
+            # The selected slides are regenerated on purpose, not served from the cache
+            lambda directory: _run_generate_stage(base_dir, directory, config, use_cache=False)
+        )
+        previous_images = list_images(previous_dir)
+        previous = map_slides(previous_images, [section["id"] for section in sections])
+
+        output_dir = get_output_dir(config_dir)
+        output_dir.mkdir(parents=True, exist_ok=False)
+
+        # A regenerated image replaces the previous file of its slide, keeping
+        # its name so the deck's naming does not change
+        slides = {}
+        for position, image in generated.items():
+            if position in previous:
+                stem = previous[position].stem
+            else:
+                stem = slide_stem(image, sections[position]["id"], position)
+            slides[position] = output_dir / f"{stem}{image.suffix.lower()}"
+            shutil.move(str(image), slides[position])
+
+        linked = 0
+        replaced = {previous[position] for position in generated if position in previous}
+        for path in previous_images:
+            if path in replaced:
+                continue
+            _link_or_copy(path, output_dir / path.name)
+            linked += 1
+        for position, path in previous.items():
+            slides.setdefault(position, output_dir / path.name)
+
+        if (previous_dir / PDF_NAME).exists():
+            pages = [slides[position] for position in sorted(slides)]
+            await asyncio.to_thread(build_pdf, pages, output_dir / PDF_NAME)
+    except BaseException:
+        # A partial output directory would be picked up as the latest result
+        if output_dir is not None:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        raise
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    logger.info(f"Regenerated {len(generated)} slides, linked {linked} from {previous_dir.name}")
+    return {
+        "output_dir": output_dir,
+        "previous_output_dir": previous_dir,
+        "regenerated": selected_ids,
+        "linked": linked,
+    }
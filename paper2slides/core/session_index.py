@@ -0,0 +1,111 @@
+"""
+Session index: session_id -> config directory and latest state
+
+Maintained by save_state so that status polls do not have to scan the
+outputs tree. The in-memory index only covers the current process; set
+P2S_SESSION_INDEX_REDIS_URL to share the session -> config_dir mapping
+between processes.
+"""
+import os
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_INDEXED_SESSIONS = int(os.getenv("P2S_SESSION_INDEX_SIZE", "2000"))
+REDIS_KEY_PREFIX = "p2s:session:"
+REDIS_TTL_SECONDS = 7 * 24 * 3600
+
+
+class SessionIndex:
+    """In-memory LRU index of session states."""
+
+    def __init__(self, max_size: int = MAX_INDEXED_SESSIONS):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Path, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, session_id: str, config_dir: Path, state: Dict):
+        """Record the latest state saved for a session."""
+        with self._lock:
+            self._entries[session_id] = (Path(config_dir), copy.deepcopy(state))
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def lookup(self, session_id: str) -> Optional[Tuple[Path, Optional[Dict]]]:
+        """Get (config_dir, state) for a session.
+
+        State is None when only the directory is known and has to be loaded
+        from disk.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(session_id)
+            config_dir, state = entry
+            return config_dir, copy.deepcopy(state)
+
+
+class RedisSessionIndex(SessionIndex):
+    """Session index that also stores session -> config_dir in Redis."""
+
+    def __init__(self, redis_url: str, max_size: int = MAX_INDEXED_SESSIONS):
+        super().__init__(max_size)
+        import redis
+        self._redis = redis.Redis.from_url(
+            redis_url,
+            decode_responses=True,
+            socket_connect_timeout=5,
+            socket_timeout=5
+        )
+        self._published = set()
+
+    def update(self, session_id: str, config_dir: Path, state: Dict):
+        super().update(session_id, config_dir, state)
+        # The directory does not change during a session, write it once
+        key = (session_id, str(config_dir))
+        if key in self._published:
+            return
+        try:
+            self._redis.set(f"{REDIS_KEY_PREFIX}{session_id}", str(config_dir), ex=REDIS_TTL_SECONDS)
+            self._published.add(key)
+        except Exception as e:
+            logger.warning(f"Failed to index session {session_id[:8]} in Redis: {e}")
+
+    def lookup(self, session_id: str) -> Optional[Tuple[Path, Optional[Dict]]]:
+        entry = super().lookup(session_id)
+        if entry is not None:
+            return entry
+        try:
+            config_dir = self._redis.get(f"{REDIS_KEY_PREFIX}{session_id}")
+        except Exception as e:
+            logger.warning(f"Failed to look up session {session_id[:8]} in Redis: {e}")
+            return None
+        return (Path(config_dir), None) if config_dir else None
+
+
+_session_index: Optional[SessionIndex] = None
+_session_index_lock = threading.Lock()
+
+
+def get_session_index() -> SessionIndex:
+    """Get the process-wide session index."""
+    global _session_index
+    if _session_index is None:
+        with _session_index_lock:
+            if _session_index is None:
+                redis_url = os.getenv("P2S_SESSION_INDEX_REDIS_URL")
+                if redis_url:
+                    try:
+                        _session_index = RedisSessionIndex(redis_url)
+                    except Exception as e:
+                        logger.warning(f"Redis session index unavailable, using in-memory index: {e}")
+                if _session_index is None:
+                    _session_index = SessionIndex()
+    return _session_index
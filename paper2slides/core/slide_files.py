@@ -0,0 +1,115 @@
+"""
+Slide image files of a deck
+
+The generator names each image after its section id, or after its 1-based
+position in the plan it was given (``slide_1`` ... ``slide_10``). These
+helpers map images back to plan positions and generate a subset of the
+plan's slides in a staging directory, for partial regeneration and for
+retrying the slides a failed generate stage did not write.
+"""
+import re
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from ..utils import save_json
+from .paths import get_plan_checkpoint
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp")
+PDF_NAME = "slides.pdf"
+
+_TRAILING_NUMBER = re.compile(r"(\d+)$")
+
+
+def list_images(directory: Optional[Path]) -> List[Path]:
+    """Slide images in a directory, by file name."""
+    if directory is None or not directory.exists():
+        return []
+    return sorted(p for p in directory.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def find_latest_output(config_dir: Path) -> Optional[Path]:
+    """Latest timestamped output directory that contains images."""
+    if not config_dir.exists():
+        return None
+    for output_dir in sorted((d for d in config_dir.iterdir() if d.is_dir()), reverse=True):
+        if list_images(output_dir):
+            return output_dir
+    return None
+
+
+def map_slides(images: List[Path], section_ids: List[str]) -> Dict[int, Path]:
+    """Map slide images to their 0-based position in ``section_ids``.
+
+    A stem is matched against the section ids first and otherwise by its
+    trailing number. Images that match neither are left out.
+    """
+    positions = {section_id: i for i, section_id in enumerate(section_ids)}
+    mapped = {}
+    for image in images:
+        position = positions.get(image.stem)
+        if position is None:
+            match = _TRAILING_NUMBER.search(image.stem)
+            if match and 1 <= int(match.group(1)) <= len(section_ids):
+                position = int(match.group(1)) - 1
+        if position is not None:
+            mapped[position] = image
+    return mapped
+
+
+def slide_stem(image: Path, section_id: str, position: int) -> str:
+    """Name of a staged image in the full deck at 0-based ``position``.
+
+    Position-named images are renumbered (keeping their zero padding),
+    since the staged plan only held a subset of the slides.
+    """
+    match = _TRAILING_NUMBER.search(image.stem)
+    if image.stem == section_id or not match:
+        return image.stem
+    number = str(position + 1).zfill(len(match.group(1)))
+    return image.stem[:match.start()] + number
+
+
+def build_pdf(images: List[Path], pdf_path: Path):
+    """Write the images as pages of one PDF, in the given order."""
+    from PIL import Image
+
+    pages = [Image.open(p).convert("RGB") for p in images]
+    try:
+        pages[0].save(pdf_path, save_all=True, append_images=pages[1:])
+    finally:
+        for page in pages:
+            page.close()
+
+
+async def generate_sections(
+    staging_dir: Path,
+    checkpoint: Dict,
+    indices: List[int],
+    generate: Callable[[Path], Awaitable[None]],
+) -> Dict[int, Path]:
+    """Generate the slides at the given 1-based plan positions.
+
+    ``generate`` runs the generate stage for a config directory; it is given
+    ``staging_dir``, which holds a copy of the plan checkpoint with only the
+    selected sections.
+
+    Returns:
+        {0-based position in the full plan: staged image}
+
+    Raises:
+        RuntimeError: The stage did not write one image per selected slide
+    """
+    sections = checkpoint["plan"]["sections"]
+    selected = [sections[i - 1] for i in indices]
+    reduced = {**checkpoint, "plan": {**checkpoint["plan"], "sections": selected}}
+    save_json(get_plan_checkpoint(staging_dir), reduced)
+    await generate(staging_dir)
+
+    # Staged positions refer to the reduced plan
+    staged = map_slides(list_images(find_latest_output(staging_dir)), [s["id"] for s in selected])
+    if len(staged) != len(selected):
+        raise RuntimeError(f"Expected {len(selected)} generated slides, got {len(staged)}")
+    return {indices[i] - 1: image for i, image in staged.items()}
@@ -0,0 +1,182 @@
+"""
+Speculative plans for sibling configurations
+
+Users often regenerate a paper with another length/density right after
+the first result. When a pipeline with ``speculative_plans`` enabled
+finishes, plans for the sibling lengths (slides) or densities (poster) are
+computed from the shared rag/summary checkpoints on a background thread, so
+a later regeneration starts at ``generate``.
+
+Speculation only runs while no pipeline is active in the process and is
+capped at P2S_SPECULATIVE_BUDGET plans per hour.
+"""
+import os
+import copy
+import time
+import shutil
+import asyncio
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .paths import get_config_dir, get_plan_checkpoint, get_summary_checkpoint
+from .state import STAGES, create_state, load_state, save_state
+from .stages import run_plan_stage
+from .llm_cache import llm_cache_scope
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_BUDGET = int(os.getenv("P2S_SPECULATIVE_BUDGET", "10"))
+BUDGET_WINDOW_SECONDS = 3600
+MAX_PENDING_JOBS = 20
+
+SIBLING_PARAMS = {
+    "slides": ("slides_length", ["short", "medium", "long"]),
+    "poster": ("poster_density", ["sparse", "medium", "dense"]),
+}
+
+_active_pipelines = 0
+_active_lock = threading.Lock()
+
+
+def pipeline_started():
+    """Record that a pipeline started (speculation yields to it)."""
+    global _active_pipelines
+    with _active_lock:
+        _active_pipelines += 1
+
+
+def pipeline_finished():
+    """Record that a pipeline finished."""
+    global _active_pipelines
+    with _active_lock:
+        _active_pipelines -= 1
+
+
+def is_idle() -> bool:
+    """True when no pipeline is running in this process."""
+    with _active_lock:
+        return _active_pipelines == 0
+
+
+def sibling_configs(config: Dict) -> List[Dict]:
+    """Configs that differ from ``config`` only in length/density."""
+    output_type = config.get("output_type", "slides")
+    if output_type not in SIBLING_PARAMS:
+        return []
+    key, values = SIBLING_PARAMS[output_type]
+    current = config.get(key, "medium")
+    siblings = []
+    for value in values:
+        if value == current:
+            continue
+        sibling = copy.deepcopy(config)
+        sibling[key] = value
+        sibling.pop("speculative_plans", None)
+        siblings.append(sibling)
+    return siblings
+
+
+class SpeculativePlanner:
+    """Background worker that computes sibling plans within a budget."""
+
+    def __init__(self, budget: int = SPECULATIVE_BUDGET):
+        self.budget = budget
+        self._spent = deque()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="p2s-speculation",
+                    daemon=True,
+                ).start()
+            return self._loop
+
+    def _take_budget(self) -> bool:
+        now = time.time()
+        with self._lock:
+            while self._spent and now - self._spent[0] > BUDGET_WINDOW_SECONDS:
+                self._spent.popleft()
+            if len(self._spent) >= self.budget:
+                return False
+            self._spent.append(now)
+            return True
+
+    def schedule(self, base_dir: Path, config: Dict):
+        """Queue plans for the siblings of a finished configuration."""
+        if self.budget <= 0 or not get_summary_checkpoint(base_dir, config).exists():
+            return
+        loop = self._ensure_loop()
+        for sibling in sibling_configs(config):
+            config_dir = get_config_dir(base_dir, sibling)
+            if get_plan_checkpoint(config_dir).exists():
+                continue
+            with self._lock:
+                if config_dir in self._pending or len(self._pending) >= MAX_PENDING_JOBS:
+                    continue
+                self._pending.add(config_dir)
+            asyncio.run_coroutine_threadsafe(self._plan(base_dir, config_dir, sibling), loop)
+
+    async def _plan(self, base_dir: Path, config_dir: Path, config: Dict):
+        try:
+            if not is_idle():
+                logger.info(f"Speculation skipped, pipelines running: {config_dir.name}")
+                return
+            if get_plan_checkpoint(config_dir).exists():
+                return
+            if not self._take_budget():
+                logger.info(f"Speculation budget exhausted, skipped: {config_dir.name}")
+                return
+            await self._run_plan(base_dir, config_dir, config)
+        except Exception as e:
+            logger.warning(f"Speculative plan failed for {config_dir.name}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(config_dir)
+
+    async def _run_plan(self, base_dir: Path, config_dir: Path, config: Dict):
+        # Plan into a staging directory so a pipeline that targets the same
+        # configuration meanwhile never sees a partial or replaced plan
+        staging_dir = config_dir.parent / f".speculative_{config_dir.name}"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        staging_dir.mkdir(parents=True)
+        try:
+            with llm_cache_scope("plan"):
+                await run_plan_stage(base_dir, staging_dir, config)
+            plan_path = get_plan_checkpoint(config_dir)
+            if plan_path.exists():
+                return
+            config_dir.mkdir(parents=True, exist_ok=True)
+            os.replace(get_plan_checkpoint(staging_dir), plan_path)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        if load_state(config_dir) is None:
+            state = create_state(config)
+            for stage in STAGES[:-1]:
+                state["stages"][stage] = "completed"
+            state["speculative"] = True
+            save_state(config_dir, state)
+        logger.info(f"Speculative plan ready: {config_dir.name}")
+
+
+_planner: Optional[SpeculativePlanner] = None
+_planner_lock = threading.Lock()
+
+
+def get_speculative_planner() -> SpeculativePlanner:
+    """Get the process-wide speculative planner."""
+    global _planner
+    if _planner is None:
+        with _planner_lock:
+            if _planner is None:
+                _planner = SpeculativePlanner()
+    return _planner
@@ -3,7 +3,7 @@ State management for pipeline execution
 """
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 from ..utils import load_json, save_json
 from .paths import (
@@ -11,6 +11,9 @@ from .paths import (
     get_summary_checkpoint,
     get_plan_checkpoint,
 )
+from .checkpoint_store import restore_checkpoints
+from .session_index import get_session_index
+from .events import get_event_bus
 
 STAGES = ["rag", "summary", "plan", "generate"]
 
@@ -26,9 +29,35 @@ def load_state(config_dir: Path) -> Optional[Dict]:
 
 
 def save_state(config_dir: Path, state: Dict):
-    """Save pipeline state to file."""
+    """Save pipeline state to file, update the session index and notify subscribers."""
     state["updated_at"] = datetime.now().isoformat()
     save_json(get_state_path(config_dir), state)
+    if state.get("session_id"):
+        get_session_index().update(state["session_id"], config_dir, state)
+        get_event_bus().publish(
+            state["session_id"], "state",
+            stages=dict(state.get("stages", {})),
+            error=state.get("error"),
+            updated_at=state["updated_at"],
+        )
+
+
+def index_session(session_id: str, config_dir: Path, state: Dict):
+    """Add a state found on disk to the session index."""
+    get_session_index().update(session_id, config_dir, state)
+
+
+def find_session_state(session_id: str) -> Optional[Tuple[Path, Dict]]:
+    """Look up (config_dir, state) of a session in the session index."""
+    entry = get_session_index().lookup(session_id)
+    if entry is None:
+        return None
+    config_dir, state = entry
+    if state is None:
+        state = load_state(config_dir)
+        if not state or state.get("session_id") != session_id:
+            return None
+    return config_dir, state
 
 
 def create_state(config: Dict) -> Dict:
@@ -42,6 +71,9 @@ def create_state(config: Dict) -> Dict:
 
 def detect_start_stage(base_dir: Path, config_dir: Path, config: Dict) -> str:
     """根据现有检查点检测从哪个阶段开始."""
+    # Reuse checkpoints of identical content processed under another project
+    restore_checkpoints(base_dir, config)
+    
     # Check mode-specific checkpoints
     if not get_rag_checkpoint(base_dir, config).exists():
         return "rag"
@@ -0,0 +1,98 @@
+"""系统论文批量预生成命令行
+
+读取论文列表，为尚无默认结果的系统论文以低优先级提交生成任务。
+队列已满时按间隔重试，直到所有条目都已提交或跳过，适合在夜间定时执行。
+
+论文列表文件每行一篇论文，格式为 "paper_id,source"，空行和 # 开头的行会被忽略。
+
+用法:
+    python pregenerate.py papers.txt --agent-types poster slides
+"""
+import argparse
+import time
+from typing import Dict, List
+
+from main import load_env_from_config, logger
+
+
+def read_paper_list(path: str) -> List[Dict[str, str]]:
+    """读取论文列表文件
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        论文列表，每项包含 paper_id 和 source
+
+    Raises:
+        ValueError: 行格式无效
+    """
+    papers = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = [part.strip() for part in line.split(',')]
+            if len(parts) != 2 or not all(parts):
+                raise ValueError(f"第 {line_no} 行格式无效，应为 paper_id,source: {line}")
+            papers.append({"paper_id": parts[0], "source": parts[1]})
+    return papers
+
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="批量预生成系统论文的默认结果")
+    parser.add_argument("paper_list", help="论文列表文件，每行 paper_id,source")
+    parser.add_argument("--agent-types", nargs="+", default=["poster"],
+                        choices=["poster", "slides"], help="任务类型")
+    parser.add_argument("--style", default="doraemon", help="风格")
+    parser.add_argument("--language", default="ZH", help="语言 (ZH/EN)")
+    parser.add_argument("--density", default="medium", help="内容密度 (sparse/medium/dense)")
+    parser.add_argument("--retry-interval", type=int, default=None,
+                        help="队列已满时的重试间隔（秒），默认读取配置")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    load_env_from_config()
+
+    from config.settings import get_settings
+    from services.task_service import get_task_service
+
+    settings = get_settings()
+    task_service = get_task_service()
+    retry_interval = args.retry_interval or settings.pregenerate_retry_interval
+
+    papers = read_paper_list(args.paper_list)
+    logger.info(f"待预生成论文: {len(papers)} 篇, 任务类型: {args.agent_types}")
+
+    # 按任务类型分别重试，已提交的条目不会被重复提交
+    pending = {agent_type: papers for agent_type in args.agent_types}
+    submitted = skipped = 0
+    while True:
+        for agent_type in list(pending):
+            result = task_service.pregenerate_system_papers(
+                papers=pending[agent_type],
+                agent_types=[agent_type],
+                style=args.style,
+                language=args.language,
+                density=args.density
+            )
+            submitted += len(result["submitted"])
+            skipped += len(result["skipped"])
+            pending[agent_type] = [
+                {"paper_id": item["paper_id"], "source": item["source"]}
+                for item in result["deferred"]
+            ]
+            if not pending[agent_type]:
+                del pending[agent_type]
+
+        if not pending:
+            break
+        remaining = sum(len(items) for items in pending.values())
+        logger.info(f"队列已满，剩余 {remaining} 个任务 {retry_interval} 秒后重试")
+        time.sleep(retry_interval)
+
+    logger.info(f"预生成提交完成 - 提交: {submitted}, 跳过: {skipped}")
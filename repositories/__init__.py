@@ -1,3 +1,12 @@
 """数据仓库模块"""
 from repositories.system_paper_repo import SystemPaperRepository, get_system_paper_repo
 from repositories.user_paper_repo import UserPaperRepository, get_user_paper_repo
+from repositories.unit_of_work import TaskUnitOfWork
+
+__all__ = [
+    "SystemPaperRepository",
+    "get_system_paper_repo",
+    "UserPaperRepository",
+    "get_user_paper_repo",
+    "TaskUnitOfWork",
+]
@@ -275,6 +275,30 @@ class SystemPaperRepository(BaseRepository[SystemPaperResult]):
         result = self._collection.delete_many(filter_dict)
         return result.deleted_count
 
+    def delete_empty_record(
+        self,
+        paper_id: str,
+        agent_type: str,
+        source: str
+    ) -> int:
+        """删除无结果（file_path为空）的系统记录，已有结果的记录不受影响
+
+        Args:
+            paper_id: 论文ID
+            agent_type: 任务类型
+            source: 论文来源
+
+        Returns:
+            删除的文档数量
+        """
+        result = self._collection.delete_one({
+            "paper_id": paper_id,
+            "agent_type": agent_type,
+            "source": source,
+            "file_path": None
+        })
+        return result.deleted_count
+
     def find_empty_results(self) -> List[SystemPaperResult]:
         """查找所有无结果（file_path为空）的系统记录
 
@@ -0,0 +1,82 @@
+"""任务运行工作单元
+
+单次任务运行内缓存已加载的任务实体，并集中写回修改。
+"""
+import logging
+from typing import Optional, Dict
+
+from models.entities.user_paper_result import UserPaperResult
+from repositories.user_paper_repo import UserPaperRepository, get_user_paper_repo
+
+logger = logging.getLogger(__name__)
+
+
+class TaskUnitOfWork:
+    """单次任务运行的工作单元
+
+    同一任务在一次运行内只从数据库读取一次，之后各步骤共享同一实体；
+    对实体的修改由 flush 统一写回，每个实体只发出一次只含修改字段的更新。
+    不同运行各自创建实例，实例不在线程或运行之间共享。
+    """
+
+    def __init__(self, user_repo: Optional[UserPaperRepository] = None):
+        self._user_repo = user_repo or get_user_paper_repo()
+        self._tasks: Dict[str, Optional[UserPaperResult]] = {}
+        self.reads = 0
+        self.writes = 0
+
+    def get_task(self, result_id: str) -> Optional[UserPaperResult]:
+        """获取任务实体，同一运行内只查询一次
+
+        Args:
+            result_id: 任务ID
+
+        Returns:
+            任务实体或 None（不存在的结果同样缓存）
+        """
+        if result_id not in self._tasks:
+            self._tasks[result_id] = self._user_repo.find_by_result_id(result_id)
+            self.reads += 1
+        return self._tasks[result_id]
+
+    def forget(self, result_id: str) -> None:
+        """丢弃缓存的实体，下次获取时重新读取
+
+        Args:
+            result_id: 任务ID
+        """
+        self._tasks.pop(result_id, None)
+
+    def persisted_status(self, result_id: str) -> Optional[str]:
+        """获取任务已写入数据库的状态
+
+        Args:
+            result_id: 任务ID
+
+        Returns:
+            已写回的状态；任务未加载、有未写回的修改或写回失败时为 None
+        """
+        task = self._tasks.get(result_id)
+        if task is None or task.dirty_fields():
+            return None
+        return task.persisted_status
+
+    def flush(self) -> int:
+        """写回所有实体的修改
+
+        状态更新按加载时的状态条件执行；条件不满足的实体被丢弃，
+        之后重新读取数据库中的最新状态。
+
+        Returns:
+            成功写回的实体数量
+        """
+        written = 0
+        for result_id, task in list(self._tasks.items()):
+            if task is None or not task.dirty_fields():
+                continue
+            self.writes += 1
+            if self._user_repo.update_task(task):
+                written += 1
+            else:
+                self.forget(result_id)
+        return written
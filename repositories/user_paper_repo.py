@@ -3,7 +3,7 @@
 管理用户的任务执行结果。
 """
 import logging
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, Any, Iterator
 from functools import lru_cache
 from datetime import datetime
 
@@ -14,6 +14,20 @@ from repositories.base import BaseRepository
 
 logger = logging.getLogger(__name__)
 
+# 任务列表只需要的字段
+LIST_PROJECTION = {
+    "_id": 1,
+    "title": 1,
+    "agent_type": 1,
+    "status": 1,
+    "created_time": 1,
+    "paper_id": 1,
+    "source": 1
+}
+
+# 任务列表排序（_id 保证 created_time 相同时顺序稳定）
+LIST_SORT = [("created_time", -1), ("_id", -1)]
+
 
 class UserPaperRepository(BaseRepository[UserPaperResult]):
     """用户论文任务结果仓库
@@ -28,6 +42,19 @@ class UserPaperRepository(BaseRepository[UserPaperResult]):
             entity_class=UserPaperResult
         )
 
+    def insert(self, entity: UserPaperResult) -> str:
+        """插入任务，插入后实体视为未修改
+
+        Args:
+            entity: 任务实体
+
+        Returns:
+            插入的文档 ID
+        """
+        inserted_id = super().insert(entity)
+        entity.mark_clean()
+        return inserted_id
+
     def find_by_result_id(self, result_id: str) -> Optional[UserPaperResult]:
         """根据任务ID查找
 
@@ -65,6 +92,31 @@ class UserPaperRepository(BaseRepository[UserPaperResult]):
         })
         return count > 0
 
+    def has_active_system_task(
+        self,
+        paper_id: str,
+        source: str,
+        agent_type: str
+    ) -> bool:
+        """检查是否有等待中或运行中、完成后负责写入系统默认结果的任务
+
+        Args:
+            paper_id: 论文ID
+            source: 论文来源
+            agent_type: 任务类型
+
+        Returns:
+            是否存在任务
+        """
+        doc = self._collection.find_one({
+            "paper_id": paper_id,
+            "source": source,
+            "agent_type": agent_type,
+            "update_system": True,
+            "status": {"$in": [TaskStatusEnum.WAITING.value, TaskStatusEnum.RUNNING.value]}
+        }, {"_id": 1})
+        return doc is not None
+
     def find_by_user_and_paper(
         self,
         user_id: str,
@@ -99,6 +151,84 @@ class UserPaperRepository(BaseRepository[UserPaperResult]):
         )
         return items, total
 
+    def find_list_page(
+        self,
+        user_id: str,
+        paper_id: str,
+        source: str,
+        limit: int = 10,
+        skip: int = 0,
+        after: Optional[Tuple[datetime, str]] = None,
+        with_total: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """查询任务列表的一页（只返回列表字段）
+
+        传入 after 时按 (created_time, _id) 键集分页，从上一页最后一条之后开始，
+        不随页数增加扫描量；否则按 skip 分页。取页走 idx_user_paper_created 索引，
+        按索引顺序读取，不在内存中排序。总数按基础过滤条件单独 count（同样只扫描索引），
+        翻页时不需要总数可传入 with_total=False 省去这次查询。
+
+        Args:
+            user_id: 用户ID
+            paper_id: 论文ID
+            source: 论文来源
+            limit: 限制数量
+            skip: 跳过数量（仅在未传入 after 时使用）
+            after: 上一页最后一条的 (created_time, result_id)
+            with_total: 是否同时返回总数
+
+        Returns:
+            (文档列表, 总数量)，文档只包含 LIST_PROJECTION 中的字段；
+            with_total 为 False 时总数量为 None
+        """
+        filter_dict = {
+            "user_id": user_id,
+            "paper_id": paper_id,
+            "source": source
+        }
+        total = self.count(filter_dict) if with_total else None
+
+        page_filter = dict(filter_dict)
+        if after is not None:
+            created_time, result_id = after
+            page_filter["$or"] = [
+                {"created_time": {"$lt": created_time}},
+                {"created_time": created_time, "_id": {"$lt": result_id}}
+            ]
+            skip = 0
+
+        cursor = self._collection.find(page_filter, LIST_PROJECTION).sort(LIST_SORT)
+        if skip > 0:
+            cursor = cursor.skip(skip)
+        return list(cursor.limit(limit)), total
+
+    def iter_list(
+        self,
+        user_id: str,
+        paper_id: str,
+        source: str,
+        batch_size: int = 500
+    ) -> Iterator[Dict[str, Any]]:
+        """按列表顺序遍历用户在论文下的所有任务（只返回列表字段）
+
+        游标按批次拉取，不设置总数上限。
+
+        Args:
+            user_id: 用户ID
+            paper_id: 论文ID
+            source: 论文来源
+            batch_size: 每批拉取数量
+
+        Returns:
+            文档迭代器
+        """
+        filter_dict = {
+            "user_id": user_id,
+            "paper_id": paper_id,
+            "source": source
+        }
+        return self._collection.find(filter_dict, LIST_PROJECTION).sort(LIST_SORT).batch_size(batch_size)
+
     def find_by_user_paginated(
         self,
         user_id: str,
@@ -184,16 +314,46 @@ class UserPaperRepository(BaseRepository[UserPaperResult]):
         update_dict = {"status": status, **kwargs}
         return self.update_by_id(result_id, update_dict)
 
-    def update_task(self, task: UserPaperResult) -> int:
-        """更新任务
+    def update_task(self, task: UserPaperResult, check_status: bool = True) -> int:
+        """更新任务中修改过的字段
+
+        只 $set 实体记录的修改字段，被清空（None）的字段 $unset。状态被修改
+        且 check_status 为真时，仅当数据库中的状态仍是加载时的状态才更新，
+        避免覆盖 API 与 worker 之间的并发修改（例如已被取消的任务又被标记为成功）。
 
         Args:
             task: 任务实体
+            check_status: 是否按加载时的状态条件更新
 
         Returns:
-            修改数量
+            匹配数量（写入的值与数据库相同也算成功），条件不满足或没有修改时为 0
         """
-        return self.update_by_id(task.result_id, task.to_dict())
+        update_dict = task.dirty_fields()
+        if not update_dict:
+            return 0
+
+        filter_dict = {"_id": task.result_id}
+        if check_status and "status" in update_dict:
+            filter_dict["status"] = task.persisted_status
+
+        update = {}
+        set_fields = {k: v for k, v in update_dict.items() if v is not None}
+        if set_fields:
+            update["$set"] = set_fields
+        unset_fields = {k: "" for k, v in update_dict.items() if v is None}
+        if unset_fields:
+            update["$unset"] = unset_fields
+
+        # 条件更新是否成功看匹配数：值未变化时 modified_count 为 0，但条件是满足的
+        matched = self._collection.update_one(filter_dict, update).matched_count
+        if matched:
+            task.mark_clean()
+        elif "status" in filter_dict:
+            logger.warning(
+                f"任务状态已被修改，放弃更新: {task.result_id}, "
+                f"expected={task.persisted_status}, new={task.status}"
+            )
+        return matched
 
     def update_running_tasks(
         self,
@@ -232,6 +392,159 @@ class UserPaperRepository(BaseRepository[UserPaperResult]):
         result = self._collection.update_many(filter_dict, {"$set": update_dict})
         return result.modified_count
 
+    def mark_coalesced_running(self, result_id: str) -> int:
+        """将合并到该任务的等待中任务标记为运行中
+
+        Args:
+            result_id: 在途任务ID
+
+        Returns:
+            修改数量
+        """
+        result = self._collection.update_many(
+            {"coalesced_to": result_id, "status": TaskStatusEnum.WAITING.value},
+            {"$set": {"status": TaskStatusEnum.RUNNING.value, "start_time": datetime.now()}}
+        )
+        return result.modified_count
+
+    def complete_coalesced_tasks(
+        self,
+        result_id: str,
+        file_path: str,
+        images: Optional[List[str]] = None
+    ) -> int:
+        """用在途任务的结果完成合并到它的任务
+
+        Args:
+            result_id: 在途任务ID
+            file_path: 结果文件路径
+            images: 图像地址列表
+
+        Returns:
+            修改数量
+        """
+        update_dict = {
+            "status": TaskStatusEnum.SUCCESS.value,
+            "file_path": file_path,
+            "end_time": datetime.now()
+        }
+        if images:
+            update_dict["images"] = images
+        result = self._collection.update_many(
+            {
+                "coalesced_to": result_id,
+                "status": {"$in": [TaskStatusEnum.WAITING.value, TaskStatusEnum.RUNNING.value]}
+            },
+            {"$set": update_dict}
+        )
+        return result.modified_count
+
+    def fail_coalesced_tasks(self, result_id: str, error_reason: str) -> int:
+        """在途任务失败时将合并到它的任务标记为失败
+
+        Args:
+            result_id: 在途任务ID
+            error_reason: 失败原因
+
+        Returns:
+            修改数量
+        """
+        result = self._collection.update_many(
+            {
+                "coalesced_to": result_id,
+                "status": {"$in": [TaskStatusEnum.WAITING.value, TaskStatusEnum.RUNNING.value]}
+            },
+            {"$set": {
+                "status": TaskStatusEnum.FAILED.value,
+                "error_reason": error_reason,
+                "end_time": datetime.now()
+            }}
+        )
+        return result.modified_count
+
+    def find_oldest_coalesced_task(self, result_id: str) -> Optional[UserPaperResult]:
+        """查找合并到该任务、仍未完成的最早请求
+
+        Args:
+            result_id: 在途任务ID
+
+        Returns:
+            最早创建的合并任务或 None
+        """
+        items = self.find_many(
+            {
+                "coalesced_to": result_id,
+                "status": {"$in": [TaskStatusEnum.WAITING.value, TaskStatusEnum.RUNNING.value]}
+            },
+            limit=1,
+            sort=[("created_time", 1), ("_id", 1)]
+        )
+        return items[0] if items else None
+
+    def promote_coalesced_task(self, result_id: str, leader_id: str, update_system: bool) -> bool:
+        """将合并任务提升为新的在途任务，其余合并任务改为合并到它
+
+        Args:
+            result_id: 被提升的合并任务ID
+            leader_id: 原在途任务ID
+            update_system: 完成后是否写入系统默认结果
+
+        Returns:
+            是否提升成功（任务已不再合并到原在途任务时为 False）
+        """
+        active = [TaskStatusEnum.WAITING.value, TaskStatusEnum.RUNNING.value]
+        result = self._collection.update_one(
+            {"_id": result_id, "coalesced_to": leader_id, "status": {"$in": active}},
+            {"$set": {
+                "coalesced_to": None,
+                "status": TaskStatusEnum.WAITING.value,
+                "start_time": None,
+                "update_system": update_system
+            }}
+        )
+        if result.matched_count == 0:
+            return False
+        self._collection.update_many(
+            {"coalesced_to": leader_id, "status": {"$in": active}},
+            {"$set": {"coalesced_to": result_id, "status": TaskStatusEnum.WAITING.value}}
+        )
+        return True
+
+    def fail_orphaned_coalesced_tasks(self, error_reason: str) -> int:
+        """将在途任务已结束或不存在、自身仍未完成的合并任务批量标记为失败
+
+        用于启动恢复：在途任务被批量标记失败时不会逐个处理合并到它的任务。
+
+        Args:
+            error_reason: 失败原因
+
+        Returns:
+            修改数量
+        """
+        active = [TaskStatusEnum.WAITING.value, TaskStatusEnum.RUNNING.value]
+        leader_ids = self._collection.distinct(
+            "coalesced_to",
+            {"coalesced_to": {"$ne": None}, "status": {"$in": active}}
+        )
+        if not leader_ids:
+            return 0
+        active_leaders = set(self._collection.distinct(
+            "_id",
+            {"_id": {"$in": leader_ids}, "status": {"$in": active}}
+        ))
+        orphaned = [leader_id for leader_id in leader_ids if leader_id not in active_leaders]
+        if not orphaned:
+            return 0
+        result = self._collection.update_many(
+            {"coalesced_to": {"$in": orphaned}, "status": {"$in": active}},
+            {"$set": {
+                "status": TaskStatusEnum.FAILED.value,
+                "error_reason": error_reason,
+                "end_time": datetime.now()
+            }}
+        )
+        return result.modified_count
+
     def mark_running(self, result_id: str) -> int:
         """标记任务为运行中
 
@@ -288,6 +601,49 @@ class UserPaperRepository(BaseRepository[UserPaperResult]):
             end_time=datetime.now()
         )
 
+    def fail_all_by_status(
+        self,
+        status: str,
+        error_reason: str,
+        extra_filter: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """将指定状态的所有任务批量标记为失败
+
+        Args:
+            status: 任务状态
+            error_reason: 失败原因
+            extra_filter: 附加过滤条件（可选）
+
+        Returns:
+            修改数量
+        """
+        filter_dict = {"status": status, **(extra_filter or {})}
+        result = self._collection.update_many(
+            filter_dict,
+            {"$set": {
+                "status": TaskStatusEnum.FAILED.value,
+                "error_reason": error_reason,
+                "end_time": datetime.now()
+            }}
+        )
+        return result.modified_count
+
+    def iter_waiting_for_requeue(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """按创建时间遍历需要重新入队的等待任务（合并到其他任务的除外）
+
+        游标按批次拉取，不设置总数上限，只返回入队所需字段。
+
+        Args:
+            batch_size: 每批拉取数量
+
+        Returns:
+            文档迭代器，包含 _id、user_id、priority、created_time
+        """
+        return self._collection.find(
+            {"status": TaskStatusEnum.WAITING.value, "coalesced_to": None},
+            {"_id": 1, "user_id": 1, "priority": 1, "created_time": 1}
+        ).sort([("created_time", 1)]).batch_size(batch_size)
+
     def get_next_waiting_task(self) -> Optional[UserPaperResult]:
         """获取下一个等待中的任务
 
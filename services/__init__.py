@@ -1,3 +1,13 @@
 """服务模块"""
 from services.task_service import TaskService, get_task_service
 from services.minio_service import MinIOService, get_minio_service
+from services.paper_content_service import PaperContentService, get_paper_content_service
+
+__all__ = [
+    "TaskService",
+    "get_task_service",
+    "MinIOService",
+    "get_minio_service",
+    "PaperContentService",
+    "get_paper_content_service",
+]
@@ -3,12 +3,15 @@
 提供文件上传、下载和管理功能，支持多桶配置。
 """
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from functools import lru_cache
 from datetime import timedelta
 
 from minio import Minio
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 
 from config.settings import get_settings
@@ -16,6 +19,9 @@ from common.enums import AgentTypeEnum, PaperTypeEnum
 
 logger = logging.getLogger(__name__)
 
+# S3 批量删除接口单次最多 1000 个对象
+DELETE_BATCH_SIZE = 1000
+
 
 class MinIOService:
     """MinIO 文件服务类
@@ -25,6 +31,9 @@ class MinIOService:
 
     _instance: Optional['MinIOService'] = None
     _client: Optional[Minio] = None
+    # 已确认存在的桶（进程内缓存，避免每次上传前都调用 bucket_exists）
+    _known_buckets: set = set()
+    _bucket_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
@@ -57,11 +66,18 @@ class MinIOService:
         Args:
             bucket_name: 桶名称
         """
+        if bucket_name in self._known_buckets:
+            return
+
         try:
-            client = self._get_client()
-            if not client.bucket_exists(bucket_name):
-                client.make_bucket(bucket_name)
-                logger.info(f"已创建 MinIO bucket: {bucket_name}")
+            with self._bucket_lock:
+                if bucket_name in self._known_buckets:
+                    return
+                client = self._get_client()
+                if not client.bucket_exists(bucket_name):
+                    client.make_bucket(bucket_name)
+                    logger.info(f"已创建 MinIO bucket: {bucket_name}")
+                self._known_buckets.add(bucket_name)
         except S3Error as e:
             error_msg = f"创建 bucket 失败: {e.message if e.message else str(e)}"
             logger.error(error_msg)
@@ -202,6 +218,96 @@ class MinIOService:
             logger.error(error_msg)
             return False
 
+    @staticmethod
+    def file_signature(local_path: str) -> Tuple[int, int]:
+        """文件签名（大小, 修改时间），用于判断提前上传后文件是否又被改写"""
+        stat = Path(local_path).stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def _result_object(
+        self,
+        agent_type: str,
+        paper_type: str,
+        paper_id: str,
+        result_id: str,
+        source: str,
+        user_id: str,
+        filename: str
+    ) -> Tuple[str, str, str]:
+        """确定结果文件的对象名称
+
+        Returns:
+            (对象名称, 文件类型, 角色)，角色为 main（主文件）、image（slides图片）或 other
+        """
+        # 确定文件类型和上传路径前缀
+        if paper_type == PaperTypeEnum.SYSTEM.value:
+            # system: bucket_name/source/paper_id/
+            path_prefix = f"{source}/{paper_id}"
+            images_folder = f"{source}/{paper_id}/images"
+        else:
+            # user: bucket_name/user_id/paper_id/
+            path_prefix = f"{user_id}/{paper_id}/{result_id}"
+            images_folder = f"{user_id}/{paper_id}/{result_id}/images"
+
+        # 根据文件类型和任务类型确定上传路径
+        suffix = Path(filename).suffix.lower()
+
+        if suffix == ".pdf":
+            # PDF文件：直接上传到根目录（仅slides生成PDF）
+            return f"{path_prefix}/{filename}", "application/pdf", "main"
+        if suffix in (".png", ".jpg", ".jpeg", ".webp"):
+            # 图片文件：根据任务类型处理
+            content_type = f"image/{suffix[1:]}"
+            if agent_type == AgentTypeEnum.POSTER.value:
+                # poster类型：唯一的一张图，上传到根目录作为主文件，不放入images
+                return f"{path_prefix}/{filename}", content_type, "main"
+            # slides类型：所有图片都上传到images文件夹
+            return f"{images_folder}/{filename}", content_type, "image"
+        # 其他文件：直接上传到根目录
+        return f"{path_prefix}/{filename}", "application/octet-stream", "other"
+
+    def upload_result_file(
+        self,
+        agent_type: str,
+        paper_type: str,
+        paper_id: str,
+        result_id: str,
+        source: str,
+        user_id: str,
+        filename: str,
+        local_path: str
+    ) -> Tuple[int, int]:
+        """在生成过程中提前上传单个结果文件
+
+        对象名称与 upload_task_results 一致，最终上传时签名未变的文件会被跳过。
+        仅用于用户论文：系统论文的对象路径不含任务ID，提前上传会覆盖正在使用的默认结果。
+
+        Args:
+            agent_type: 任务类型 (poster/slides)
+            paper_type: 论文类型 (system/user)
+            paper_id: 论文ID
+            result_id: 任务ID
+            source: 论文来源
+            user_id: 用户ID
+            filename: 文件名
+            local_path: 本地文件路径
+
+        Returns:
+            上传时的文件签名
+
+        Raises:
+            ValueError: 系统论文不支持提前上传
+        """
+        if paper_type == PaperTypeEnum.SYSTEM.value:
+            raise ValueError("系统论文的结果只能在生成成功后上传")
+        bucket_name = get_settings().get_bucket_name(agent_type, paper_type)
+        object_name, content_type, _ = self._result_object(
+            agent_type, paper_type, paper_id, result_id, source, user_id, filename
+        )
+        signature = self.file_signature(local_path)
+        self.upload_file(bucket_name, local_path, object_name, content_type)
+        return signature
+
     def upload_task_results(
         self,
         agent_type: str,
@@ -210,7 +316,8 @@ class MinIOService:
         result_id: str,
         source: str,
         user_id: str,
-        output_files: List[Dict[str, str]]
+        output_files: List[Dict[str, str]],
+        uploaded: Optional[Dict[str, Tuple[int, int]]] = None
     ) -> Dict[str, Any]:
         """上传任务结果文件
 
@@ -222,60 +329,53 @@ class MinIOService:
             source: 论文来源
             user_id: 用户ID
             output_files: 输出文件列表 [{"filename": "", "path": ""}]
+            uploaded: 已通过 upload_result_file 提前上传的文件 {本地路径: 签名}，
+                签名未变的文件不再重复上传
 
         Returns:
             上传结果 {"file_path": "", "images": []}
         """
         settings = get_settings()
         bucket_name = settings.get_bucket_name(agent_type, paper_type)
+        uploaded = uploaded or {}
 
         main_file = None
         images = []
+        # 待上传文件 (本地路径, 对象名称, 文件类型)
+        uploads = []
 
         for file_info in output_files:
             filename = file_info["filename"]
             local_path = file_info["path"]
 
-            # 确定文件类型和上传路径前缀
-            if paper_type == PaperTypeEnum.SYSTEM.value:
-                # system: bucket_name/source/paper_id/
-                path_prefix = f"{source}/{paper_id}"
-                images_folder = f"{source}/{paper_id}/images"
-            else:
-                # user: bucket_name/user_id/paper_id/
-                path_prefix = f"{user_id}/{paper_id}/{result_id}"
-                images_folder = f"{user_id}/{paper_id}/{result_id}/images"
-
-            # 根据文件类型和任务类型上传
-            suffix = Path(filename).suffix.lower()
-
-            if suffix == ".pdf":
-                # PDF文件：直接上传到根目录（仅slides生成PDF）
-                object_name = f"{path_prefix}/{filename}"
-                content_type = "application/pdf"
-                self.upload_file(bucket_name, local_path, object_name, content_type)
+            object_name, content_type, role = self._result_object(
+                agent_type, paper_type, paper_id, result_id, source, user_id, filename
+            )
+            if role == "main":
                 main_file = object_name
-            elif suffix in (".png", ".jpg", ".jpeg", ".webp"):
-                # 图片文件：根据任务类型处理
-                if agent_type == AgentTypeEnum.POSTER.value:
-                    # poster类型：唯一的一张图，上传到根目录作为主文件，不放入images
-                    object_name = f"{path_prefix}/{filename}"
-                    content_type = f"image/{suffix[1:]}"
-                    self.upload_file(bucket_name, local_path, object_name, content_type)
-                    main_file = object_name
-                else:
-                    # slides类型：所有图片都上传到images文件夹
-                    object_name = f"{images_folder}/{filename}"
-                    content_type = f"image/{suffix[1:]}"
-                    self.upload_file(bucket_name, local_path, object_name, content_type)
-                    images.append(object_name)
-            else:
-                # 其他文件：直接上传到根目录
-                object_name = f"{path_prefix}/{filename}"
-                content_type = "application/octet-stream"
-                self.upload_file(bucket_name, local_path, object_name, content_type)
-                if main_file is None:
-                    main_file = object_name
+            elif role == "image":
+                images.append(object_name)
+            elif main_file is None:
+                main_file = object_name
+
+            if local_path in uploaded and uploaded[local_path] == self.file_signature(local_path):
+                continue
+            uploads.append((local_path, object_name, content_type))
+
+        # 桶只检查一次，文件并发上传
+        if uploads:
+            self._ensure_bucket(bucket_name)
+            max_workers = min(settings.minio_upload_workers, len(uploads))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="minio-upload") as executor:
+                futures = [
+                    executor.submit(self.upload_file, bucket_name, local_path, object_name, content_type)
+                    for local_path, object_name, content_type in uploads
+                ]
+                # 任一文件失败则整体失败，与顺序上传行为一致
+                for future in futures:
+                    future.result()
+        if uploaded:
+            logger.info(f"提前上传 {len(output_files) - len(uploads)} 个文件，补充上传 {len(uploads)} 个文件")
 
         # poster: 图片已经上传到根目录并设为main_file，images保持为空
         # slides: 如果没有PDF但有图片，使用第一张图片作为主文件
@@ -287,6 +387,52 @@ class MinIOService:
             "images": [f"{bucket_name}/{img}" for img in images] if agent_type == AgentTypeEnum.SLIDES.value and images else None
         }
 
+    def delete_prefix(self, bucket_name: str, prefix: str) -> Dict[str, Any]:
+        """批量删除前缀下的所有对象
+
+        列出的对象按 1000 个一批调用 remove_objects，每批一次请求。
+
+        Args:
+            bucket_name: 桶名称
+            prefix: 对象前缀
+
+        Returns:
+            删除报告 {"deleted": 0, "errors": [{"object_name": "", "code": "", "message": ""}]}
+
+        Raises:
+            S3Error: 列出对象失败
+        """
+        client = self._get_client()
+        objects = client.list_objects(bucket_name, prefix=prefix, recursive=True)
+
+        deleted = 0
+        errors = []
+        batch = []
+
+        def flush():
+            nonlocal deleted
+            # remove_objects 是惰性的，必须遍历返回的错误迭代器才会真正发出请求
+            failed = list(client.remove_objects(bucket_name, batch))
+            for error in failed:
+                errors.append({
+                    "object_name": error.name,
+                    "code": error.code,
+                    "message": error.message
+                })
+                logger.error(f"删除失败: {bucket_name}/{error.name}, {error.code}: {error.message}")
+            deleted += len(batch) - len(failed)
+            batch.clear()
+
+        for obj in objects:
+            batch.append(DeleteObject(obj.object_name))
+            if len(batch) >= DELETE_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+
+        logger.info(f"已删除 {bucket_name}/{prefix}: {deleted} 个对象, 失败 {len(errors)} 个")
+        return {"deleted": deleted, "errors": errors}
+
     def delete_task_results(
         self,
         agent_type: str,
@@ -305,37 +451,51 @@ class MinIOService:
             user_id: 用户ID
 
         Returns:
-            是否删除成功
+            是否全部删除成功
         """
         settings = get_settings()
         bucket_name = settings.get_bucket_name(agent_type, paper_type)
-        client = self._get_client()
-
-        try:
-            # 构建前缀
-            if paper_type == PaperTypeEnum.SYSTEM.value:
-                prefix = f"{source}/{paper_id}/"
-            else:
-                prefix = f"{user_id}/{paper_id}/"
-
-            # 列出所有相关对象
-            objects = client.list_objects(
-                bucket_name,
-                prefix=prefix,
-                recursive=True
-            )
 
-            # 删除所有对象
-            for obj in objects:
-                client.remove_object(bucket_name, obj.object_name)
-                logger.info(f"已删除: {bucket_name}/{obj.object_name}")
+        # 构建前缀
+        if paper_type == PaperTypeEnum.SYSTEM.value:
+            prefix = f"{source}/{paper_id}/"
+        else:
+            prefix = f"{user_id}/{paper_id}/"
 
-            return True
+        try:
+            report = self.delete_prefix(bucket_name, prefix)
+            return not report["errors"]
         except S3Error as e:
             error_msg = f"删除任务结果失败: {e.message if e.message else str(e)}"
             logger.error(error_msg)
             return False
 
+    def purge_user_results(self, user_id: str) -> Dict[str, Any]:
+        """删除用户在所有用户桶中的结果文件
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            各桶的删除报告 {bucket_name: {"deleted": 0, "errors": []}}
+        """
+        if not user_id:
+            raise ValueError("user_id 不能为空")
+
+        settings = get_settings()
+        reports = {}
+        for bucket_name in (settings.user_slides_bucket, settings.user_poster_bucket):
+            try:
+                reports[bucket_name] = self.delete_prefix(bucket_name, f"{user_id}/")
+            except S3Error as e:
+                error_msg = e.message if e.message else str(e)
+                logger.error(f"清理用户结果失败: {bucket_name}/{user_id}/, {error_msg}")
+                reports[bucket_name] = {
+                    "deleted": 0,
+                    "errors": [{"object_name": f"{user_id}/", "code": e.code, "message": error_msg}]
+                }
+        return reports
+
 
 @lru_cache()
 def get_minio_service() -> MinIOService:
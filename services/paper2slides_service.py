@@ -27,7 +27,8 @@ from paper2slides.core import (
     get_config_dir,
     get_config_name,
     detect_start_stage,
-    load_state
+    load_state,
+    regenerate_slides
 )
 from paper2slides.utils.path_utils import get_project_name
 
@@ -88,6 +89,8 @@ class Paper2SlidesService:
             "slides_length": length,
             "poster_density": density,
             "fast_mode": fast_mode if content_type == ContentTypeEnum.PAPER.value else False,
+            "max_workers": self.settings.generate_max_workers,
+            "speculative_plans": self.settings.speculative_plans,
         }
 
     def get_project_dirs(
@@ -186,6 +189,43 @@ class Paper2SlidesService:
             "num_files": len(output_files)
         }
 
+    async def regenerate_slides(
+        self,
+        config_dir: Path,
+        slide_indices: List[int]
+    ) -> Dict[str, Any]:
+        """重新生成已完成结果中的部分幻灯片
+
+        只为选中的幻灯片调用图像生成，其余图片从上一次输出目录硬链接到新的输出目录。
+
+        Args:
+            config_dir: 配置目录（包含 checkpoint_plan.json 和 state.json）
+            slide_indices: 需要重新生成的幻灯片序号（从1开始）
+
+        Returns:
+            生成结果字典，包含输出目录、文件列表、重新生成和复用的幻灯片
+
+        Raises:
+            FileNotFoundError: 没有大纲、状态或上一次的输出
+            ValueError: 幻灯片序号无效
+        """
+        state = load_state(config_dir)
+        if not state:
+            raise FileNotFoundError(f"任务状态不存在: {config_dir}")
+
+        # config_dir = <base_dir>/<mode>/<config_name>
+        base_dir = config_dir.parent.parent
+        result = await regenerate_slides(base_dir, config_dir, state["config"], slide_indices)
+
+        output_files = self._collect_output_files(config_dir)
+        return {
+            "output_dir": str(config_dir),
+            "output_files": output_files,
+            "num_files": len(output_files),
+            "regenerated": result["regenerated"],
+            "linked": result["linked"]
+        }
+
     def get_task_status(self, config_dir: Path) -> Optional[Dict[str, Any]]:
         """获取任务状态
 
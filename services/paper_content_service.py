@@ -0,0 +1,208 @@
+"""论文内容服务模块
+
+从知识库获取论文 MD 内容并缓存到本地，同一论文的多个任务共享同一个文件。
+过期的缓存文件由本服务在拉取新内容时顺带清理。
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict
+from functools import lru_cache
+
+from config.settings import get_settings
+from db.mongo import get_mongo_client
+
+logger = logging.getLogger(__name__)
+
+# GridFS 流式写入的块大小
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 过期后再保留的时间（秒），大于任务硬时限，清理时不会有任务仍在读取该文件
+CLEANUP_GRACE = 3600
+
+
+class PaperContentService:
+    """论文内容服务类
+
+    只查询需要的字段；内容存放在 GridFS 中的大论文按块流式写入磁盘。
+    本地缓存按 source/paper_id 寻址，有效期内的重复任务不再查询数据库。
+    """
+
+    def __init__(self):
+        self._settings = get_settings()
+        self._cache_dir = Path(self._settings.paper_content_cache_dir)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._cleanup_lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _get_lock(self, key: str) -> threading.Lock:
+        """获取缓存条目的锁，避免同一进程内重复拉取同一论文"""
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[key] = lock
+            return lock
+
+    def get_cache_path(self, paper_id: str, source: str) -> Path:
+        """获取论文内容的本地缓存路径
+
+        文件名保持为 <paper_id>.md，与按文件名推导的项目目录一致。
+
+        Args:
+            paper_id: 论文ID
+            source: 论文来源
+
+        Returns:
+            本地缓存文件路径
+        """
+        source_dir = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+        return self._cache_dir / source_dir / f"{paper_id}.md"
+
+    def _is_fresh(self, path: Path) -> bool:
+        """缓存文件是否存在且在有效期内"""
+        try:
+            age = time.time() - path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return age < self._settings.paper_content_cache_ttl
+
+    def get_md_path(self, paper_id: str, source: str) -> Path:
+        """获取论文 MD 内容的本地文件（必要时从知识库拉取）
+
+        Args:
+            paper_id: 论文ID
+            source: 论文来源
+
+        Returns:
+            本地 MD 文件路径
+
+        Raises:
+            ValueError: 论文内容不存在或为空
+        """
+        path = self.get_cache_path(paper_id, source)
+        if self._is_fresh(path):
+            logger.info(f"使用缓存的论文内容: {path}")
+            return path
+
+        with self._get_lock(str(path)):
+            # 等锁期间可能已被其他线程拉取
+            if self._is_fresh(path):
+                return path
+            self._fetch_to_file(paper_id, source, path)
+
+        self._maybe_cleanup()
+        return path
+
+    def _maybe_cleanup(self) -> None:
+        """距上次清理超过缓存有效期时清理过期文件，其他线程正在清理时跳过"""
+        if time.time() - self._last_cleanup < self._settings.paper_content_cache_ttl:
+            return
+        if not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_cleanup = time.time()
+            removed = self.cleanup_stale()
+            if removed:
+                logger.info(f"已清理过期的论文内容缓存: {removed} 个文件")
+        except OSError as e:
+            logger.warning(f"清理论文内容缓存失败: {e}")
+        finally:
+            self._cleanup_lock.release()
+
+    def cleanup_stale(self) -> int:
+        """删除过期的缓存文件
+
+        过期超过 CLEANUP_GRACE 的 MD 文件与中断写入留下的临时文件会被删除，
+        之后的任务会重新拉取。
+
+        Returns:
+            删除的文件数量
+        """
+        if not self._cache_dir.exists():
+            return 0
+        deadline = time.time() - self._settings.paper_content_cache_ttl - CLEANUP_GRACE
+        removed = 0
+        for path in self._cache_dir.glob("*/*"):
+            if not path.is_file():
+                continue
+            if path.suffix == ".md" or path.name.endswith(".tmp"):
+                try:
+                    if path.stat().st_mtime < deadline:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    def _fetch_to_file(self, paper_id: str, source: str, path: Path) -> None:
+        """从知识库拉取论文内容并原子写入文件"""
+        collection = get_mongo_client().system_paper_content_collection
+
+        logger.info(f"查询系统论文: paper_id={paper_id}, source={source}")
+
+        # 只取内容字段，不拉取文档中的其他大字段
+        doc = collection.find_one(
+            {"paper_id": paper_id, "source": source},
+            projection={"_id": 0, "content": 1, "content_file_id": 1}
+        )
+        if not doc:
+            raise ValueError(f"未找到论文内容: paper_id={paper_id}, source={source}")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if doc.get("content_file_id") is not None:
+                size = self._stream_gridfs(doc["content_file_id"], tmp_path)
+            else:
+                content = doc.get("content")
+                if not content:
+                    raise ValueError(f"论文内容为空: paper_id={paper_id}")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(content)
+                size = tmp_path.stat().st_size
+
+            if size == 0:
+                raise ValueError(f"论文内容为空: paper_id={paper_id}")
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        logger.info(f"论文内容已缓存: {path} ({size} bytes)")
+
+    def _stream_gridfs(self, file_id, target: Path) -> int:
+        """将 GridFS 中的内容按块写入文件
+
+        Returns:
+            写入的字节数
+        """
+        import gridfs
+
+        bucket = gridfs.GridFSBucket(
+            get_mongo_client().knowledge_database,
+            bucket_name=self._settings.paper_content_gridfs_bucket
+        )
+        size = 0
+        with bucket.open_download_stream(file_id) as stream, open(target, "wb") as f:
+            while True:
+                chunk = stream.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                size += len(chunk)
+        return size
+
+
+@lru_cache()
+def get_paper_content_service() -> PaperContentService:
+    """获取论文内容服务单例
+
+    Returns:
+        PaperContentService: 服务实例
+    """
+    return PaperContentService()
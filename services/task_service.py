@@ -2,15 +2,26 @@
 
 提供任务创建、删除、查询和队列管理功能。
 """
+import json
+import base64
 import logging
 import uuid
+from datetime import datetime
 from typing import Optional, List, Tuple, Dict, Any
 from functools import lru_cache
 
+from redis.exceptions import RedisError
+
 from config.settings import get_settings
-from common.enums import AgentTypeEnum, TaskStatusEnum, PaperTypeEnum
+from common.enums import AgentTypeEnum, TaskStatusEnum, PaperTypeEnum, TaskPriorityEnum
 from common.constants import TASK_TITLE_POSTER, TASK_TITLE_SLIDES
-from common.redis_manager import get_redis_queue_manager, RedisQueueManager
+from common.redis_manager import (
+    get_redis_queue_manager,
+    RedisQueueManager,
+    ADMIT_RUN_NOW,
+    ADMIT_QUEUE_FULL,
+    ADMIT_USER_QUOTA_FULL
+)
 from models.entities.user_paper_result import UserPaperResult
 from models.entities.system_paper_result import SystemPaperResult
 from repositories.user_paper_repo import get_user_paper_repo, UserPaperRepository
@@ -54,15 +65,17 @@ class TaskService:
         title: Optional[str] = None,
         style: str = "doraemon",
         language: str = "ZH",
-        density: str = "medium"
+        density: str = "medium",
+        priority: str = TaskPriorityEnum.INTERACTIVE.value
     ) -> Dict[str, Any]:
         """创建任务
 
         业务逻辑（根据接口设计）:
-        1. 检查任务队列容量
-        2. 检查系统论文是否有默认结果
+        1. 检查系统论文是否有默认结果
+        2. 相同参数的系统论文任务正在生成时，合并到该任务（不占用运行槽）
         3. 创建任务记录
-        4. 根据队列状态决定执行策略
+        4. 原子地申请运行槽或等待位置（队列已满时删除任务记录及本次创建的空系统记录）
+        5. 根据申请结果决定执行策略
 
         Args:
             paper_id: 论文ID
@@ -74,16 +87,14 @@ class TaskService:
             style: 风格
             language: 语言
             density: 密度
+            priority: 调度优先级 (interactive=用户请求, batch=系统批量预生成)
 
         Returns:
             创建的任务信息
 
         Raises:
-            TaskQueueFullException: 任务队列已满
+            TaskQueueFullException: 任务队列已满或用户等待任务已达上限
         """
-        # 检查队列状态并决定执行策略
-        action = self._check_queue_capacity()
-
         # 生成任务ID
         result_id = str(uuid.uuid4())
 
@@ -93,6 +104,8 @@ class TaskService:
 
         # 初始化update_system标记
         update_system = False
+        # 本次请求是否创建了空系统记录（任务未能入队时需撤销）
+        created_empty_record = False
 
         # 检查系统论文是否有默认结果
         if paper_type == PaperTypeEnum.SYSTEM.value:
@@ -143,11 +156,11 @@ class TaskService:
                     logger.info(f"系统记录无file_path，重新生成: {result_id}, update_system={update_system}")
             else:
                 # 系统无记录，创建空记录
-                self._system_repo.insert_empty_record(
+                created_empty_record = self._system_repo.insert_empty_record(
                     paper_id=paper_id,
                     source=source,
                     agent_type=agent_type
-                )
+                ) is not None
                 update_system = True
                 logger.info(f"{paper_id} 系统无记录，创建空记录: {result_id}, update_system={update_system}")
         else:
@@ -165,19 +178,40 @@ class TaskService:
             title=title,
             style=style,
             language=language,
-            density=density
+            density=density,
+            priority=priority,
+            update_system=update_system
         )
 
-        # 保存到数据库
+        # 相同参数的系统论文正在生成时，合并到在途任务，由其完成时一并更新
+        if paper_type == PaperTypeEnum.SYSTEM.value:
+            leader = self._find_inflight_leader(task)
+            if leader is not None:
+                self._coalesce_task(task, leader)
+                return {
+                    "task_id": result_id
+                }
+
+        # 保存到数据库（需先于入队，否则调度方可能取到尚不存在的任务）
         self._user_repo.insert(task)
         logger.info(f"任务已创建: {result_id}, update_system={update_system}")
 
+        # 原子地申请运行槽或等待位置
+        try:
+            action = self._admit_task(result_id, user_id, priority)
+        except TaskQueueFullException:
+            if paper_type == PaperTypeEnum.SYSTEM.value:
+                self._queue_manager.release_inflight(task.coalesce_key, result_id)
+            if created_empty_record:
+                # 任务未能入队，撤销本次创建的空系统记录，后续请求才能重新负责写入默认结果
+                self._system_repo.delete_empty_record(paper_id, agent_type, source)
+            raise
+
         # 根据队列状态决定执行策略
-        if action == "run_now":
-            # 立即运行
+        if action == ADMIT_RUN_NOW:
+            # 立即运行（运行槽已由 admit 占用）
             task.mark_running()
             self._user_repo.update_task(task)
-            self._queue_manager.increment_running()
 
             self._submit_to_celery(
                 result_id=result_id,
@@ -194,69 +228,149 @@ class TaskService:
 
             logger.info(f"任务立即执行: {result_id}")
         else:
-            # 进入等待队列
-            if not self._queue_manager.add_to_waiting_queue(result_id):
-                raise TaskQueueFullException("添加到等待队列失败")
-
-            # 任务保持waiting状态
+            # 已进入等待队列，任务保持waiting状态
             logger.info(f"任务进入等待队列: {result_id}")
 
         return {
             "task_id": result_id
         }
 
-    def _check_queue_capacity(self) -> str:
-        """检查队列容量并决定任务执行策略
+    def _find_inflight_leader(self, task: UserPaperResult) -> Optional[UserPaperResult]:
+        """查找生成参数相同的在途任务
+
+        没有在途任务时把当前任务登记为在途任务；登记的任务已结束或不存在时接管登记。
+
+        Args:
+            task: 待创建的任务
 
         Returns:
-            "run_now" - 可以立即运行
-            "wait_in_queue" - 需要进入等待队列
+            在途任务，None 表示当前任务需要自行生成
+        """
+        coalesce_key = task.coalesce_key
+        try:
+            current_id = self._queue_manager.claim_inflight(coalesce_key, task.result_id)
+        except RedisError as e:
+            logger.warning(f"在途任务登记失败，不合并: {task.result_id}, 错误: {e}")
+            return None
+
+        # 最多重试几次，避免多个请求同时接管时反复竞争
+        for _ in range(3):
+            if current_id is None:
+                return None
+
+            leader = self._user_repo.find_by_result_id(current_id)
+            if (
+                leader is not None
+                and leader.coalesced_to is None
+                and leader.status in (TaskStatusEnum.WAITING.value, TaskStatusEnum.RUNNING.value)
+            ):
+                return leader
+
+            # 登记的任务已结束，接管登记
+            if self._queue_manager.replace_inflight(coalesce_key, current_id, task.result_id):
+                return None
+            try:
+                current_id = self._queue_manager.claim_inflight(coalesce_key, task.result_id)
+            except RedisError:
+                return None
+
+        return None
+
+    def _coalesce_task(self, task: UserPaperResult, leader: UserPaperResult) -> None:
+        """将任务合并到在途任务
 
-        Raises:
-            TaskQueueFullException: 等待队列已满
+        Args:
+            task: 待创建的任务
+            leader: 在途任务
         """
-        # 使用Redis查询队列状态（性能优化）
-        if self._queue_manager.can_run_now():
-            return "run_now"
+        task.coalesced_to = leader.result_id
+        if leader.status == TaskStatusEnum.RUNNING.value:
+            task.mark_running()
+        self._user_repo.insert(task)
+        logger.info(f"任务合并到在途任务: {task.result_id} -> {leader.result_id}")
+
+        # 在途任务可能在插入前刚好结束，此时它的批量更新不会覆盖到当前任务
+        leader_id = leader.result_id
+        leader = self._user_repo.find_by_result_id(leader_id)
+        if leader is None:
+            # 仅在没有被提升为新的在途任务时失败
+            self._user_repo.fail_coalesced_tasks(leader_id, "合并的生成任务已被删除，请重新创建")
+        elif leader.status == TaskStatusEnum.SUCCESS.value:
+            self._user_repo.mark_success(task.result_id, leader.file_path, leader.images)
+        elif leader.status == TaskStatusEnum.FAILED.value:
+            self._user_repo.mark_failed(task.result_id, leader.error_reason or "任务执行失败")
+
+    def _admit_task(self, result_id: str, user_id: str, priority: str) -> str:
+        """为已创建的任务申请运行槽或等待位置
 
-        # 运行中已满，检查等待队列
-        waiting_count = len(self._queue_manager.get_waiting_queue())
-        max_waiting = self._settings.max_waiting_tasks
+        Args:
+            result_id: 任务ID
+            user_id: 用户ID
+            priority: 调度优先级
 
-        if waiting_count >= max_waiting:
+        Returns:
+            ADMIT_RUN_NOW - 可以立即运行（已占用运行槽）
+            ADMIT_WAIT_IN_QUEUE - 已进入等待队列
+
+        Raises:
+            TaskQueueFullException: 等待队列已满、用户等待任务已达上限或队列不可用（任务记录会被删除）
+        """
+        try:
+            action = self._queue_manager.admit(result_id, user_id, priority)
+        except RedisError as e:
+            logger.error(f"任务准入失败: {result_id}, 错误: {e}")
+            self._user_repo.delete_task(result_id)
+            raise TaskQueueFullException("任务队列暂不可用，请稍后重试")
+
+        if action == ADMIT_QUEUE_FULL:
+            self._user_repo.delete_task(result_id)
             raise TaskQueueFullException(
                 f"任务队列已满，请稍后重试。"
-                f"等待中: {waiting_count}/{max_waiting}"
+                f"最大等待数: {self._settings.max_waiting_tasks}"
+            )
+
+        if action == ADMIT_USER_QUOTA_FULL:
+            self._user_repo.delete_task(result_id)
+            raise TaskQueueFullException(
+                f"您的排队任务已达上限，请等待已有任务开始后重试。"
+                f"每个用户最大等待数: {self._settings.max_waiting_per_user}"
             )
 
-        return "wait_in_queue"
+        return action
 
     def schedule_from_waiting_queue(self) -> None:
         """从等待队列调度下一个任务
 
         如果运行中任务数未满，从等待队列取出任务并提交到Celery。
+        取出任务与占用运行槽在 Redis 中原子完成；取出的任务无效时
+        释放运行槽并继续取下一个。
         """
-        if not self._queue_manager.can_run_now():
-            return
-
-        task_id = self._queue_manager.schedule_next()
-        if not task_id:
-            return
-
-        # 获取任务信息
-        task = self._user_repo.find_by_result_id(task_id)
-        if task is None:
-            logger.warning(f"等待队列中的任务不存在: {task_id}")
-            return
+        while True:
+            task_id = self._queue_manager.schedule_next()
+            if not task_id:
+                return
+
+            # 获取任务信息
+            task = self._user_repo.find_by_result_id(task_id)
+            if task is None:
+                logger.warning(f"等待队列中的任务不存在: {task_id}")
+                self._queue_manager.release_running(task_id)
+                continue
+
+            if task.status != TaskStatusEnum.WAITING.value:
+                logger.warning(f"等待队列中的任务状态异常: {task_id}, status={task.status}")
+                self._queue_manager.release_running(task_id)
+                continue
+
+            # 仅当任务仍在等待时标记为运行中（期间可能已被取消）
+            task.mark_running()
+            if not self._user_repo.update_task(task):
+                self._queue_manager.release_running(task_id)
+                continue
 
-        if task.status != TaskStatusEnum.WAITING.value:
-            logger.warning(f"等待队列中的任务状态异常: {task_id}, status={task.status}")
-            return
+            break
 
         # 提交到Celery
-        task.mark_running()
-        self._user_repo.update_task(task)
-        self._queue_manager.increment_running()
 
         # 使用保存的参数重新提交任务
         self._submit_to_celery(
@@ -274,6 +388,69 @@ class TaskService:
 
         logger.info(f"成功调度任务: {task_id}, update_system={task.update_system}")
 
+    def promote_coalesced_follower(self, task: UserPaperResult) -> Optional[str]:
+        """在途任务被删除或取消时，将合并到它的最早请求提升为新的在途任务并重新排队
+
+        其余合并任务改为合并到新的在途任务，不因其他用户的操作而失败。
+        调用方负责在之后触发调度。
+
+        Args:
+            task: 被删除或取消的在途任务
+
+        Returns:
+            新的在途任务ID，没有可提升的合并任务时为 None
+        """
+        reason = "合并的生成任务已被取消，请重新创建"
+        while True:
+            follower = self._user_repo.find_oldest_coalesced_task(task.result_id)
+            if follower is None:
+                return None
+            # 原在途任务负责写入系统默认结果时，由新的在途任务接手
+            update_system = follower.update_system or task.update_system
+            if self._user_repo.promote_coalesced_task(follower.result_id, task.result_id, update_system):
+                break
+
+        self._queue_manager.replace_inflight(task.coalesce_key, task.result_id, follower.result_id)
+
+        # 请求已被受理，重新入队时不再受等待队列配额限制
+        if not self._queue_manager.add_to_waiting_queue(
+            follower.result_id, follower.user_id, follower.priority, enforce_limits=False
+        ):
+            self._user_repo.mark_failed(follower.result_id, reason)
+            self._user_repo.fail_coalesced_tasks(follower.result_id, reason)
+            self._queue_manager.release_inflight(task.coalesce_key, follower.result_id)
+            logger.error(f"合并任务重新入队失败: {follower.result_id}")
+            return None
+
+        logger.info(f"合并任务提升为在途任务: {task.result_id} -> {follower.result_id}")
+        return follower.result_id
+
+    def reap_expired_tasks(self) -> int:
+        """回收租约过期的运行槽
+
+        心跳停止（工作线程崩溃、超时被杀）或分派后迟迟未开始执行的任务标记为失败，
+        每回收一个运行槽就从等待队列调度一个任务。租约删除后仍在执行的任务会在
+        下次心跳时发现并自行中止，尚未开始的任务在 worker 认领运行槽时被跳过
+        （threads 池中 revoke 的 terminate 不起作用，这里只撤销未开始的消息）。
+
+        Returns:
+            回收的运行槽数量
+        """
+        expired_ids = self._queue_manager.reap_expired_leases()
+        for task_id in expired_ids:
+            task = self._user_repo.find_by_result_id(task_id)
+            if task is not None and task.status == TaskStatusEnum.RUNNING.value:
+                from celery_app.celery_config import celery_app
+                celery_app.control.revoke(task_id)
+                self._user_repo.mark_failed(task_id, "任务心跳超时，已被回收")
+                self._user_repo.fail_coalesced_tasks(task_id, "任务心跳超时，已被回收")
+                logger.warning(f"任务租约过期，已标记为失败: {task_id}")
+
+        for _ in expired_ids:
+            self.schedule_from_waiting_queue()
+
+        return len(expired_ids)
+
     def _submit_to_celery(
         self,
         result_id: str,
@@ -345,24 +522,26 @@ class TaskService:
         if task.user_id != user_id:
             raise TaskNotFoundException(task_id)
 
-        # 如果任务正在运行，先取消
+        # 如果任务正在运行，先取消（释放运行槽后任务在下次心跳时自行中止）
         if task.status == TaskStatusEnum.RUNNING.value:
             from celery_app.celery_config import celery_app
-            celery_app.control.revoke(task_id, terminate=True)
+            celery_app.control.revoke(task_id)
             logger.info(f"已取消运行中的任务: {task_id}")
-
-            # 减少运行中计数并触发调度
-            self._queue_manager.decrement_running()
-            self.schedule_from_waiting_queue()
+            self._queue_manager.release_running(task_id)
 
         # 从等待队列中移除（如果在等待队列中）
         if task.status == TaskStatusEnum.WAITING.value:
-            self._queue_manager.schedule_next()
+            self._queue_manager.remove_from_waiting_queue(task_id)
 
         # 删除数据库记录（不删除 MinIO 中的文件，不影响系统论文默认结果）
         self._user_repo.delete_task(task_id)
         logger.info(f"任务已删除: {task_id}")
 
+        # 合并到该任务的其他请求由最早的一个接手生成，然后触发调度
+        if task.status in (TaskStatusEnum.WAITING.value, TaskStatusEnum.RUNNING.value):
+            self.promote_coalesced_follower(task)
+            self.schedule_from_waiting_queue()
+
         return True
 
     def get_task_detail(self, task_id: str, user_id: str) -> Dict[str, Any]:
@@ -394,7 +573,8 @@ class TaskService:
             "end_time": task.end_time.isoformat() if task.end_time else None,
             "created_time": task.created_time.isoformat() if task.created_time else None,
             "paper_id": task.paper_id,
-            "source": task.source
+            "source": task.source,
+            "coalesced_to": task.coalesced_to
         }
 
         return result
@@ -443,62 +623,181 @@ class TaskService:
         paper_id: str,
         source: str,
         page: int = 1,
-        page_size: int = 10
+        page_size: int = 10,
+        cursor: Optional[str] = None,
+        with_total: Optional[bool] = None
     ) -> Dict[str, Any]:
         """分页查询任务列表
 
+        传入 cursor（上一页返回的 next_cursor）时按键集分页，深翻页不再随
+        skip 线性变慢；page 仍可用于跳页。总数默认只在首页（未传入 cursor）
+        查询，按游标翻页时不再重复 count。
+
         Args:
             user_id: 用户ID
             paper_id: 论文ID
             source: 论文来源
             page: 页码（0表示查询所有）
             page_size: 每页大小
+            cursor: 翻页游标
+            with_total: 是否返回总数（None 表示仅在未传入 cursor 时返回）
 
         Returns:
-            分页结果 {"items": [], "total": 0, "page": 1, "page_size": 10}
+            分页结果 {"items": [], "total": 0, "page": 1, "page_size": 10, "next_cursor": None}
+
+        Raises:
+            InvalidRequestException: 游标无效
         """
+        next_cursor = None
         if page == 0:
-            # 查询所有
-            items, total = self._user_repo.find_by_user_and_paper(
-                user_id=user_id,
-                paper_id=paper_id,
-                source=source,
-                skip=0,
-                limit=1000  # 设置一个较大的限制
-            )
+            # 查询所有（游标分批拉取，不设上限）
+            docs = list(self._user_repo.iter_list(user_id, paper_id, source))
+            total = len(docs)
         else:
-            skip = (page - 1) * page_size
-            items, total = self._user_repo.find_by_user_and_paper(
+            after = self._decode_list_cursor(cursor) if cursor else None
+            if with_total is None:
+                with_total = after is None
+            docs, total = self._user_repo.find_list_page(
                 user_id=user_id,
                 paper_id=paper_id,
                 source=source,
-                skip=skip,
-                limit=page_size
+                limit=page_size,
+                skip=(page - 1) * page_size,
+                after=after,
+                with_total=with_total
             )
+            if len(docs) == page_size:
+                next_cursor = self._encode_list_cursor(docs[-1])
 
         return {
             "items": [
                 {
-                    "task_id": item.result_id,
-                    "title": item.title,
-                    "agent_type": item.agent_type,
-                    "status": item.status,
-                    "created_time": item.created_time.isoformat() if item.created_time else None,
-                    "paper_id": item.paper_id,
-                    "source": item.source
+                    "task_id": doc["_id"],
+                    "title": doc.get("title"),
+                    "agent_type": doc.get("agent_type"),
+                    "status": doc.get("status"),
+                    "created_time": doc["created_time"].isoformat() if doc.get("created_time") else None,
+                    "paper_id": doc.get("paper_id"),
+                    "source": doc.get("source")
                 }
-                for item in items
+                for doc in docs
             ],
             "total": total,
             "page": page,
-            "page_size": page_size
+            "page_size": page_size,
+            "next_cursor": next_cursor
         }
 
+    @staticmethod
+    def _encode_list_cursor(doc: Dict[str, Any]) -> Optional[str]:
+        """由一页最后一条记录生成翻页游标"""
+        created_time = doc.get("created_time")
+        if created_time is None:
+            return None
+        payload = json.dumps([created_time.isoformat(), doc["_id"]])
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def _decode_list_cursor(cursor: str) -> Tuple[datetime, str]:
+        """解析翻页游标
+
+        Raises:
+            InvalidRequestException: 游标无效
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            created_time, result_id = json.loads(base64.urlsafe_b64decode(padded))
+            return datetime.fromisoformat(created_time), str(result_id)
+        except (ValueError, TypeError):
+            raise InvalidRequestException("无效的翻页游标")
+
+    def pregenerate_system_papers(
+        self,
+        papers: List[Dict[str, str]],
+        agent_types: List[str],
+        style: str = "doraemon",
+        language: str = "ZH",
+        density: str = "medium"
+    ) -> Dict[str, List[Dict[str, str]]]:
+        """批量预生成系统论文的默认结果
+
+        已有默认结果或正由其他任务生成默认结果的论文直接跳过；其余以批量
+        优先级提交，排在交互任务之后，并受预生成用户的等待配额限制。没有
+        任务负责的空系统记录（例如之前的运行异常中断后遗留）先删除，由本次
+        任务重新负责写入。队列不再接收时停止提交，剩余条目原样返回，由调用方
+        稍后重试。
+
+        Args:
+            papers: 论文列表，每项包含 paper_id 和 source
+            agent_types: 任务类型列表 (poster/slides)
+            style: 风格
+            language: 语言
+            density: 密度
+
+        Returns:
+            {"submitted": [...], "skipped": [...], "deferred": [...]}，
+            每项包含 paper_id、source、agent_type，submitted 中另含 task_id
+        """
+        result = {"submitted": [], "skipped": [], "deferred": []}
+        seen = set()
+        queue_full = False
+
+        for paper in papers:
+            for agent_type in agent_types:
+                key = (paper["paper_id"], paper["source"], agent_type)
+                if key in seen:
+                    continue
+                seen.add(key)
+                item = {"paper_id": key[0], "source": key[1], "agent_type": agent_type}
+
+                if queue_full:
+                    result["deferred"].append(item)
+                    continue
+
+                default_result = self._system_repo.get_default_result(key[0], agent_type, key[1])
+                if default_result and default_result.file_path:
+                    result["skipped"].append(item)
+                    continue
+                if default_result:
+                    if self._user_repo.has_active_system_task(key[0], key[1], agent_type):
+                        result["skipped"].append(item)
+                        continue
+                    # 遗留的空记录会让新任务不写入默认结果，每次预生成都重复提交
+                    self._system_repo.delete_empty_record(key[0], agent_type, key[1])
+                    logger.info(f"删除遗留的空系统记录: {key}")
+
+                try:
+                    created = self.create_task(
+                        paper_id=key[0],
+                        source=key[1],
+                        paper_type=PaperTypeEnum.SYSTEM.value,
+                        agent_type=agent_type,
+                        user_id=self._settings.pregenerate_user_id,
+                        style=style,
+                        language=language,
+                        density=density,
+                        priority=TaskPriorityEnum.BATCH.value
+                    )
+                except TaskQueueFullException as e:
+                    logger.info(f"预生成暂停提交，队列已满: {e}")
+                    queue_full = True
+                    result["deferred"].append(item)
+                    continue
+
+                result["submitted"].append({**item, "task_id": created["task_id"]})
+
+        logger.info(
+            f"预生成提交完成 - 提交: {len(result['submitted'])}, "
+            f"跳过: {len(result['skipped'])}, 延后: {len(result['deferred'])}"
+        )
+        return result
+
     def get_queue_status(self) -> Dict[str, Any]:
         """获取队列状态
 
         Returns:
-            队列状态 {"running": 0, "waiting": 0, "max_running": 2, "max_waiting": 5}
+            队列状态 {"running": 0, "waiting": 0, "max_running": 2, "max_waiting": 5,
+                      "max_waiting_per_user": 3, "waiting_by_priority": {...}, "waiting_users": 0}
         """
         return self._queue_manager.get_queue_status()
 
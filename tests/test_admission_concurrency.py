@@ -0,0 +1,99 @@
+"""准入脚本的并发压力测试：并发申请与调度不会超出配额"""
+import threading
+from collections import Counter
+
+import pytest
+
+USERS = ["u1", "u2", "u3", "u4"]
+THREADS = 16
+TASKS_PER_THREAD = 10
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setenv("SLIDES_MAX_RUNNING_TASKS", "3")
+    monkeypatch.setenv("SLIDES_MAX_WAITING_TASKS", "5")
+    monkeypatch.setenv("SLIDES_MAX_WAITING_PER_USER", "2")
+
+
+def _run_concurrently(target):
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_concurrent_admission_never_over_admits(queue_manager, limits):
+    from common.redis_manager import ADMIT_RUN_NOW, ADMIT_WAIT_IN_QUEUE
+
+    outcomes = Counter()
+    admitted = {}
+    lock = threading.Lock()
+
+    def admit(index):
+        for n in range(TASKS_PER_THREAD):
+            task_id = f"t{index}-{n}"
+            user_id = USERS[(index + n) % len(USERS)]
+            action = queue_manager.admit(task_id, user_id)
+            with lock:
+                outcomes[action] += 1
+                if action == ADMIT_WAIT_IN_QUEUE:
+                    admitted[task_id] = user_id
+
+    _run_concurrently(admit)
+
+    assert outcomes[ADMIT_RUN_NOW] == 3
+    assert outcomes[ADMIT_WAIT_IN_QUEUE] == 5
+    assert sum(outcomes.values()) == THREADS * TASKS_PER_THREAD
+
+    status = queue_manager.get_queue_status()
+    assert status["running"] == 3
+    assert status["waiting"] == 5
+    # 用户计数与等待队列一致，且不超过单用户上限
+    per_user = Counter(admitted.values())
+    assert max(per_user.values()) <= 2
+    stored = {user: int(count) for user, count in queue_manager.redis.hgetall(queue_manager.key_waiting_users).items()}
+    assert stored == dict(per_user)
+
+
+def test_concurrent_scheduling_claims_each_task_once(queue_manager, limits):
+    from common.redis_manager import ADMIT_RUN_NOW
+
+    running = [f"r{i}" for i in range(3)]
+    for task_id in running:
+        assert queue_manager.admit(task_id, "u1") == ADMIT_RUN_NOW
+    for i in range(5):
+        queue_manager.add_to_waiting_queue(f"w{i}", USERS[i % len(USERS)], enforce_limits=False)
+
+    claimed = []
+    lock = threading.Lock()
+
+    def churn(index):
+        # 一部分线程释放运行槽，所有线程同时尝试调度
+        if index < len(running):
+            queue_manager.release_running(running[index])
+        for _ in range(3):
+            task_id = queue_manager.schedule_next()
+            if task_id:
+                with lock:
+                    claimed.append(task_id)
+                assert queue_manager.get_queue_status()["running"] <= 3
+
+    _run_concurrently(churn)
+
+    assert len(claimed) == len(set(claimed)) == 3
+    status = queue_manager.get_queue_status()
+    assert status["running"] == 3
+    assert status["waiting"] == 2
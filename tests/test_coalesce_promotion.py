@@ -0,0 +1,93 @@
+"""在途任务被删除或取消时提升合并任务"""
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def task_service(user_repo, system_repo, queue_manager, monkeypatch):
+    from services.task_service import TaskService
+    from celery_app.celery_config import celery_app
+
+    monkeypatch.setattr(celery_app.control, "revoke", lambda *args, **kwargs: None)
+    service = TaskService(user_repo, system_repo, None, queue_manager)
+    service.submitted = []
+    monkeypatch.setattr(service, "_submit_to_celery", lambda **kwargs: service.submitted.append(kwargs))
+    return service
+
+
+def _insert(user_repo, result_id, status, coalesced_to=None, minutes=0, update_system=False):
+    from models.entities.user_paper_result import UserPaperResult
+
+    task = UserPaperResult.create(
+        result_id, "slides", "p1", "arxiv", "system", f"user-{result_id}", update_system=update_system
+    )
+    task.status = status
+    task.coalesced_to = coalesced_to
+    task.created_time = datetime(2026, 1, 1) + timedelta(minutes=minutes)
+    user_repo.insert(task)
+    return task
+
+
+@pytest.fixture
+def running_leader(task_service, user_repo, queue_manager):
+    from common.enums import TaskStatusEnum
+    from common.redis_manager import ADMIT_RUN_NOW
+
+    running = TaskStatusEnum.RUNNING.value
+    leader = _insert(user_repo, "leader", running, update_system=True)
+    _insert(user_repo, "follower-late", running, "leader", minutes=2)
+    _insert(user_repo, "follower-early", running, "leader", minutes=1)
+    assert queue_manager.admit("leader", leader.user_id) == ADMIT_RUN_NOW
+    assert queue_manager.claim_inflight(leader.coalesce_key, "leader") is None
+    return leader
+
+
+def _assert_promoted(task_service, user_repo, queue_manager, leader):
+    from common.enums import TaskStatusEnum
+
+    promoted = user_repo.find_by_result_id("follower-early")
+    assert promoted.coalesced_to is None
+    assert promoted.status == TaskStatusEnum.RUNNING.value
+    # 其他用户的合并任务没有失败，改为合并到新的在途任务
+    late = user_repo.find_by_result_id("follower-late")
+    assert late.coalesced_to == "follower-early"
+    assert late.status == TaskStatusEnum.WAITING.value
+    assert queue_manager.claim_inflight(leader.coalesce_key, "other") == "follower-early"
+
+    # 新的在途任务接手写入系统默认结果
+    assert [s["result_id"] for s in task_service.submitted] == ["follower-early"]
+    assert task_service.submitted[0]["update_system"] is True
+
+
+def test_deleting_leader_promotes_oldest_follower(task_service, user_repo, queue_manager, running_leader):
+    assert task_service.delete_task("leader", running_leader.user_id)
+
+    assert user_repo.find_by_result_id("leader") is None
+    _assert_promoted(task_service, user_repo, queue_manager, running_leader)
+
+
+def test_cancelling_leader_promotes_oldest_follower(task_service, user_repo, queue_manager,
+                                                    running_leader, monkeypatch):
+    from common.enums import TaskStatusEnum
+    from celery_app import tasks
+
+    monkeypatch.setattr(tasks, "get_redis_queue_manager", lambda: queue_manager)
+    monkeypatch.setattr("repositories.user_paper_repo.get_user_paper_repo", lambda: user_repo)
+    monkeypatch.setattr("services.task_service.get_task_service", lambda: task_service)
+
+    assert tasks.cancel_task("leader")
+
+    assert user_repo.find_by_result_id("leader").status == TaskStatusEnum.FAILED.value
+    _assert_promoted(task_service, user_repo, queue_manager, running_leader)
+
+
+def test_deleting_leader_without_followers(task_service, user_repo, queue_manager):
+    from common.enums import TaskStatusEnum
+
+    leader = _insert(user_repo, "leader", TaskStatusEnum.WAITING.value)
+    assert queue_manager.add_to_waiting_queue("leader", leader.user_id)
+
+    assert task_service.delete_task("leader", leader.user_id)
+    assert task_service.submitted == []
+    assert queue_manager.schedule_next() is None
@@ -0,0 +1,52 @@
+"""生成阶段失败后只重试缺失的幻灯片"""
+import asyncio
+import json
+
+import pytest
+
+pipeline = pytest.importorskip("paper2slides.core.pipeline")
+
+SECTION_IDS = [f"part_{name}" for name in "abcdefghijk"]
+
+
+def test_retry_generates_only_missing_slides(tmp_path, monkeypatch):
+    config_dir = tmp_path / "slides_academic_medium"
+    config_dir.mkdir()
+    sections = [{"id": section_id} for section_id in SECTION_IDS]
+    (config_dir / "checkpoint_plan.json").write_text(json.dumps({"plan": {"sections": sections}}))
+
+    calls = []
+    # 请求的并发数超过许可池大小，只会授予一部分
+    requested = {"max_workers": pipeline.get_image_permit_pool().size + 2}
+
+    async def flaky_generate(base_dir, directory, config):
+        # 生成器按页码命名；第一次运行第 3、10 页失败
+        plan = json.loads((directory / "checkpoint_plan.json").read_text())
+        ids = [section["id"] for section in plan["plan"]["sections"]]
+        calls.append((ids, config["max_workers"], requested["max_workers"]))
+        output = directory / f"2030010{len(calls)}_000000"
+        output.mkdir()
+        for i, section_id in enumerate(ids, start=1):
+            if len(calls) == 1 and i in (3, 10):
+                continue
+            (output / f"slide_{i:02d}.png").write_text(section_id)
+        if len(calls) == 1:
+            raise RuntimeError("2 slides failed")
+
+    pages = []
+    monkeypatch.setattr(pipeline, "run_generate_stage", flaky_generate)
+    monkeypatch.setattr(pipeline, "get_image_cache", lambda: None)
+    monkeypatch.setattr(pipeline, "GENERATE_RETRY_DELAY", 0)
+    monkeypatch.setattr(pipeline, "build_pdf", lambda images, pdf_path: pages.extend(images))
+
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, requested))
+
+    # 授予的并发数只传给本次生成，运行期间也不写入调用方的配置（它会随状态持久化）
+    granted = pipeline.get_image_permit_pool().size
+    wanted = granted + 2
+    assert calls == [(SECTION_IDS, granted, wanted), (["part_c", "part_j"], granted, wanted)]
+
+    output = config_dir / "20300101_000000"
+    names = sorted(p.name for p in output.iterdir())
+    assert names == [f"slide_{i:02d}.png" for i in range(1, 12)]
+    assert [page.read_text() for page in pages] == SECTION_IDS
@@ -0,0 +1,90 @@
+"""幻灯片图片缓存：只为变化的章节调用图像服务"""
+import asyncio
+import json
+
+import pytest
+
+pipeline = pytest.importorskip("paper2slides.core.pipeline")
+
+
+@pytest.fixture
+def deck(tmp_path, monkeypatch):
+    from paper2slides.core.image_cache import ImageCache
+
+    config_dir = tmp_path / "slides_academic_medium"
+    config_dir.mkdir()
+    cache = ImageCache(cache_dir=str(tmp_path / "cache"))
+    calls = []
+
+    async def generate(base_dir, directory, config):
+        # 模拟返回 URL 的服务：生成器下载后按页码写出图片
+        plan = json.loads((directory / "checkpoint_plan.json").read_text())["plan"]
+        calls.append([section["id"] for section in plan["sections"]])
+        output = directory / f"2030010{len(calls)}_000000"
+        output.mkdir()
+        for i, section in enumerate(plan["sections"], start=1):
+            (output / f"slide_{i:02d}.png").write_text(f"{section['id']}:{section['text']}")
+
+    pages = []
+    monkeypatch.setattr(pipeline, "run_generate_stage", generate)
+    monkeypatch.setattr(pipeline, "get_image_cache", lambda: cache)
+    monkeypatch.setattr(pipeline, "build_pdf", lambda images, pdf_path: pages.append(images))
+    monkeypatch.setenv("IMAGE_GEN_PROVIDER", "doubao")
+    return config_dir, calls, pages
+
+
+def _write_plan(config_dir, texts):
+    sections = [{"id": f"s{i}", "text": text} for i, text in enumerate(texts, start=1)]
+    (config_dir / "checkpoint_plan.json").write_text(json.dumps({"plan": {"title": "t", "sections": sections}}))
+
+
+def test_only_changed_sections_are_generated(tmp_path, deck):
+    config_dir, calls, pages = deck
+    config = {"output_type": "slides", "style": "academic", "max_workers": 2, "input_path": "/a.pdf"}
+    texts = [f"text {i}" for i in range(1, 12)]
+
+    _write_plan(config_dir, texts)
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, config))
+    assert calls == [[f"s{i}" for i in range(1, 12)]]
+
+    # 改动第 2、10 页；输入路径与并发数不影响缓存
+    texts[1], texts[9] = "changed 2", "changed 10"
+    _write_plan(config_dir, texts)
+    earlier = set(config_dir.iterdir())
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, {**config, "max_workers": 4, "input_path": "/b.pdf"}))
+
+    assert calls[1] == ["s2", "s10"]
+    [output] = [d for d in config_dir.iterdir() if d.is_dir() and d not in earlier]
+    assert sorted(p.name for p in output.iterdir()) == [f"slide_{i:02d}.png" for i in range(1, 12)]
+    assert [page.read_text() for page in pages[-1]] == [f"s{i}:{text}" for i, text in enumerate(texts, start=1)]
+
+
+def test_rerun_from_generate_hits_the_cache(tmp_path, deck):
+    config_dir, calls, _ = deck
+    _write_plan(config_dir, ["a", "b", "c"])
+    cache = pipeline.get_image_cache()
+
+    # 从 rag 开始的运行会在配置中写入 content_hash，从 generate 重跑时没有
+    config = {"output_type": "slides", "style": "academic"}
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, {**config, "content_hash": "f" * 64}))
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, config))
+
+    assert calls == [["s1", "s2", "s3"]]
+    assert cache.stats()["hits"] == 3
+
+
+def test_style_or_provider_change_misses_the_cache(tmp_path, deck, monkeypatch):
+    config_dir, calls, _ = deck
+    _write_plan(config_dir, ["a", "b"])
+
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, {"style": "academic"}))
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, {"style": "doraemon"}))
+    monkeypatch.setenv("IMAGE_GEN_PROVIDER", "google")
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, {"style": "academic"}))
+    # 图片尺寸与宽高比不同也不能复用
+    monkeypatch.setenv("IMAGE_SIZE", "4K")
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, {"style": "academic"}))
+    monkeypatch.setenv("IMAGE_RESOLUTION", "4:3")
+    asyncio.run(pipeline._run_generate_stage(tmp_path, config_dir, {"style": "academic"}))
+
+    assert calls == [["s1", "s2"]] * 5
@@ -0,0 +1,52 @@
+"""图像请求许可在多个进程间共享"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+image_permits = pytest.importorskip("paper2slides.core.image_permits")
+
+
+def test_permits_are_shared_across_pools(fake_redis):
+    # 两个池模拟两个 worker 进程
+    first = image_permits.RedisImagePermitPool(fake_redis, size=4)
+    second = image_permits.RedisImagePermitPool(fake_redis, size=4)
+
+    assert first.try_acquire("a", 3) == 3
+    assert second.try_acquire("b", 3) == 1
+    assert second.try_acquire("c", 1) == 0
+
+    first.release("a")
+    assert second.try_acquire("c", 2) == 2
+
+
+def test_expired_leases_are_reclaimed(fake_redis, monkeypatch):
+    pool = image_permits.RedisImagePermitPool(fake_redis, size=2, lease_ttl=60)
+    assert pool.try_acquire("crashed", 2) == 2
+    assert pool.try_acquire("next", 1) == 0
+
+    # 持有许可的进程崩溃后不再续约，租约过期后许可归还
+    now = image_permits.time.time()
+    monkeypatch.setattr(image_permits, "time", SimpleNamespace(time=lambda: now + 61))
+    assert pool.try_acquire("next", 1) == 1
+    assert not pool.renew("crashed")
+
+
+def test_permits_are_released_after_the_block(fake_redis, monkeypatch):
+    monkeypatch.setattr(image_permits, "ACQUIRE_POLL_INTERVAL", 0.01)
+    pool = image_permits.RedisImagePermitPool(fake_redis, size=2)
+    held = []
+
+    async def stage(requested):
+        async with pool.permits(requested) as granted:
+            held.append(granted)
+            assert sum(held) <= pool.size
+            await asyncio.sleep(0.02)
+            held.remove(granted)
+            return granted
+
+    async def main():
+        return await asyncio.gather(stage(2), stage(2), stage(1))
+
+    assert sorted(asyncio.run(main())) == [1, 2, 2]
+    assert pool.try_acquire("after", 2) == 2
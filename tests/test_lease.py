@@ -0,0 +1,97 @@
+"""运行槽租约：分派有效期与心跳续约"""
+import threading
+import time
+
+import pytest
+
+
+class _ScriptedQueue:
+    """按预设结果返回 renew_lease 的队列管理器"""
+
+    def __init__(self, results, settings):
+        self._results = list(results)
+        self._settings = settings
+        self.calls = 0
+
+    def renew_lease(self, task_id):
+        self.calls += 1
+        return self._results.pop(0) if self._results else True
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    from config.settings import get_settings
+
+    monkeypatch.setenv("SLIDES_TASK_LEASE_TTL", "3")
+    return get_settings()
+
+
+def _heartbeat(queue, on_lost=None):
+    from common.redis_manager import LeaseHeartbeat
+
+    heartbeat = LeaseHeartbeat(queue, "task-1", on_lost=on_lost)
+    heartbeat._interval = heartbeat._retry_interval = 0.01
+    return heartbeat
+
+
+def test_heartbeat_keeps_renewing_through_redis_errors(settings):
+    lost = threading.Event()
+    # 认领成功，之后连续两次 Redis 错误，再恢复续约
+    queue = _ScriptedQueue([True, None, None, True, True], settings)
+
+    with _heartbeat(queue, on_lost=lost.set) as heartbeat:
+        deadline = time.time() + 2
+        while queue.calls < 6 and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert queue.calls >= 6
+    assert not heartbeat.lost
+    assert not lost.is_set()
+
+
+def test_heartbeat_stops_only_when_lease_is_gone(settings):
+    lost = threading.Event()
+    queue = _ScriptedQueue([True, None, False], settings)
+
+    with _heartbeat(queue, on_lost=lost.set) as heartbeat:
+        assert lost.wait(2)
+
+    assert heartbeat.lost
+    assert queue.calls == 3
+
+
+def test_claim_refuses_reaped_lease(settings):
+    from common.redis_manager import LeaseLostError
+
+    with pytest.raises(LeaseLostError):
+        with _heartbeat(_ScriptedQueue([False], settings)):
+            pytest.fail("任务不应在租约已被回收后执行")
+
+
+def test_dispatched_task_survives_celery_backlog(queue_manager, monkeypatch):
+    from common.redis_manager import ADMIT_RUN_NOW
+
+    monkeypatch.setenv("SLIDES_TASK_LEASE_TTL", "60")
+    monkeypatch.setenv("SLIDES_TASK_DISPATCH_TTL", "3600")
+    assert queue_manager.admit("task-1", "user-1") == ADMIT_RUN_NOW
+
+    # 排队超过心跳有效期，但仍在分派有效期内：不被回收
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert queue_manager.reap_expired_leases() == []
+
+    # worker 认领后按心跳有效期续约
+    assert queue_manager.renew_lease("task-1") is True
+    assert queue_manager.redis.zscore(queue_manager.key_leases, "task-1") == pytest.approx(later + 60)
+
+
+def test_renew_reports_redis_errors_separately(queue_manager, monkeypatch):
+    from redis.exceptions import ConnectionError
+
+    assert queue_manager.renew_lease("missing") is False
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(queue_manager, "_script", lambda source: unavailable)
+    assert queue_manager.renew_lease("task-1") is None
@@ -0,0 +1,52 @@
+"""LLM 响应缓存不可用时不影响请求"""
+import sqlite3
+
+import pytest
+
+llm_cache = pytest.importorskip("paper2slides.core.llm_cache")
+
+
+class _Response:
+    def model_dump_json(self):
+        return '{"id": "r1"}'
+
+
+class _LockedCache:
+    def get(self, key):
+        raise sqlite3.OperationalError("database is locked")
+
+    def put(self, key, model, value):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_cache_round_trip(tmp_path, monkeypatch):
+    cache = llm_cache.LLMCache(str(tmp_path / "llm.sqlite3"))
+    monkeypatch.setattr(llm_cache, "get_llm_cache", lambda: cache)
+    request = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+
+    # 不在作用域内时不查缓存
+    assert llm_cache._lookup(request) == (None, None, None)
+
+    token = llm_cache._scope.set("plan")
+    try:
+        _, key, cached = llm_cache._lookup(request)
+        assert cached is None
+        llm_cache._store(cache, key, request, _Response())
+        assert llm_cache._lookup(request) == (cache, key, '{"id": "r1"}')
+    finally:
+        llm_cache._scope.reset(token)
+
+
+def test_locked_cache_is_a_miss(monkeypatch):
+    cache = _LockedCache()
+    monkeypatch.setattr(llm_cache, "get_llm_cache", lambda: cache)
+    request = {"model": "m", "messages": []}
+
+    token = llm_cache._scope.set("summary")
+    try:
+        found, key, cached = llm_cache._lookup(request)
+        assert found is cache and cached is None
+        # 已付费的响应不会因为写缓存失败而丢失
+        llm_cache._store(cache, key, request, _Response())
+    finally:
+        llm_cache._scope.reset(token)
@@ -0,0 +1,27 @@
+"""论文内容本地缓存的过期清理"""
+import os
+import time
+
+
+def test_cleanup_removes_only_long_expired_files(tmp_path, monkeypatch):
+    from services.paper_content_service import CLEANUP_GRACE, PaperContentService
+
+    monkeypatch.setenv("PAPER_CONTENT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("PAPER_CONTENT_CACHE_TTL", "100")
+    service = PaperContentService()
+
+    fresh = service.get_cache_path("fresh", "arxiv")
+    expired = service.get_cache_path("expired", "arxiv")
+    # 刚过期的文件可能仍被运行中的任务读取
+    in_use = service.get_cache_path("in-use", "arxiv")
+    leftover = expired.with_name(".expired.md.1.2.tmp")
+    now = time.time()
+    for path, age in ((fresh, 0), (expired, 100 + CLEANUP_GRACE + 1), (in_use, 101),
+                      (leftover, 100 + CLEANUP_GRACE + 1)):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("# paper")
+        os.utime(path, (now - age, now - age))
+
+    assert service.cleanup_stale() == 2
+    assert fresh.exists() and in_use.exists()
+    assert not expired.exists() and not leftover.exists()
@@ -0,0 +1,90 @@
+"""批量预生成的限流与重试"""
+import pytest
+
+
+@pytest.fixture
+def task_service(user_repo, system_repo, queue_manager, monkeypatch):
+    from services.task_service import TaskService
+
+    # 一个运行槽、一个等待位置：第三篇论文会被限流
+    monkeypatch.setenv("SLIDES_MAX_WAITING_TASKS", "1")
+    monkeypatch.setenv("SLIDES_MAX_WAITING_PER_USER", "1")
+
+    service = TaskService(user_repo, system_repo, None, queue_manager)
+    service.submitted = []
+    monkeypatch.setattr(service, "_submit_to_celery", lambda **kwargs: service.submitted.append(kwargs))
+    return service
+
+
+def _finish(service, system_repo, submission):
+    """模拟 worker 完成任务：写入系统默认结果并释放运行槽"""
+    service._user_repo.mark_success(submission["result_id"], "bucket/file.pdf")
+    if submission["update_system"]:
+        system_repo.update_file_path(
+            paper_id=submission["paper_id"],
+            agent_type=submission["agent_type"],
+            source=submission["source"],
+            file_path="bucket/file.pdf",
+            images=None,
+            result_id=submission["result_id"]
+        )
+    service._queue_manager.release_running(submission["result_id"])
+    service.schedule_from_waiting_queue()
+
+
+def test_throttled_papers_are_retried_and_fill_system_results(task_service, system_repo):
+    papers = [{"paper_id": f"p{i}", "source": "arxiv"} for i in range(1, 4)]
+
+    first = task_service.pregenerate_system_papers(papers, ["slides"])
+
+    assert [item["paper_id"] for item in first["submitted"]] == ["p1", "p2"]
+    assert [item["paper_id"] for item in first["deferred"]] == ["p3"]
+    # 被限流的论文不能留下空系统记录，否则重试时不会再写入默认结果
+    assert system_repo.get_default_result("p3", "slides", "arxiv") is None
+
+    # p1 完成后等待中的 p2 被调度，仍负责写入系统默认结果
+    _finish(task_service, system_repo, task_service.submitted[0])
+    assert [s["paper_id"] for s in task_service.submitted] == ["p1", "p2"]
+    assert task_service.submitted[1]["update_system"] is True
+    _finish(task_service, system_repo, task_service.submitted[1])
+
+    retry = task_service.pregenerate_system_papers(papers, ["slides"])
+
+    assert [item["paper_id"] for item in retry["skipped"]] == ["p1", "p2"]
+    assert [item["paper_id"] for item in retry["submitted"]] == ["p3"]
+    assert retry["deferred"] == []
+    assert task_service.submitted[2]["paper_id"] == "p3"
+    assert task_service.submitted[2]["update_system"] is True
+
+    _finish(task_service, system_repo, task_service.submitted[2])
+    for paper_id in ("p1", "p2", "p3"):
+        assert system_repo.get_default_result(paper_id, "slides", "arxiv").file_path == "bucket/file.pdf"
+
+
+def test_stale_empty_record_is_taken_over(task_service, system_repo, user_repo):
+    from common.enums import TaskStatusEnum
+
+    # 之前异常中断的运行遗留了空系统记录，没有任务再负责写入
+    system_repo.insert_empty_record(paper_id="p1", source="arxiv", agent_type="slides")
+    # p2 的空记录属于正在运行的任务
+    task_service.create_task(
+        paper_id="p2", source="arxiv", paper_type="system", agent_type="slides", user_id="u1"
+    )
+    assert system_repo.get_default_result("p2", "slides", "arxiv") is not None
+
+    papers = [{"paper_id": "p1", "source": "arxiv"}, {"paper_id": "p2", "source": "arxiv"}]
+    first = task_service.pregenerate_system_papers(papers, ["slides"])
+    assert [item["paper_id"] for item in first["submitted"]] == ["p1"]
+    assert [item["paper_id"] for item in first["skipped"]] == ["p2"]
+
+    # p2 完成后调度 p1，p1 接手写入系统默认结果
+    _finish(task_service, system_repo, task_service.submitted[0])
+    assert task_service.submitted[1]["paper_id"] == "p1"
+    assert task_service.submitted[1]["update_system"] is True
+    _finish(task_service, system_repo, task_service.submitted[1])
+    assert system_repo.get_default_result("p1", "slides", "arxiv").file_path == "bucket/file.pdf"
+    assert user_repo.count_by_status(TaskStatusEnum.WAITING.value) == 0
+
+    # 默认结果写入后不再重复提交
+    retry = task_service.pregenerate_system_papers(papers, ["slides"])
+    assert [item["paper_id"] for item in retry["skipped"]] == ["p1", "p2"]
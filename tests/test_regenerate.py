@@ -0,0 +1,60 @@
+"""重新生成部分幻灯片"""
+import asyncio
+import json
+
+import pytest
+
+regenerate = pytest.importorskip("paper2slides.core.regenerate")
+
+# 章节 ID 的字典序与计划顺序不同
+SECTION_IDS = [
+    "title", "outline", "motivation", "method", "architecture", "training",
+    "data", "results", "ablation", "limitations", "conclusion", "references"
+]
+
+
+def _deck(tmp_path, position_named):
+    """12 页的已有结果：文件按章节 ID 或按页码命名"""
+    config_dir = tmp_path / "slides_academic_medium"
+    previous = config_dir / "20200101_000000"
+    previous.mkdir(parents=True)
+    sections = [{"id": section_id, "title": section_id} for section_id in SECTION_IDS]
+    (config_dir / "checkpoint_plan.json").write_text(json.dumps({"plan": {"sections": sections}}))
+    for i, section_id in enumerate(SECTION_IDS, start=1):
+        stem = f"slide_{i}" if position_named else section_id
+        (previous / f"{stem}.png").write_text(f"old:{section_id}")
+    (previous / regenerate.PDF_NAME).write_text("pdf")
+    return config_dir
+
+
+@pytest.mark.parametrize("position_named", [True, False])
+def test_regenerated_slides_replace_their_originals(tmp_path, monkeypatch, position_named):
+    config_dir = _deck(tmp_path, position_named)
+
+    async def fake_generate(base_dir, staging_dir, config, use_cache=True):
+        # 生成器按收到的（缩减后的）计划命名图片
+        plan = json.loads((staging_dir / "checkpoint_plan.json").read_text())
+        output = staging_dir / "20300101_000000"
+        output.mkdir()
+        for i, section in enumerate(plan["plan"]["sections"], start=1):
+            stem = f"slide_{i}" if position_named else section["id"]
+            (output / f"{stem}.png").write_text(f"new:{section['id']}")
+
+    pages = []
+    monkeypatch.setattr(regenerate, "_run_generate_stage", fake_generate)
+    monkeypatch.setattr(regenerate, "build_pdf", lambda images, pdf_path: pages.extend(images))
+
+    result = asyncio.run(regenerate.regenerate_slides(tmp_path, config_dir, {}, [2, 10, 11]))
+
+    output_dir = result["output_dir"]
+    assert result["regenerated"] == ["outline", "limitations", "conclusion"]
+    assert result["linked"] == 9
+    # 重新生成的图片沿用原文件名，不留下重复的页面
+    names = sorted(p.name for p in output_dir.iterdir() if p.suffix == ".png")
+    assert names == sorted(p.name for p in result["previous_output_dir"].iterdir() if p.suffix == ".png")
+
+    contents = [page.read_text() for page in pages]
+    assert contents == [
+        f"{'new' if section_id in result['regenerated'] else 'old'}:{section_id}"
+        for section_id in SECTION_IDS
+    ]
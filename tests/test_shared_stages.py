@@ -0,0 +1,29 @@
+"""同一项目的不同配置只在共享阶段互斥"""
+import asyncio
+
+import pytest
+
+pipeline = pytest.importorskip("paper2slides.core.pipeline")
+
+
+def test_waiting_pipeline_reuses_shared_checkpoint(tmp_path, monkeypatch):
+    from paper2slides.core.paths import get_rag_checkpoint
+
+    config = {"content_type": "paper", "output_type": "slides"}
+    runs = []
+
+    async def rag(base_dir, config):
+        runs.append("rag")
+        await asyncio.sleep(0.01)
+        checkpoint = get_rag_checkpoint(base_dir, config)
+        checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        checkpoint.write_text("{}")
+
+    monkeypatch.setattr(pipeline, "run_rag_stage", rag)
+
+    async def main():
+        lock = asyncio.Lock()
+        await asyncio.gather(*(pipeline._run_shared_stage("rag", tmp_path, config, lock) for _ in range(2)))
+
+    asyncio.run(main())
+    assert runs == ["rag"]
@@ -0,0 +1,41 @@
+"""启动恢复时合并任务的处理"""
+
+
+def _task(result_id, status, coalesced_to=None):
+    from models.entities.user_paper_result import UserPaperResult
+
+    task = UserPaperResult.create(result_id, "slides", "p1", "arxiv", "system", f"user-{result_id}")
+    task.status = status
+    task.coalesced_to = coalesced_to
+    return task
+
+
+def test_followers_of_failed_leaders_are_failed(user_repo):
+    from common.enums import TaskStatusEnum
+
+    running, waiting = TaskStatusEnum.RUNNING.value, TaskStatusEnum.WAITING.value
+    for task in (
+        _task("leader-running", running),
+        _task("follower-running", running, "leader-running"),
+        _task("follower-waiting", waiting, "leader-running"),
+        _task("leader-waiting", waiting),
+        _task("follower-of-waiting", waiting, "leader-waiting"),
+    ):
+        user_repo.insert(task)
+
+    user_repo.fail_all_by_status(running, "interrupted")
+    assert user_repo.fail_orphaned_coalesced_tasks("leader interrupted") == 1
+
+    status = {t: user_repo.find_by_result_id(t).status for t in (
+        "follower-running", "follower-waiting", "follower-of-waiting"
+    )}
+    assert status == {
+        "follower-running": TaskStatusEnum.FAILED.value,
+        "follower-waiting": TaskStatusEnum.FAILED.value,
+        # 在途任务会重新入队，合并到它的任务随它完成
+        "follower-of-waiting": waiting,
+    }
+
+    # 重置等待队列时，合并到等待任务的任务一并失败
+    user_repo.fail_all_by_status(waiting, "cancelled")
+    assert user_repo.find_by_result_id("follower-of-waiting").status == TaskStatusEnum.FAILED.value
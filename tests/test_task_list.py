@@ -0,0 +1,49 @@
+"""任务列表分页与总数"""
+from datetime import datetime, timedelta
+
+
+def test_keyset_pages_share_the_base_total(user_repo):
+    from models.entities.user_paper_result import UserPaperResult
+
+    for i in range(5):
+        task = UserPaperResult.create(f"t{i}", "slides", "p1", "arxiv", "user", "u1")
+        task.created_time = datetime(2026, 1, 1) + timedelta(minutes=i)
+        user_repo.insert(task)
+
+    first, total = user_repo.find_list_page("u1", "p1", "arxiv", limit=2)
+    assert [doc["_id"] for doc in first] == ["t4", "t3"]
+    assert total == 5
+
+    last = first[-1]
+    second, total = user_repo.find_list_page(
+        "u1", "p1", "arxiv", limit=2, after=(last["created_time"], last["_id"]), with_total=False
+    )
+    assert [doc["_id"] for doc in second] == ["t2", "t1"]
+    assert total is None
+    assert set(second[0]) <= {"_id", "title", "agent_type", "status", "created_time", "paper_id", "source"}
+
+
+def test_cursor_pages_skip_the_count(user_repo, monkeypatch):
+    from models.entities.user_paper_result import UserPaperResult
+    from services.task_service import TaskService
+
+    for i in range(5):
+        task = UserPaperResult.create(f"t{i}", "slides", "p1", "arxiv", "user", "u1")
+        task.created_time = datetime(2026, 1, 1) + timedelta(minutes=i)
+        user_repo.insert(task)
+
+    counts = []
+    count = user_repo.count
+    monkeypatch.setattr(user_repo, "count", lambda filter_dict: counts.append(filter_dict) or count(filter_dict))
+    service = TaskService(user_repo, None, None, None)
+
+    first = service.list_tasks("u1", "p1", "arxiv", page_size=2)
+    assert first["total"] == 5 and len(counts) == 1
+
+    # 按游标翻页默认不再查询总数
+    second = service.list_tasks("u1", "p1", "arxiv", page_size=2, cursor=first["next_cursor"])
+    assert [item["task_id"] for item in second["items"]] == ["t2", "t1"]
+    assert second["total"] is None and len(counts) == 1
+
+    third = service.list_tasks("u1", "p1", "arxiv", page_size=2, cursor=second["next_cursor"], with_total=True)
+    assert third["total"] == 5 and len(counts) == 2
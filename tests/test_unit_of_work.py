@@ -0,0 +1,177 @@
+"""任务运行工作单元：读取与写回次数"""
+from collections import Counter
+
+import pytest
+
+
+class _CountingCollection:
+    """统计集合方法调用次数的包装"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+@pytest.fixture
+def counted_repo(user_repo):
+    from models.entities.user_paper_result import UserPaperResult
+
+    user_repo.insert(UserPaperResult.create("t1", "slides", "p1", "arxiv", "user", "u1"))
+    user_repo._collection = _CountingCollection(user_repo._collection)
+    return user_repo
+
+
+def test_task_is_read_once_and_written_in_one_update(counted_repo):
+    from common.enums import TaskStatusEnum
+    from repositories.unit_of_work import TaskUnitOfWork
+
+    uow = TaskUnitOfWork(counted_repo)
+    task = uow.get_task("t1")
+    assert uow.get_task("t1") is task
+
+    # 运行中、成功两次状态变更与结果字段合并为一次更新
+    task.mark_running()
+    task.mark_success("bucket/t1.pdf", ["bucket/1.png"])
+    assert uow.flush() == 1
+    assert uow.flush() == 0
+
+    assert (uow.reads, uow.writes) == (1, 1)
+    assert counted_repo._collection.calls == Counter(find_one=1, update_one=1)
+    assert uow.persisted_status("t1") == TaskStatusEnum.SUCCESS.value
+
+    stored = counted_repo.find_by_result_id("t1")
+    assert stored.status == TaskStatusEnum.SUCCESS.value
+    assert stored.file_path == "bucket/t1.pdf"
+
+
+def test_conflicting_status_is_discarded_and_reloaded(counted_repo):
+    from common.enums import TaskStatusEnum
+    from repositories.unit_of_work import TaskUnitOfWork
+
+    uow = TaskUnitOfWork(counted_repo)
+    task = uow.get_task("t1")
+    # 运行期间任务被取消
+    counted_repo.mark_failed("t1", "任务已被用户取消")
+
+    task.mark_success("bucket/t1.pdf")
+    assert uow.flush() == 0
+    assert uow.persisted_status("t1") is None
+
+    assert uow.get_task("t1").status == TaskStatusEnum.FAILED.value
+    assert (uow.reads, uow.writes) == (2, 1)
+
+
+def test_unchanged_values_still_count_as_written(counted_repo):
+    from common.enums import TaskStatusEnum
+    from repositories.unit_of_work import TaskUnitOfWork
+
+    uow = TaskUnitOfWork(counted_repo)
+    task = uow.get_task("t1")
+    # 写入与数据库相同的值：条件满足，只是没有实际修改
+    task.status = TaskStatusEnum.WAITING.value
+    task.title = task.title
+
+    assert uow.flush() == 1
+    assert uow.persisted_status("t1") == TaskStatusEnum.WAITING.value
+    assert uow.get_task("t1") is task
+    assert uow.reads == 1
+
+
+def test_cleared_fields_are_removed(counted_repo):
+    from repositories.unit_of_work import TaskUnitOfWork
+
+    counted_repo.mark_failed("t1", "超时")
+    uow = TaskUnitOfWork(counted_repo)
+    task = uow.get_task("t1")
+    task.images = ["bucket/1.png"]
+    uow.flush()
+
+    # 重新入队时清空失败原因与图片
+    task.error_reason = None
+    task.images = None
+    assert uow.flush() == 1
+    assert uow.persisted_status("t1") == task.status
+
+    stored = counted_repo._collection.find_one({"_id": "t1"})
+    assert "error_reason" not in stored and "images" not in stored
+
+
+class _MinioService:
+    def upload_task_results(self, **kwargs):
+        return {"file_path": "bucket/t1.pdf", "images": ["bucket/1.png"]}
+
+    def upload_result_file(self, **kwargs):
+        return None
+
+
+class _ContentService:
+    def __init__(self, path):
+        self._path = path
+
+    def get_md_path(self, paper_id, source):
+        return self._path
+
+
+class _Paper2SlidesService:
+    def __init__(self, error=None):
+        self._error = error
+
+    def build_config(self, **kwargs):
+        return kwargs
+
+    async def generate(self, session_id, file_paths, config):
+        if self._error:
+            raise RuntimeError(self._error)
+        return {"output_files": [{"filename": "slides.pdf", "path": file_paths[0]}]}
+
+
+@pytest.mark.parametrize("error", [None, "生成失败"])
+def test_agent_run_reads_once_and_writes_once(counted_repo, system_repo, queue_manager, tmp_path,
+                                              monkeypatch, error):
+    pytest.importorskip("langgraph")
+    pytest.importorskip("minio")
+    import asyncio
+    from common.enums import TaskStatusEnum
+    from agents import slides_agent
+
+    md_path = tmp_path / "p1.md"
+    md_path.write_text("# paper")
+    monkeypatch.setattr(slides_agent, "get_paper2slides_service", lambda: _Paper2SlidesService(error))
+    agent = slides_agent.SlidesAgent.__new__(slides_agent.SlidesAgent)
+    agent._user_repo = counted_repo
+    agent._system_repo = system_repo
+    agent._queue_manager = queue_manager
+    agent._minio_service = _MinioService()
+    agent._paper_content_service = _ContentService(md_path)
+    agent.workflow = agent._build_workflow()
+    agent.app = agent.workflow.compile()
+
+    # 提交时任务已标记为 running
+    counted_repo.mark_running("t1")
+    counted_repo._collection.calls.clear()
+
+    result = asyncio.run(agent.run("t1", "p1", "arxiv", "user", "slides", "u1"))
+
+    # 修改前每次运行读取两次、写回两次（running 与最终状态各一次）
+    calls = counted_repo._collection.calls
+    assert (calls["find_one"], calls["update_one"]) == (1, 1)
+    assert result["recorded"]
+
+    stored = counted_repo.find_by_result_id("t1")
+    if error:
+        assert stored.status == TaskStatusEnum.FAILED.value
+        assert stored.error_reason == error
+    else:
+        assert stored.status == TaskStatusEnum.SUCCESS.value
+        assert stored.file_path == "bucket/t1.pdf"
+    assert stored.start_time is not None